@@ -1,12 +1,19 @@
 
 # libraries Import
+import copy
+import math
+import threading
 from functools import partial
 from tkinter import *
 import customtkinter
-from lib.MySQL import MySQL
+from lib.Database import openDatabase, warmUp
+from lib.MonthlyAggregate import queryMonthly
 from Select import Select
 from lib.Tools import Tools
-from predictive_model import predictive_model
+from lib.QueryCache import DatabaseVersion, QueryCache
+from lib.Worker import LatestWorker
+from predictive_model import predictive_interval, predictive_model
+from lib.Models import DEFAULT_MODEL
 
 ##########################################################################################################################
 ###                                                                                                                    ###
@@ -17,58 +24,120 @@ from predictive_model import predictive_model
 # 提供程式運作的當前狀態
 sqlStatusString = ""
 
+# 每月平均單價的查詢快取（相同查詢條件不必重複查詢資料庫，匯入新資料後自動失效，
+# 在其他電腦匯入時最晚 30 秒後失效）
+queryCache = QueryCache(maxsize=64, ttl=600, version=DatabaseVersion(openDatabase, interval=30))
+
+# 查詢與預測在背景執行緒執行，視窗不會停止回應；連續點擊時只執行最新的一次
+predictWorker = LatestWorker()
+
 # 輸入/輸出 串接函式 ======================================================================================================
+# 在背景執行緒執行（由 predictWorker 呼叫），不可操作視窗元件
 def input_io_call(dict):
-    # 顯示查詢文字並強制刷新
-    output_text = f"資料庫查詢中，請稍候......"        
-    Output_label.configure(text=output_text, text_color="#FFAA00")
-    window.update()
-
     # 調閱資料庫
     tools = Tools()
     sqlParams = tools.changeToSelectDict(dict)
-    queryBuilder =  Select().createQuery(sqlParams)
-    with MySQL() as db:
-        sqlStatusString = "資料庫查詢中．．．"
-        print(sqlStatusString)
-        result = db.query(queryBuilder[0], queryBuilder[1])
-        count = len(result)
-        sqlStatusString = f"查詢到{count}筆交易紀錄．．．"
-        print(sqlStatusString)
-        if count > 0:
-            data = tools.getKeyByDict(result)
-            userInput = {
-                "calculate_Y": dict['calculate_Y'],
-                "calculate_M": dict['calculate_M'],
-            }
-            sqlStatusString = f"進行預測"
-            print(sqlStatusString)
-            amount = predictive_model(userInput, data)
-            sqlStatusString = f"預測完成輸出結果"
+    select = Select()
+    queryBuilder =  select.createMonthlyQuery(sqlParams)
+
+    # 查詢條件相同時（只改變預測年月或面積）直接使用快取的每月平均單價
+    hit, result = queryCache.get(queryBuilder[0], queryBuilder[1])
+    if not hit:
+        with openDatabase() as db:
+            sqlStatusString = "資料庫查詢中．．．"
             print(sqlStatusString)
-            return round(amount, 2)
+            # 在資料庫端依交易年月彙整，只傳回每月的單價總和與筆數（沒有價格、面積與地址條件時使用預先彙整的每月統計）
+            # MonthlyResult：每月平均單價、交易筆數與每月的 (交易筆數, 單價平方和)（用於加權迴歸與預測區間）
+            result = queryMonthly(db, sqlParams)
+        # 查無資料（或連線失敗）時不快取，下次重新查詢
+        if result.count > 0:
+            queryCache.put(queryBuilder[0], queryBuilder[1], result)
+    print(f"查詢快取: {queryCache.stats()}")
+
+    sqlStatusString = f"查詢到{result.count}筆交易紀錄．．．"
+    print(sqlStatusString)
+    if result.count > 0:
+        userInput = {
+            "calculate_Y": dict['calculate_Y'],
+            "calculate_M": dict['calculate_M'],
+            "model": dict.get('model'),
+        }
+        sqlStatusString = f"進行預測"
+        print(sqlStatusString)
+        # 模型為 user_input_list["model"]，沒有時為環境變數 LVR_MODEL，只擬合一次
+        model = userInput["model"] or DEFAULT_MODEL
+        if model == "linear":
+            # 以每月交易筆數加權擬合，並計算單筆交易單價的 95% 預測區間
+            amount, lower, upper = predictive_interval(userInput, result.data, result.stats)
         else:
-            sqlStatusString = f"沒有可進行預測的資料"
-            print(sqlStatusString)
-            return -1
-    print(dict)
-    
+            # 預測區間只有一次迴歸提供，其他模型只顯示預測值（不顯示另一個模型的區間）
+            amount, lower, upper = predictive_model(userInput, result.data, result.stats, model), math.nan, math.nan
+        sqlStatusString = f"預測完成輸出結果"
+        print(sqlStatusString)
+        return (round(amount, 2), lower, upper)
+    else:
+        sqlStatusString = f"沒有可進行預測的資料"
+        print(sqlStatusString)
+        return -1
+
     # 一律回傳 萬元/每單位面積。 須注意單位為何 "calculate_unit" （1 => M^2 ，2 => 坪）
     # 一坪等於3.3058平方公尺
 
 
+# 送出查詢：顯示查詢文字後交給背景執行緒，完成時由主執行緒呼叫 output_show
+def submit_prediction():
+    output_text = f"資料庫查詢中，請稍候......"
+    Output_label.configure(text=output_text, text_color="#FFAA00")
+    Cancel_button.configure(state="normal")
+    # 傳入目前輸入的複本，查詢期間使用者修改輸入不影響這次的查詢與顯示
+    inputs = copy.deepcopy(user_input_list)
+    predictWorker.submit(
+        input_io_call, (inputs,),
+        onDone=lambda gui_output_float: output_show(gui_output_float, inputs),
+        onError=output_error,
+        )
+
+
+# 取消按鈕
+def on_cancel_button():
+    if predictWorker.cancel():
+        print("[GUI]已取消查詢")
+        Output_label.configure(text="已取消查詢", text_color="#CC0000")
+    Cancel_button.configure(state="disabled")
+
+
+# 查詢或預測發生例外時顯示錯誤
+def output_error(error):
+    print(f"[GUI]錯誤! 查詢失敗: {error}")
+    Cancel_button.configure(state="disabled")
+    Output_label.configure(text=f"[ERROR]查詢失敗: {error}", text_color="#CC0000")
+
+
+# 定期在主執行緒處理背景執行緒完成的結果
+def poll_worker():
+    predictWorker.poll()
+    window.after(50, poll_worker)
+
+
 # GUI輸出顯示函式
-def output_show(gui_output_float):
-    global user_input_list
+def output_show(gui_output_float, input_list=None):
+    # input_list 為送出查詢時的輸入複本，沒有時使用目前的輸入
+    inputs = input_list if input_list is not None else user_input_list
+    Cancel_button.configure(state="disabled")
+
+    # 回傳值為 (預測單價, 預測區間下限, 預測區間上限)
+    lower = upper = None
+    if isinstance(gui_output_float, tuple):
+        gui_output_float, lower, upper = gui_output_float
 
     # 形式正確的回傳值
     if(gui_output_float > 0):
-        if (user_input_list["calculate_area"] == None or user_input_list["calculate_area"] == 0):
+        if (inputs["calculate_area"] == None or inputs["calculate_area"] == 0):
             # 輸入值無面積時，返回 萬元/坪(or 平方米)
-            if(user_input_list["calculate_unit"] == 2):     # 單位:坪
+            if(inputs["calculate_unit"] == 2):     # 單位:坪
                 show_number = gui_output_float
                 output_text = f"預期價格: {show_number:.2f}萬元/坪"
-            elif(user_input_list["calculate_unit"] == 1):   # 單位:平方米 
+            elif(inputs["calculate_unit"] == 1):   # 單位:平方米 
                 # 1坪 = 3.30579 平方公尺
                 show_number = gui_output_float / 3.30579
                 output_text = f"預期價格: {show_number:.2f}萬元/平方米"
@@ -76,16 +145,20 @@ def output_show(gui_output_float):
                 print("[GUI]錯誤! 未定義的單位")
         else:
             # 輸入值有面積時，返回 總價-萬元
-            if(user_input_list["calculate_unit"] == 2):     # 單位:坪
-                show_number = gui_output_float * user_input_list["calculate_area"]
+            if(inputs["calculate_unit"] == 2):     # 單位:坪
+                show_number = gui_output_float * inputs["calculate_area"]
                 output_text = f"預期總價格: {show_number:.2f}萬元"
-            elif(user_input_list["calculate_unit"] == 1):   # 單位:平方米 
+            elif(inputs["calculate_unit"] == 1):   # 單位:平方米 
                 # 1坪 = 3.30579 平方公尺
-                show_number = (gui_output_float * user_input_list["calculate_area"]) / 3.30579
+                show_number = (gui_output_float * inputs["calculate_area"]) / 3.30579
                 output_text = f"預期總價格: {show_number:.2f}萬元"
             else:
-                print(f"[GUI]錯誤! 未定義的單位:{user_input_list["calculate_unit"]}")  
-                output_text = f"錯誤! 未定義的單位:{user_input_list["calculate_unit"]}"
+                print(f"[GUI]錯誤! 未定義的單位:{inputs["calculate_unit"]}")  
+                output_text = f"錯誤! 未定義的單位:{inputs["calculate_unit"]}"
+        # 預測區間（資料不足三個月份時沒有區間），與預期價格相同的單位
+        if lower is not None and not math.isnan(lower):
+            scale = show_number / gui_output_float
+            output_text += f"\n95%預測區間: {max(lower, 0) * scale:.2f} ~ {upper * scale:.2f}"
         Output_label.configure(text=output_text, text_color="#5555FF")
     
     # 錯誤代碼
@@ -122,7 +195,8 @@ user_input_list = {
     "calculate_Y": None,        # int :     目標期間（年）,                          必填：是 (預設:)
     "calculate_M": None,        # int :     目標期間（月）,                          必填：是 (預設:)
     "calculate_unit": None,     # int :     面積單位（1 => M^2 ，2 => 坪）,          必填：是 (預設:2)
-    "calculate_area": None      # int :     面積,                                    必填：是 (預設:)
+    "calculate_area": None,     # int :     面積,                                    必填：是 (預設:)
+    "model": None               # str :     預測模型（lib/Models.py）,               必填：否 (預設:環境變數 LVR_MODEL 或 linear)
 }
 
 
@@ -1862,8 +1936,7 @@ def on_output_button():
     # 輸出警告文字或調用計算函數
     if(can_output == True):
         print("[GUI]輸入正確，調用計算函數")
-        gui_output_float = input_io_call(user_input_list)
-        output_show(gui_output_float)
+        submit_prediction()
 
     # 僅有起訖時間範圍錯誤
     elif (warning_text == "警告: " and wrong_time_range == True):
@@ -2571,6 +2644,21 @@ Output_button = customtkinter.CTkButton(
     )
 Output_button.pack(pady=10, anchor="center")
 
+# 取消查詢按鈕（查詢中才可以按）
+Cancel_button = customtkinter.CTkButton(
+    master=scrollable_frame,
+    text="取消",
+    font=("Microsoft JhengHei", 14, "bold"),
+    hover=True,
+    height=30,
+    width=80,
+    border_width=2,
+    corner_radius=6,
+    state="disabled",
+    command=on_cancel_button,
+    )
+Cancel_button.pack(pady=0, anchor="center")
+
 # 輸出區
 Output_label = customtkinter.CTkLabel(
     master=scrollable_frame,
@@ -2585,6 +2673,12 @@ Output_label = customtkinter.CTkLabel(
     )
 Output_label.pack(pady=20, anchor="center")
 
+# 背景預先建立資料庫連線池，第一次預測時不必等待連線與登入
+threading.Thread(target=warmUp, daemon=True).start()
+
+# 開始處理背景查詢的結果
+window.after(50, poll_worker)
+
 #run the main loop
 window.mainloop()
 
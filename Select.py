@@ -2,9 +2,48 @@ import mysql.connector
 from mysql.connector import Error
 import json
 import calendar
+import os
 from lib.MySQL import MySQL
+from lib.Database import BACKEND
 
 class Select:
+    # lvr_lnd 可以查詢的欄位（欄位名稱會直接組進 SQL，只接受這些名稱）
+    COLUMNS = ("city_code", "city_name", "town_code", "town_name", "trade_sign", "address",
+               "trade_date", "price_total", "price_nuit", "total_area", "code", "age")
+    # 常用的欄位組合
+    PRESETS = {
+        # 預測模型只需要交易日期與單價（Tools.getKeyByDict）
+        "model": ("trade_date", "price_nuit"),
+    }
+    # Tools.changeToSelectDict 沒有輸入價格或面積時的預設範圍
+    DEFAULT_RANGE = [0, 9999999999999]
+    # 預先彙整的每月統計（lib/MonthlyAggregate.py）可以使用的條件
+    PRECOMPUTED_COLUMNS = ("city_code", "town_code", "trade_sign", "age", "trade_date")
+    # Tools.changeToSelectDict 屋齡區間的邊界（0~5、5~10、10~20、20~30、30~40、40 以上，以 BETWEEN 查詢）
+    # 預先彙整的每月統計只保留這些邊界與邊界之間的區間，屋齡條件的兩端都是邊界時才能使用（參考 lib/MonthlyAggregate.py）
+    AGE_BOUNDARIES = (0, 5, 10, 20, 30, 40)
+    # 屋齡條件的上限大於等於這個值時視為沒有上限（Tools.changeToSelectDict 的 40 年以上為 [40, 9999999]）
+    AGE_UNBOUNDED = 9999999
+    # 每月彙整查詢可以分組的欄位（欄位名稱會直接組進 SQL，只接受這些名稱）
+    GROUP_COLUMNS = ("city_code", "town_code", "trade_sign", "age")
+
+    # 地址搜尋方式："like" 使用 address LIKE '%...%'（全表掃描），
+    # "fulltext" 使用 ngram 全文索引 MATCH ... AGAINST（需要先執行 python lib/Migration.py migrate）
+    ADDRESS_SEARCH = os.environ.get("LVR_ADDRESS_SEARCH", "like")
+    # ngram 全文索引的詞長（MySQL 的 ngram_token_size 預設為 2），比這個短的關鍵字無法使用全文索引
+    NGRAM_SIZE = 2
+
+    def __init__(self, address_search=None, dialect=None):
+        """
+        Args
+            address_search: "like" 或 "fulltext"，預設為 ADDRESS_SEARCH
+            dialect: "mysql" 或 "sqlite"，預設為 lib.Database.BACKEND；SQLite 沒有 ngram 全文索引，地址搜尋一律使用 LIKE
+        """
+        self.dialect = dialect or BACKEND
+        self.address_search = address_search or self.ADDRESS_SEARCH
+        if self.dialect == "sqlite":
+            self.address_search = "like"
+
     def adjust_trade_date(self, trade_date):
         """
         根據提供的 trade_date （如 '10901' 或 '11310'）來調整為完整的日期格式：
@@ -37,13 +76,143 @@ class Select:
         except Exception as e:
             print(f"保存檔案時出錯: {e}")
     
-    def createQuery(self, conditions):
+    def createQuery(self, conditions, columns=None):
         """
         動態 SQL 查詢語句
+        Args
+            conditions: 查詢條件
+            columns: 要查詢的欄位，None 為全部欄位，字串為 PRESETS 的名稱（例如 "model"），
+                     或欄位名稱的串列（例如 ["trade_date", "price_nuit"]）
         Return
             string 哩奧庫查詢語句
         """
-        query = "SELECT * FROM lvr_lnd WHERE "
+        where, params = self.createWhere(conditions)
+        return (f"SELECT {self.createColumns(columns)} FROM lvr_lnd WHERE " + where, params)
+
+    def createColumns(self, columns=None):
+        """
+        產生 SELECT 的欄位清單
+        Return
+            string 例如 "trade_date, price_nuit"
+        """
+        if columns is None:
+            return "*"
+        if isinstance(columns, str):
+            if columns not in self.PRESETS:
+                raise ValueError(f"未知的欄位組合: {columns}")
+            columns = self.PRESETS[columns]
+        unknown = [column for column in columns if column not in self.COLUMNS]
+        if unknown or not columns:
+            raise ValueError(f"未知的欄位: {unknown}")
+        return ", ".join(columns)
+
+    def createMonthlyQuery(self, conditions, group=None):
+        """
+        依交易年月彙整的查詢語句，在資料庫端計算每月的單價總和與筆數，
+        只需要傳回約 150 筆彙整結果，不必傳回所有交易紀錄（結果搭配 Tools.getKeyByMonthly 使用）
+        交易年月日 1130924 DIV 100 => 交易年月 11309，與 Tools.getKeyByDict 取前五碼相同
+        Args
+            conditions: 查詢條件
+            group: 分組欄位（GROUP_COLUMNS，例如 "town_code"），一次查詢每一組的每月統計（搭配 Tools.getKeyByGroupedMonthly）
+        Return
+            (string, list) 查詢語句與參數，查詢結果欄位為 ym, total, count, sumsq（單價平方和，加權迴歸的預測區間使用），
+            有分組時另有 grp
+        """
+        where, params = self.createWhere(conditions)
+        grp, groupBy = self.createGroup(group)
+        query = (f"SELECT {grp}trade_date DIV 100 AS ym, SUM(price_nuit) AS total, COUNT(*) AS count, "
+                 "SUM(price_nuit * 1.0 * price_nuit) AS sumsq "
+                 f"FROM lvr_lnd WHERE {where} GROUP BY {groupBy}ym ORDER BY {groupBy}ym")
+        return (query, params)
+
+    def createGroup(self, group=None):
+        """
+        分組欄位的 SELECT 與 GROUP BY 片段
+        Return
+            (string, string) 例如 ("town_code AS grp, ", "grp, ")，沒有分組時為 ("", "")
+        """
+        if group is None:
+            return ("", "")
+        if group not in self.GROUP_COLUMNS:
+            raise ValueError(f"無法分組的欄位: {group}")
+        return (f"{group} AS grp, ", "grp, ")
+
+    def canUsePrecomputed(self, conditions):
+        """
+        是否可以由預先彙整的每月統計 lvr_lnd_monthly 回答（沒有地址條件，價格與面積為預設範圍，屋齡區間的兩端為 AGE_BOUNDARIES）
+        Return
+            bool
+        """
+        for column, value in conditions.items():
+            if value is None or value == "":
+                continue
+            if column == "age":
+                if not self.isAgeBucket(value):
+                    return False
+                continue
+            if column in self.PRECOMPUTED_COLUMNS:
+                continue
+            if column in ("price_nuit", "total_area") and list(value) == self.DEFAULT_RANGE:
+                continue
+            return False
+        return True
+
+    def isAgeBucket(self, value):
+        """
+        屋齡條件是否可以由預先彙整的屋齡區間組成（[下限, 上限]，下限為邊界，上限為邊界或沒有上限）
+        Return
+            bool
+        """
+        if not isinstance(value, list) or len(value) != 2:
+            return False
+        low, high = value
+        return low in self.AGE_BOUNDARIES and (high in self.AGE_BOUNDARIES or high >= self.AGE_UNBOUNDED) and low <= high
+
+    def createPrecomputedQuery(self, conditions, group=None):
+        """
+        由預先彙整的每月統計查詢每月的單價總和與筆數，結果欄位與 createMonthlyQuery 相同（ym, total, count, sumsq），
+        只能在 canUsePrecomputed 為 True 時使用，group 參考 createMonthlyQuery
+        Return
+            (string, list) 查詢語句與參數
+        """
+        filters = {column: value for column, value in conditions.items()
+                   if column in self.PRECOMPUTED_COLUMNS and column != "trade_date"}
+        where, params = self.createWhere(filters)
+        clauses = [where] if where else []
+        trade_date = conditions.get("trade_date")
+        if isinstance(trade_date, list) and len(trade_date) == 2:
+            # 交易日期條件為整個月份，換算為交易年月
+            clauses.append("trade_ym BETWEEN %s AND %s")
+            params.append(self.adjust_trade_date(trade_date[0])[0] // 100)
+            params.append(self.adjust_trade_date(trade_date[1])[1] // 100)
+        grp, groupBy = self.createGroup(group)
+        query = (f"SELECT {grp}trade_ym AS ym, SUM(price_sum) AS total, SUM(price_count) AS count, "
+                 "SUM(price_sumsq) AS sumsq "
+                 f"FROM lvr_lnd_monthly WHERE {' AND '.join(clauses) or '1 = 1'} "
+                 f"GROUP BY {groupBy}trade_ym ORDER BY {groupBy}trade_ym")
+        return (query, params)
+
+    def createAddressCondition(self, value):
+        """
+        地址（社區名稱）搜尋條件
+        使用全文索引時以片語搜尋 "關鍵字"，ngram 會拆成連續的雙字詞並要求相鄰，結果與 LIKE '%關鍵字%' 相同；
+        關鍵字比 ngram 詞長短（單一個字）時無法使用全文索引，改用 LIKE
+        Return
+            (string, string) 條件與參數
+        """
+        value = str(value).strip()
+        if self.address_search == "fulltext" and len(value) >= self.NGRAM_SIZE:
+            # 移除雙引號，整個關鍵字作為一個片語
+            phrase = value.replace('"', '')
+            return ("MATCH(address) AGAINST (%s IN BOOLEAN MODE)", f'"{phrase}"')
+        return ("address LIKE %s", f"%{value}%")  # 使用 % 符號進行模糊匹配
+
+    def createWhere(self, conditions):
+        """
+        依條件產生 WHERE 子句
+        Return
+            (string, list) WHERE 子句（不含 WHERE）與參數
+        """
         query_conditions = []
         params = []
 
@@ -83,16 +252,16 @@ class Select:
                     query_conditions.append(f"{column} IN ({placeholders})")
                     params.extend(value)  # 將列表中的每個值加入到 params
             elif column == "address" and value:  # 處理 address 欄位且非空
-                query_conditions.append(f"{column} LIKE %s")
-                params.append(f"%{value}%")  # 使用 % 符號進行模糊匹配
+                condition, param = self.createAddressCondition(value)
+                query_conditions.append(condition)
+                params.append(param)
             else:
                 # 處理其他欄位的單一條件
                 query_conditions.append(f"{column} = %s")
                 params.append(value)
 
-        # 將條件連接起來，並生成最終查詢語句
-        query += " AND ".join(query_conditions)
-        return (query, params)
+        # 將條件連接起來
+        return (" AND ".join(query_conditions), params)
 
 
 # conditions = {
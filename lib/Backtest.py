@@ -0,0 +1,204 @@
+"""
+    預測模型的滾動回測（walk-forward）
+
+    對每一個 (縣市, 鄉鎮市區, 交易標的) 的每月序列，依序以第 t 個月（含）以前的資料擬合，
+    預測 t + k 個月的平均單價，與實際的平均單價比較，輸出各預測期數的 MAE / MAPE 與處理速度
+    （實際平均單價 <= 0 的預測無法計算百分比誤差，不計入 MAPE，另外輸出排除的數量）
+
+    一次迴歸（linear）以累計值計算：n、Σx、Σy、Σxy、Σx² 沿時間累加（np.cumsum）後，
+    每個起點的斜率與截距都是封閉解，一個序列的所有起點只需要 O(n)，不必每個起點重新擬合；
+    其他模型（lib/Models.py）每個起點重新擬合，較慢
+
+    使用方式（在專案根目錄執行）:
+        python lib/Backtest.py --db store/lvr_lnd.sqlite3 --horizons 1 3 6 12
+        python lib/Backtest.py --city A --model huber
+        python lib/Backtest.py --simulate 1000000
+        python lib/Backtest.py --store store/lvr_lnd --city A
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# 添加父目錄到系統路徑，以便導入 lib
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib.Database import openDatabase
+from lib.LinearFit import monthIndex
+from lib.Models import MODELS, getModel
+from lib.MonthlyAggregate import monthlySlices
+from lib.SQLite import SQLite
+
+
+def mape(error, actual):
+    """
+    平均絕對百分比誤差，實際值 <= 0（或 nan）的預測不計入（除以 0 或負數沒有意義）
+
+    Example:
+        >>> mape([10, -5, 3], [100, 50, 0])
+        (0.1, 1)
+
+    Returns:
+        (float, int): (MAPE, 排除的預測數)，沒有可計算的預測時 MAPE 為 nan
+    """
+    error = np.abs(np.asarray(error, dtype=np.float64))
+    actual = np.asarray(actual, dtype=np.float64)
+    valid = actual > 0
+    excluded = int(actual.size - np.count_nonzero(valid))
+    if not valid.any():
+        return float("nan"), excluded
+    return float(np.mean(error[valid] / actual[valid])), excluded
+
+
+def walkForward(ym, y, weight=None, horizons=(1,), min_train=12):
+    """
+    以累計值計算一個序列所有起點的一次迴歸預測
+
+    Args:
+        ym: 交易年月（由舊到新排序）
+        y: 各該年月平均單價
+        weight: 各該年月的權重（交易筆數），預設每月為 1
+        horizons: 預測期數（月），例如 (1, 3, 6)
+        min_train: 擬合至少需要的月份數
+
+    Returns:
+        (int, dict): (起點數, {期數: (預測值, 實際值)})，只包含目標月份有交易的預測
+    """
+    x = monthIndex(np.asarray(ym, dtype=np.int64), int(ym[0])).astype(np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    w = np.ones_like(y) if weight is None else np.asarray(weight, dtype=np.float64)
+    # 起點 i 的累計值為前 i + 1 個月的總和
+    n = np.cumsum(w)
+    sx = np.cumsum(w * x)
+    sy = np.cumsum(w * y)
+    sxy = np.cumsum(w * x * y)
+    sxx = np.cumsum(w * x * x)
+
+    origins = np.arange(min_train - 1, len(x) - 1)
+    if len(origins) == 0:
+        return 0, {h: (np.empty(0), np.empty(0)) for h in horizons}
+    n, sx, sy, sxy, sxx = n[origins], sx[origins], sy[origins], sxy[origins], sxx[origins]
+    denominator = n * sxx - sx * sx
+    valid = denominator > 1e-12 * n * sxx
+    slope = np.where(valid, (n * sxy - sx * sy) / np.where(valid, denominator, 1.0), 0.0)
+    intercept = (sy - slope * sx) / n
+
+    results = {}
+    for h in horizons:
+        target = x[origins] + h
+        position = np.minimum(np.searchsorted(x, target), len(x) - 1)
+        found = x[position] == target
+        results[h] = ((intercept + slope * target)[found], y[position[found]])
+    return len(origins), results
+
+
+def walkForwardModel(name, ym, y, weight=None, horizons=(1,), min_train=12):
+    """
+    與 walkForward 相同，但每個起點以 lib/Models.py 的模型重新擬合
+    """
+    ym = np.asarray(ym, dtype=np.int64)
+    x = monthIndex(ym, int(ym[0]))
+    predictions = {h: ([], []) for h in horizons}
+    origins = range(min_train - 1, len(ym) - 1)
+    for i in origins:
+        model = getModel(name).fit(ym[:i + 1], y[:i + 1], None if weight is None else weight[:i + 1])
+        for h in horizons:
+            position = np.searchsorted(x, x[i] + h)
+            if position < len(x) and x[position] == x[i] + h:
+                # 目標年月 = 起點年月往後 h 個月
+                target = ym[position]
+                predictions[h][0].append(model.predict([target])[0])
+                predictions[h][1].append(y[position])
+    return len(origins), {h: (np.array(p), np.array(a)) for h, (p, a) in predictions.items()}
+
+
+def backtest(slices, model="linear", horizons=(1, 3, 6), min_train=12, weighted=True) -> dict:
+    """
+    回測所有序列
+
+    Args:
+        slices: MonthlyAggregate.monthlySlices 的結果
+        model: 模型名稱，"linear" 使用累計值，其他模型每個起點重新擬合
+        horizons: 預測期數（月）
+        min_train: 擬合至少需要的月份數
+        weighted: 是否以交易筆數加權
+
+    Returns:
+        dict: {"slices": 序列數, "origins": 起點（擬合）數, "seconds": 秒數,
+               "horizons": {期數: {"count": 預測數, "mae": MAE, "mape": MAPE, "excluded": 不計入 MAPE 的預測數}}}
+    """
+    if model not in MODELS:
+        raise ValueError(f"未知的模型: {model}，可使用 {', '.join(MODELS)}")
+    errors = {h: [] for h in horizons}
+    actuals = {h: [] for h in horizons}
+    origins = 0
+    start = time.perf_counter()
+    for ym, mean, count, _ in slices.values():
+        weight = count if weighted else None
+        if model == "linear":
+            fits, results = walkForward(ym, mean, weight, horizons, min_train)
+        else:
+            fits, results = walkForwardModel(model, ym, mean, weight, horizons, min_train)
+        origins += fits
+        for h, (predicted, actual) in results.items():
+            errors[h].append(np.abs(predicted - actual))
+            actuals[h].append(actual)
+    seconds = time.perf_counter() - start
+
+    metrics = {}
+    for h in horizons:
+        error = np.concatenate(errors[h]) if errors[h] else np.empty(0)
+        actual = np.concatenate(actuals[h]) if actuals[h] else np.empty(0)
+        percentage, excluded = mape(error, actual)
+        metrics[h] = {
+            "count": len(error),
+            "mae": float(error.mean()) if len(error) else float("nan"),
+            "mape": percentage,
+            "excluded": excluded,
+        }
+    return {"slices": len(slices), "origins": origins, "seconds": seconds, "horizons": metrics}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="預測模型的滾動回測")
+    parser.add_argument("--db", default=None, help="SQLite 資料庫檔案，預設使用 LVR_BACKEND 的資料庫")
+    parser.add_argument("--store", default=None, help="Parquet 欄式快取資料夾（lib/ColumnStore.py），不需要資料庫")
+    parser.add_argument("--simulate", type=int, default=None, metavar="ROWS", help="改用模擬資料（筆數）")
+    parser.add_argument("--city", default=None, help="只回測這個縣市")
+    parser.add_argument("--model", default="linear", choices=list(MODELS), help="預測模型")
+    parser.add_argument("--horizons", type=int, nargs="+", default=[1, 3, 6, 12], help="預測期數（月）")
+    parser.add_argument("--min-train", type=int, default=12, help="擬合至少需要的月份數")
+    parser.add_argument("--unweighted", action="store_true", help="不以交易筆數加權")
+    args = parser.parse_args()
+
+    with contextlib.ExitStack() as stack:
+        if args.simulate:
+            from lib.Benchmark import make_table
+            directory = stack.enter_context(tempfile.TemporaryDirectory())
+            db = stack.enter_context(SQLite(os.path.join(directory, "backtest.sqlite3")))
+            print(f"產生 {args.simulate} 筆模擬資料...")
+            make_table(db, args.simulate)
+        else:
+            if args.store:
+                from lib.ColumnStore import ColumnStore
+                db = stack.enter_context(ColumnStore(args.store))
+            else:
+                db = stack.enter_context(SQLite(args.db) if args.db else openDatabase())
+            if db.connection is None:
+                sys.exit(1)
+        start = time.perf_counter()
+        slices = monthlySlices(db, args.city, args.min_train + 1)
+        load_seconds = time.perf_counter() - start
+
+    result = backtest(slices, args.model, args.horizons, args.min_train, not args.unweighted)
+    seconds = result["seconds"]
+    print(f"讀取 {result['slices']} 個序列，耗時 {load_seconds:.2f} 秒")
+    print(f"模型 {args.model}：{result['origins']} 個起點，耗時 {seconds:.3f} 秒，"
+          f"每秒 {result['origins'] / seconds if seconds > 0 else 0:,.0f} 次擬合")
+    print(f"{'期數':>4}{'預測數':>10}{'MAE(元/平方公尺)':>18}{'MAPE':>9}{'MAPE 排除':>10}")
+    for h, metric in result["horizons"].items():
+        print(f"{h:>4}{metric['count']:>10}{metric['mae']:>18,.0f}{metric['mape'] * 100:>8.2f}%{metric['excluded']:>10}")
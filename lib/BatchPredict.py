@@ -0,0 +1,97 @@
+"""
+    批次預測
+
+    GUI 一次只預測一組查詢條件的一個目標年月，畫出 24 個月的價格曲線或比較縣市內所有鄉鎮市區時需要重複查詢與擬合，
+    這裡以一個分組的每月彙整查詢（Select.createMonthlyQuery(conditions, group)）取得所有組的每月平均單價，
+    再以 predictive_model_batch 一次預測所有組與所有目標年月
+
+    使用方式（在專案根目錄執行）:
+        python lib/BatchPredict.py --city A --start 114 1 --months 24
+        python lib/BatchPredict.py --city A --town A02 --group trade_sign --ptype 1 2 --start 114 1 --months 12
+"""
+
+import argparse
+import os
+import sys
+
+# 添加父目錄到系統路徑，以便導入 lib、Select 與 predictive_model
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib import params
+from lib.Database import openDatabase
+from lib.MonthlyAggregate import queryMonthly
+from lib.Tools import Tools
+from Select import Select
+from predictive_model import predictive_model_batch
+
+
+def targetMonths(year: int, month: int, months: int):
+    """
+    由 (年, 月) 開始連續 months 個月的目標年月
+
+    Example:
+        >>> targetMonths(114, 11, 3)
+        [(114, 11), (114, 12), (115, 1)]
+    """
+    start = year * 12 + month - 1
+    return [(index // 12, index % 12 + 1) for index in range(start, start + months)]
+
+
+def predictBatch(inputs: dict, targets, group: str = "town_code", db=None) -> dict:
+    """
+    以一次分組查詢預測多組資料的多個目標年月
+
+    Args:
+        inputs: GUI 的輸入資料表（user_input_list），分組欄位的單一條件（例如 town）會被忽略
+        targets: 目標年月，每個元素為 (年, 月)
+        group: 分組欄位（Select.GROUP_COLUMNS）
+        db: 已連線的資料庫，預設開啟 lib.Database.openDatabase()
+
+    Returns:
+        dict: {"groups": 各組名稱, "targets": 目標年月, "prices": (組數, 目標年月數) 的預測單價（萬元/坪）, "count": 交易筆數}
+    """
+    tools = Tools()
+    sqlParams = tools.changeToSelectDict(inputs)
+    # 分組欄位的單一條件（例如指定的鄉鎮市區）改為所有組，區間或多選條件（屋齡、交易標的）仍作為篩選
+    if not isinstance(sqlParams.get(group), list):
+        sqlParams[group] = None
+    if db is None:
+        with openDatabase() as db:
+            return predictBatch(inputs, targets, group, db)
+
+    # 沒有價格、面積與地址條件時先使用預先彙整的每月統計
+    grouped_data, count, grouped_stats = queryMonthly(db, sqlParams, group)
+
+    if not grouped_data:
+        return {"groups": [], "targets": list(targets), "prices": None, "count": 0}
+    # 以每月交易筆數加權擬合
+    groups, prices = predictive_model_batch(targets, grouped_data, grouped_stats)
+    return {"groups": groups, "targets": list(targets), "prices": prices, "count": count}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="批次預測多組資料的多個目標年月")
+    parser.add_argument("--city", required=True, help="縣市代號")
+    parser.add_argument("--town", default=None, help="鄉鎮市區代號（分組欄位不是 town_code 時使用）")
+    parser.add_argument("--group", default="town_code", choices=Select.GROUP_COLUMNS, help="分組欄位")
+    parser.add_argument("--ptype", type=int, nargs="+", default=[1], help="交易標的")
+    parser.add_argument("--period", type=int, nargs=4, default=[101, 1, 113, 12], metavar=("Y1", "M1", "Y2", "M2"),
+                        help="資料期間（起始年 起始月 結束年 結束月）")
+    parser.add_argument("--start", type=int, nargs=2, required=True, metavar=("Y", "M"), help="第一個目標年月")
+    parser.add_argument("--months", type=int, default=12, help="目標年月數")
+    args = parser.parse_args()
+
+    inputs = {
+        'pmoney_unit': 1, 'minp': None, 'maxp': None, 'unit': 1, 'mins': None, 'maxs': None,
+        'p_startY': args.period[0], 'p_startM': args.period[1], 'p_endY': args.period[2], 'p_endM': args.period[3],
+        'city': args.city, 'town': args.town, 'ptype': args.ptype, 'p_build': '', 'avg_var': None,
+    }
+    result = predictBatch(inputs, targetMonths(args.start[0], args.start[1], args.months), args.group)
+    if result["count"] == 0:
+        print("沒有可進行預測的資料")
+        sys.exit(1)
+
+    names = {town['code']: town['title'] for town in params.town.get(args.city, [])}
+    print(f"查詢到 {result['count']} 筆交易紀錄，預測單價（萬元/坪）")
+    print("\t" + "\t".join(f"{year}/{month}" for year, month in result["targets"]))
+    for group, prices in zip(result["groups"], result["prices"]):
+        print(f"{names.get(group, group)}\t" + "\t".join(f"{price:.2f}" for price in prices))
@@ -0,0 +1,341 @@
+"""
+    效能測試
+
+    使用方式（在專案根目錄執行）:
+        python lib/Benchmark.py ingest --rows 2000000
+        python lib/Benchmark.py town --rows 1000000
+        python lib/Benchmark.py address --city A 大安路 忠孝東路 信義
+        python lib/Benchmark.py monthly --rows 1000000
+        python lib/Benchmark.py fit --months 12 60 156
+        python lib/Benchmark.py models --db store/lvr_lnd.sqlite3
+"""
+
+import argparse
+import contextlib
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+# 添加父目錄到系統路徑，以便導入 lib
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib import params
+from lib.Backtest import mape
+from lib.BulkLoader import BulkLoader
+from lib.DataFormatting import DataFormatter
+from lib.Models import MODELS, getModel
+from lib.MonthlyAggregate import monthlySlices, refresh
+from lib.MySQL import MySQL
+from lib.SQLite import SQLite
+from lib.Tools import Tools
+from lib.TownIndex import TownIndex
+from Select import Select
+from predictive_model import predictive_model
+
+# 主檔欄位（中文、英文兩行標題）
+MAIN_HEADER = [
+    ('鄉鎮市區', 'The villages and towns urban district'),
+    ('交易標的', 'transaction sign'),
+    ('土地位置建物門牌', 'land sector position building sector house number plate'),
+    ('土地移轉總面積平方公尺', 'land shifting total area square meter'),
+    ('交易年月日', 'transaction year month and day'),
+    ('建物移轉總面積平方公尺', 'building shifting total area'),
+    ('總價元', 'total price NTD'),
+    ('單價元平方公尺', 'the unit price (NTD / square meter)'),
+    ('編號', 'serial number'),
+]
+BUILD_HEADER = [
+    ('編號', 'serial number'),
+    ('屋齡', 'building age'),
+    ('建物移轉面積平方公尺', 'building shifting area'),
+]
+TRADE_SIGNS = ['房地(土地+建物)', '房地(土地+建物)+車位', '建物', '土地', '車位']
+
+
+def _timed(func, *args):
+    """執行並回傳 (結果, 秒數)"""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def make_corpus(directory: str, rows: int, city_code: str = 'A', seed: int = 0):
+    """產生模擬的實價登錄 csv（主檔與建物檔）
+
+    Args:
+        directory: 輸出資料夾
+        rows: 資料筆數
+        city_code: 縣市代號
+    """
+    rng = random.Random(seed)
+    towns = [town['title'] for town in params.town[city_code]]
+    city_name = params.city[city_code]
+    prefix = os.path.join(directory, f"{city_code.lower()}_lvr_land_a")
+    with open(f"{prefix}.csv", 'w', encoding='utf-8-sig') as main, \
+            open(f"{prefix}_build.csv", 'w', encoding='utf-8-sig') as build:
+        main.write(','.join(name for name, _ in MAIN_HEADER) + '\n')
+        main.write(','.join(name for _, name in MAIN_HEADER) + '\n')
+        build.write(','.join(name for name, _ in BUILD_HEADER) + '\n')
+        build.write(','.join(name for _, name in BUILD_HEADER) + '\n')
+        for i in range(rows):
+            town = rng.choice(towns)
+            area = rng.uniform(20, 200)
+            unit = rng.randint(50000, 400000)
+            code = f"RPA{i:010d}"
+            main.write(f"{town},{rng.choice(TRADE_SIGNS)},{city_name}{town}某路{rng.randint(1, 999)}號,"
+                       f"{area / 3:.2f},{rng.randint(101, 113)}{rng.randint(1, 12):02d}{rng.randint(1, 28):02d},"
+                       f"{area:.2f},{int(area * unit)},{unit},{code}\n")
+            build.write(f"{code},{rng.randint(0, 60)},{area:.2f}\n")
+
+
+def bench_ingest(rows: int):
+    """比較逐列處理（process_source）與批次處理（process_source_batch）的速度"""
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"產生 {rows} 筆模擬資料...")
+        make_corpus(directory, rows)
+
+        row_result, row_seconds = _timed(DataFormatter().process_source, directory)
+        batch_result, batch_seconds = _timed(DataFormatter().process_source_batch, directory)
+
+    print(f"逐列處理: {len(row_result)} 筆, {row_seconds:.2f} 秒, {len(row_result) / row_seconds:,.0f} 筆/秒")
+    print(f"批次處理: {len(batch_result)} 筆, {batch_seconds:.2f} 秒, {len(batch_result) / batch_seconds:,.0f} 筆/秒")
+    print(f"加速倍數: {row_seconds / batch_seconds:.1f}x")
+
+
+def bench_town(rows: int):
+    """比較逐一掃描 params.town 與鄉鎮市區索引的速度"""
+    rng = random.Random(0)
+    cities = [city_code for city_code in params.town]
+    samples = []
+    for _ in range(rows):
+        city_code = rng.choice(cities)
+        title = rng.choice(params.town[city_code])['title']
+        samples.append((city_code, title, f"{params.city[city_code]}{title}某路{rng.randint(1, 999)}號"))
+
+    def scan_name():
+        return [next((item['code'] for item in params.town[city_code] if item['title'] == title), None)
+                for city_code, title, _ in samples]
+
+    def scan_address():
+        return [next((item['code'] for item in params.town[city_code] if item['title'] in address), '')
+                for city_code, _, address in samples]
+
+    index, build_seconds = _timed(TownIndex, params.town)
+
+    def index_name():
+        return [index.code(city_code, title) for city_code, title, _ in samples]
+
+    def index_address():
+        return [index.find(city_code, address)['code'] for city_code, _, address in samples]
+
+    print(f"建立索引: {build_seconds * 1000:.2f} ms")
+    for name, scan, indexed in [('名稱 => 代碼', scan_name, index_name), ('地址 => 代碼', scan_address, index_address)]:
+        scan_result, scan_seconds = _timed(scan)
+        index_result, index_seconds = _timed(indexed)
+        mismatch = sum(a != b for a, b in zip(scan_result, index_result))
+        print(f"{name}: 逐一掃描 {scan_seconds:.2f} 秒, 索引 {index_seconds:.2f} 秒, "
+              f"加速 {scan_seconds / index_seconds:.1f}x, 結果不同 {mismatch} 筆")
+
+
+def bench_address(city_code: str, terms, repeat: int):
+    """比較地址 LIKE 與 ngram 全文索引的查詢速度，需要資料庫連線並已執行 python lib/Migration.py migrate"""
+    with MySQL() as db:
+        if db.connection is None:
+            return
+        for term in terms:
+            results = {}
+            for mode in ['like', 'fulltext']:
+                query, query_params = Select(mode).createQuery({'city_code': city_code, 'address': term}, ['code'])
+                query = f"SELECT COUNT(*) AS count FROM ({query}) AS matched"
+                seconds = []
+                for _ in range(repeat):
+                    result, elapsed = _timed(db.query, query, query_params)
+                    seconds.append(elapsed)
+                # 取中位數，避免第一次查詢的快取影響
+                results[mode] = (result[0]['count'] if result else 0, sorted(seconds)[len(seconds) // 2])
+            (like_count, like_seconds), (ft_count, ft_seconds) = results['like'], results['fulltext']
+            print(f"{term}: LIKE {like_count} 筆 {like_seconds * 1000:.1f} ms, "
+                  f"全文索引 {ft_count} 筆 {ft_seconds * 1000:.1f} ms, 加速 {like_seconds / ft_seconds:.1f}x")
+
+
+def make_table(db, rows: int, city_code: str = 'A', seed: int = 0):
+    """在資料庫中產生模擬的 lvr_lnd 資料並計算每月統計"""
+    rng = random.Random(seed)
+    towns = [town['code'] for town in params.town[city_code]]
+    data = ((city_code, params.city[city_code], rng.choice(towns), '', rng.choice([1, 2, 3, 4, 5]), '',
+             rng.randint(101, 113) * 10000 + rng.randint(1, 12) * 100 + rng.randint(1, 28),
+             0, rng.randint(50000, 400000), rng.uniform(10, 200), '', rng.randint(0, 60))
+            for _ in range(rows))
+    BulkLoader(db).load(data)
+    refresh(db)
+    db.connection.execute("ANALYZE")
+    db.connection.commit()
+
+
+def bench_monthly(rows: int, repeat: int):
+    """比較彙整原始交易資料與預先彙整的每月統計（本機 SQLite）"""
+    tools = Tools()
+    select = Select(dialect='sqlite')
+    # 與 GUI 相同的查詢條件：鄉鎮市區、交易標的、日期範圍與屋齡區間，價格與面積不限
+    cases = [
+        ('鄉鎮市區 + 交易標的', {'town': 'A02', 'ptype': [1, 5], 'avg_var': None}),
+        ('鄉鎮市區 + 交易標的 + 屋齡', {'town': 'A02', 'ptype': [1, 5], 'avg_var': 2}),
+        ('整個縣市', {'town': None, 'ptype': [1, 2, 3, 4, 5], 'avg_var': None}),
+    ]
+    with tempfile.TemporaryDirectory() as directory, SQLite(os.path.join(directory, 'bench.sqlite3')) as db:
+        print(f"產生 {rows} 筆模擬資料...")
+        make_table(db, rows)
+        for name, case in cases:
+            conditions = tools.changeToSelectDict({
+                'pmoney_unit': 1, 'minp': None, 'maxp': None, 'unit': 1, 'mins': None, 'maxs': None,
+                'p_startY': 109, 'p_startM': 1, 'p_endY': 113, 'p_endM': 12, 'city': 'A',
+                'town': case['town'], 'ptype': case['ptype'], 'p_build': '', 'avg_var': case['avg_var'],
+            })
+            results = {}
+            for kind, (query, query_params) in [('原始資料', select.createMonthlyQuery(conditions)),
+                                                ('每月統計', select.createPrecomputedQuery(conditions))]:
+                seconds = []
+                for _ in range(repeat):
+                    result, elapsed = _timed(db.query, query, query_params)
+                    seconds.append(elapsed)
+                results[kind] = (tools.getKeyByMonthly(result).data, sorted(seconds)[len(seconds) // 2])
+            (raw, raw_seconds), (pre, pre_seconds) = results['原始資料'], results['每月統計']
+            same = raw.keys() == pre.keys() and all(abs(raw[key] - pre[key]) < 1e-6 for key in raw)
+            print(f"{name}: 原始資料 {raw_seconds * 1000:.2f} ms, 每月統計 {pre_seconds * 1000:.2f} ms, "
+                  f"加速 {raw_seconds / pre_seconds:.1f}x, 結果{'相同' if same else '不同'}")
+
+
+def predictive_model_polyfit(user_input_list, origin_data):
+    """修改前的 predictive_model（DataFrame + np.polyfit），作為比較的基準"""
+    import numpy as np
+    import pandas as pd
+    trade_time_month = list(origin_data.keys())
+    base_year = trade_time_month[0] // 100
+    base_month = trade_time_month[0] % 100
+    trade_time = [(year_month // 100 - base_year) * 12 + (year_month % 100 - base_month)
+                  for year_month in trade_time_month]
+    buy_time = (user_input_list["calculate_Y"] - base_year) * 12 + (user_input_list["calculate_M"] - base_month)
+    data = pd.DataFrame({'X': trade_time, 'Y': list(origin_data.values())})
+    slope, intercept = np.polyfit(data['X'], data['Y'], 1)
+    return (intercept + slope * buy_time) / 10000 / 0.3025
+
+
+def make_monthly(months: int, rng: random.Random):
+    """產生模擬的每月平均單價（隨機略過部分月份）"""
+    data = {}
+    year, month = 101, 1
+    while len(data) < months:
+        if rng.random() > 0.1:
+            data[year * 100 + month] = 100000 + 300 * len(data) + rng.gauss(0, 8000)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return data
+
+
+def _import_seconds(module: str) -> float:
+    """在新的行程中量測匯入模組的時間"""
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return float(result.stdout) if result.returncode == 0 else float("nan")
+
+
+def bench_fit(months, repeat: int):
+    """比較 DataFrame + np.polyfit 與累計值封閉解的擬合時間，並檢查結果是否相同"""
+    import numpy as np
+    rng = random.Random(0)
+    user_input = {"calculate_Y": 115, "calculate_M": 6}
+    print(f"匯入時間: pandas {_import_seconds('pandas') * 1000:.0f} ms, "
+          f"lib.LinearFit {_import_seconds('lib.LinearFit') * 1000:.0f} ms")
+    for count in months:
+        cases = [make_monthly(count, rng) for _ in range(repeat)]
+        old, old_seconds = _timed(lambda: [predictive_model_polyfit(user_input, data) for data in cases])
+        new, new_seconds = _timed(lambda: [predictive_model(user_input, data) for data in cases])
+        error = max(abs(a - b) / abs(a) for a, b in zip(old, new))
+        print(f"{count} 個月: polyfit {old_seconds / repeat * 1e6:.1f} us, 封閉解 {new_seconds / repeat * 1e6:.1f} us, "
+              f"加速 {old_seconds / new_seconds:.1f}x, 最大相對誤差 {error:.1e}")
+
+
+def bench_models(path: str, rows: int, city_code: str, holdout: int, min_months: int):
+    """
+    比較各預測模型的擬合時間與誤差：每個 (縣市, 鄉鎮市區, 交易標的) 的每月序列保留最後 holdout 個月，
+    以之前的月份擬合後預測保留的月份
+    """
+    import numpy as np
+    with contextlib.ExitStack() as stack:
+        if path:
+            db = stack.enter_context(SQLite(path))
+        else:
+            directory = stack.enter_context(tempfile.TemporaryDirectory())
+            db = stack.enter_context(SQLite(os.path.join(directory, 'bench.sqlite3')))
+            print(f"產生 {rows} 筆模擬資料...")
+            make_table(db, rows)
+        slices = monthlySlices(db, city_code, min_months + holdout)
+    print(f"{len(slices)} 個序列（至少 {min_months + holdout} 個月），保留最後 {holdout} 個月")
+    if not slices:
+        return
+
+    print(f"{'模型':<10}{'擬合次數':>8}{'每次擬合(us)':>14}{'MAE(元/平方公尺)':>18}{'MAPE':>9}{'MAPE 排除':>10}")
+    for name in MODELS:
+        errors = []
+        actual = []
+        seconds = 0.0
+        for ym, mean, count, _ in slices.values():
+            start = time.perf_counter()
+            model = getModel(name).fit(ym[:-holdout], mean[:-holdout], count[:-holdout])
+            seconds += time.perf_counter() - start
+            errors.append(model.predict(ym[-holdout:]) - mean[-holdout:])
+            actual.append(mean[-holdout:])
+        errors = np.abs(np.concatenate(errors))
+        percentage, excluded = mape(errors, np.concatenate(actual))
+        print(f"{name:<10}{len(slices):>8}{seconds / len(slices) * 1e6:>14.1f}{errors.mean():>18,.0f}"
+              f"{percentage * 100:>8.2f}%{excluded:>10}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="效能測試")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="csv 讀取與格式化")
+    ingest.add_argument("--rows", type=int, default=2000000, help="模擬資料筆數")
+
+    town = commands.add_parser("town", help="鄉鎮市區代碼查詢")
+    town.add_argument("--rows", type=int, default=1000000, help="查詢次數")
+
+    address = commands.add_parser("address", help="地址搜尋（LIKE 與全文索引）")
+    address.add_argument("--city", default="A", help="縣市代號")
+    address.add_argument("--repeat", type=int, default=5, help="每個關鍵字查詢次數")
+    address.add_argument("terms", nargs="+", help="搜尋的地址或社區名稱")
+
+    monthly = commands.add_parser("monthly", help="每月平均單價（原始資料與預先彙整的每月統計）")
+    monthly.add_argument("--rows", type=int, default=1000000, help="模擬資料筆數")
+    monthly.add_argument("--repeat", type=int, default=5, help="每種查詢的次數")
+
+    fit = commands.add_parser("fit", help="預測模型的迴歸擬合（np.polyfit 與累計值封閉解）")
+    fit.add_argument("--months", type=int, nargs="+", default=[12, 60, 156], help="每月平均單價的月份數")
+    fit.add_argument("--repeat", type=int, default=1000, help="每種月份數擬合的次數")
+
+    models = commands.add_parser("models", help="各預測模型的擬合時間與誤差（lib/Models.py）")
+    models.add_argument("--db", default=None, help="SQLite 資料庫檔案（python lib/SQLite.py 建立），預設產生模擬資料")
+    models.add_argument("--rows", type=int, default=500000, help="沒有指定 --db 時的模擬資料筆數")
+    models.add_argument("--city", default=None, help="只比較這個縣市")
+    models.add_argument("--holdout", type=int, default=6, help="保留作為驗證的最後月份數")
+    models.add_argument("--min-months", type=int, default=24, help="擬合至少需要的月份數")
+
+    args = parser.parse_args()
+    # 顯示每個檔案的處理統計
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    if args.command == "ingest":
+        bench_ingest(args.rows)
+    elif args.command == "town":
+        bench_town(args.rows)
+    elif args.command == "address":
+        bench_address(args.city, args.terms, args.repeat)
+    elif args.command == "monthly":
+        bench_monthly(args.rows, args.repeat)
+    elif args.command == "fit":
+        bench_fit(args.months, args.repeat)
+    elif args.command == "models":
+        bench_models(args.db, args.rows, args.city, args.holdout, args.min_months)
@@ -0,0 +1,300 @@
+import os
+import re
+import sys
+import tempfile
+import time
+
+# 添加父目錄到系統路徑，以便導入 lib
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib.QueryCache import touchDataVersion
+
+'''
+lvr_lnd 大量匯入
+
+原本 CreateLvrData.insertSQL 每 1000 筆呼叫一次 executemany 並提交，匯入全部歷史資料需要數小時，
+這裡改為：
+    1. 將整理後的資料串流寫入暫存的 TSV 檔案（不必把所有 SQL 參數留在記憶體）
+    2. 匯入前移除次要索引，匯入後一次重建（逐筆更新索引比一次建立慢很多）
+    3. MySQL 使用 LOAD DATA LOCAL INFILE 匯入，伺服器不允許時改用大量多列 VALUES 的 INSERT
+    4. SQLite 使用 executemany（SQLite 沒有 LOAD DATA，executemany 在同一個交易中已經很快）
+'''
+
+# 匯入的欄位，順序與 TSV 相同
+COLUMNS = ("city_code", "city_name", "town_code", "town_name", "trade_sign", "address",
+           "trade_date", "price_total", "price_nuit", "total_area", "code", "age")
+
+# TSV 跳脫字元，與 LOAD DATA 預設的 FIELDS ESCAPED BY '\\' 相同
+ESCAPE = {"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r", "\0": "\\0"}
+ESCAPE_TABLE = str.maketrans(ESCAPE)
+UNESCAPE = {value: key for key, value in ESCAPE.items()}
+UNESCAPE_PATTERN = re.compile(r"\\[\\tnr0]")
+# 空值
+NULL = "\\N"
+
+def escape(value):
+    '''
+    將欄位值轉換為 TSV 文字
+    Args:
+        value: 欄位值，None 轉換為 \\N
+    Return:
+        string
+    '''
+    if value is None:
+        return NULL
+    return str(value).translate(ESCAPE_TABLE)
+
+def unescape(text):
+    '''
+    escape 的反向轉換
+    '''
+    if text == NULL:
+        return None
+    if "\\" not in text:
+        return text
+    return UNESCAPE_PATTERN.sub(lambda match: UNESCAPE[match.group()], text)
+
+def toRow(item):
+    '''
+    將 CreateLvrData / DataFormatter 整理後的字典轉換為依 COLUMNS 排列的元組
+    (DataFormatter 的單價欄位為 price_unit，CreateLvrData 為 price_nuit)
+    '''
+    return tuple(item.get("price_nuit", item.get("price_unit")) if column == "price_nuit" else item.get(column)
+                 for column in COLUMNS)
+
+class BulkLoader:
+    '''
+    lvr_lnd 大量匯入
+    with MySQL(local_infile=True) as db:
+        stats = BulkLoader(db).load(CreateLvrData().getData(1), replace=True)
+    '''
+
+    def __init__(self, db, table="lvr_lnd", batch=10000, dialect=None):
+        '''
+        Args:
+            db: 已連線的資料庫物件（MySQL），需要有 connection 屬性
+            table: 資料表名稱
+            batch: 多列 VALUES 每次寫入的筆數
+            dialect: "mysql" 或 "sqlite"，預設使用 db.dialect，沒有時為 "mysql"
+        '''
+        self.db = db
+        self.table = table
+        self.batch = batch
+        self.dialect = dialect or getattr(db, "dialect", "mysql")
+
+    def load(self, rows, method="auto", rebuildIndexes=True, replace=False):
+        '''
+        匯入資料
+        Args:
+            rows: 字典或依 COLUMNS 排列的元組，可以是產生器
+            method: "auto" 先嘗試 LOAD DATA 失敗時改用 INSERT，"infile" 只使用 LOAD DATA，"insert" 只使用 INSERT
+            rebuildIndexes: 是否在匯入前移除次要索引，匯入後重建
+            replace: 是否先清空資料表，資料表已有資料且 replace 為 False 時不匯入（重複執行會讓資料重複）
+        Return:
+            dict {"rows": 筆數, "seconds": 秒數, "rowsPerSecond": 每秒筆數, "method": 實際使用的方式}
+        '''
+        connection = self.db.connection
+        if connection is None:
+            raise RuntimeError("資料庫尚未連線")
+        if replace:
+            self.clear()
+        elif not self.isEmpty():
+            raise RuntimeError(f"{self.table} 已有資料，重新匯入會讓資料重複，請以 replace=True 先清空資料表")
+        start = time.perf_counter()
+        fd, path = tempfile.mkstemp(prefix=f"{self.table}_", suffix=".tsv")
+        try:
+            # 第一步：串流寫入 TSV
+            count = 0
+            with os.fdopen(fd, "w", encoding="utf-8", newline="\n") as file:
+                for item in rows:
+                    row = toRow(item) if isinstance(item, dict) else item
+                    file.write("\t".join(escape(value) for value in row))
+                    file.write("\n")
+                    count += 1
+            print(f"已寫入暫存檔 {path}，共 {count} 筆，耗時 {time.perf_counter() - start:.1f} 秒")
+
+            # 第二步：移除次要索引後匯入，結束時一定重建索引
+            indexes = self.dropIndexes() if rebuildIndexes else []
+            try:
+                used = self._load(path, method)
+            finally:
+                if indexes:
+                    self.createIndexes(indexes)
+        finally:
+            os.remove(path)
+
+        # 資料已更新，讓查詢快取失效
+        touchDataVersion(self.db)
+        seconds = time.perf_counter() - start
+        stats = {"rows": count, "seconds": seconds, "rowsPerSecond": count / seconds if seconds > 0 else 0,
+                 "method": used}
+        print(f"匯入完成（{used}）：{count} 筆，耗時 {seconds:.1f} 秒，每秒 {stats['rowsPerSecond']:,.0f} 筆")
+        return stats
+
+    def _load(self, path, method):
+        '''
+        依 method 匯入 TSV，回傳實際使用的方式
+        '''
+        if self.dialect != "mysql":
+            self.loadValues(path)
+            return "insert"
+        # 匯入期間關閉唯一鍵與外鍵檢查（只影響目前的連線）
+        self._execute("SET SESSION unique_checks = 0, foreign_key_checks = 0")
+        try:
+            if method in ("auto", "infile"):
+                try:
+                    self.loadInfile(path)
+                    return "infile"
+                except Exception as e:
+                    if method == "infile":
+                        raise
+                    print(f"LOAD DATA LOCAL INFILE 失敗，改用 INSERT: {e}")
+                    self.db.connection.rollback()
+            self.loadValues(path)
+            return "insert"
+        finally:
+            self._execute("SET SESSION unique_checks = 1, foreign_key_checks = 1")
+
+    def _execute(self, sql):
+        cursor = self.db.connection.cursor()
+        try:
+            cursor.execute(sql)
+        finally:
+            cursor.close()
+
+    def isEmpty(self):
+        '''
+        資料表是否沒有資料
+        '''
+        cursor = self.db.connection.cursor()
+        try:
+            cursor.execute(f"SELECT 1 FROM {self.table} LIMIT 1")
+            return not cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def clear(self):
+        '''
+        清空資料表，MySQL 使用 TRUNCATE TABLE（比逐筆 DELETE 快很多），SQLite 沒有 TRUNCATE，使用 DELETE
+        '''
+        start = time.perf_counter()
+        if self.dialect == "sqlite":
+            self._execute(f"DELETE FROM {self.table}")
+        else:
+            self._execute(f"TRUNCATE TABLE {self.table}")
+        self.db.connection.commit()
+        print(f"已清空 {self.table}，耗時 {time.perf_counter() - start:.1f} 秒")
+
+    def loadInfile(self, path):
+        '''
+        以 LOAD DATA LOCAL INFILE 匯入 TSV，連線需要 allow_local_infile（MySQL(local_infile=True)），
+        伺服器需要開啟 local_infile
+        '''
+        cursor = self.db.connection.cursor()
+        try:
+            cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE {self.table} CHARACTER SET utf8mb4 "
+                "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+                f"({', '.join(COLUMNS)})",
+                (path,))
+            self.db.connection.commit()
+        finally:
+            cursor.close()
+
+    def loadValues(self, path):
+        '''
+        讀取 TSV，以每次 batch 筆的多列 VALUES 匯入，每批提交一次
+        '''
+        placeholder = "?" if self.dialect == "sqlite" else "%s"
+        row = f"({', '.join([placeholder] * len(COLUMNS))})"
+        sql = f"INSERT INTO {self.table} ({', '.join(COLUMNS)}) VALUES "
+        cursor = self.db.connection.cursor()
+        try:
+            with open(path, "r", encoding="utf-8", newline="\n") as file:
+                batch = []
+                for line in file:
+                    batch.append(tuple(unescape(value) for value in line.rstrip("\n").split("\t")))
+                    if len(batch) >= self.batch:
+                        self._insert(cursor, sql, row, batch)
+                        batch = []
+                if batch:
+                    self._insert(cursor, sql, row, batch)
+        except Exception:
+            self.db.connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def _insert(self, cursor, sql, row, batch):
+        if self.dialect == "sqlite":
+            # SQLite 的參數數量有上限，executemany 在同一個交易中效能與多列 VALUES 相同
+            cursor.executemany(sql + row, batch)
+        else:
+            cursor.execute(sql + ", ".join([row] * len(batch)), [value for values in batch for value in values])
+        self.db.connection.commit()
+
+    def dropIndexes(self):
+        '''
+        移除資料表的次要索引（不含主鍵、唯一索引、全文索引與函數索引）
+        Return:
+            list 重建索引用的定義
+        '''
+        cursor = self.db.connection.cursor()
+        try:
+            if self.dialect == "sqlite":
+                cursor.execute(
+                    "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL "
+                    "AND sql NOT LIKE 'CREATE UNIQUE%'", (self.table,))
+                indexes = cursor.fetchall()
+                for name, _ in indexes:
+                    cursor.execute(f"DROP INDEX {name}")
+            else:
+                cursor.execute(
+                    "SELECT INDEX_NAME, COLUMN_NAME, SUB_PART FROM information_schema.STATISTICS "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME <> 'PRIMARY' "
+                    "AND NON_UNIQUE = 1 AND INDEX_TYPE = 'BTREE' ORDER BY INDEX_NAME, SEQ_IN_INDEX", (self.table,))
+                columns = {}
+                skip = set()
+                for name, column, subPart in cursor.fetchall():
+                    if column is None:
+                        skip.add(name)
+                    else:
+                        columns.setdefault(name, []).append(f"`{column}`({subPart})" if subPart else f"`{column}`")
+                indexes = [(name, f"ADD INDEX `{name}` ({', '.join(parts)})")
+                           for name, parts in columns.items() if name not in skip]
+                if indexes:
+                    cursor.execute(f"ALTER TABLE {self.table} "
+                                   + ", ".join(f"DROP INDEX `{name}`" for name, _ in indexes))
+            self.db.connection.commit()
+            if indexes:
+                print(f"已移除索引：{', '.join(name for name, _ in indexes)}")
+            return indexes
+        finally:
+            cursor.close()
+
+    def createIndexes(self, indexes):
+        '''
+        重建 dropIndexes 移除的索引，MySQL 使用一個 ALTER TABLE 一次建立所有索引
+        '''
+        start = time.perf_counter()
+        cursor = self.db.connection.cursor()
+        try:
+            if self.dialect == "sqlite":
+                for _, sql in indexes:
+                    cursor.execute(sql)
+            else:
+                cursor.execute(f"ALTER TABLE {self.table} " + ", ".join(sql for _, sql in indexes))
+            self.db.connection.commit()
+            print(f"已重建索引，耗時 {time.perf_counter() - start:.1f} 秒")
+        finally:
+            cursor.close()
+
+if __name__ == '__main__':
+    import argparse
+    from lib.CreateLvrData import CreateLvrData
+
+    parser = argparse.ArgumentParser(description="將 opendata 的實價登錄資料大量匯入 lvr_lnd")
+    parser.add_argument("--method", default="auto", choices=["auto", "infile", "insert"], help="匯入方式")
+    parser.add_argument("--keep-indexes", action="store_true", help="匯入時不移除次要索引")
+    parser.add_argument("--replace", action="store_true", help="先清空 lvr_lnd（已有資料時必須指定，否則不匯入）")
+    args = parser.parse_args()
+    CreateLvrData().bulkLoad(args.method, not args.keep_indexes, args.replace)
@@ -0,0 +1,318 @@
+"""
+    實價登錄資料的欄式（Parquet）快取
+
+    DataFormatter.process_source / CreateLvrData.getData 整理後的資料為字典串列，
+    輸出成 all_data.json 後重新讀取非常慢，這裡改存成 Parquet 檔案：
+        store/lvr_lnd/city_code=A/trade_ym=11309/part-0.parquet
+    依縣市與交易年月分割資料夾，查詢與預測模型只需要讀取需要的欄位與分割
+
+    沒有資料庫時可以作為資料來源（LVR_BACKEND=parquet，lib.Database.openDatabase），
+    每月彙整（monthly）與 Select.createMonthlyQuery 的結果相同，由 lib.MonthlyAggregate.queryMonthly 使用
+"""
+
+import os
+import sys
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+# 添加父目錄到系統路徑，以便導入 lib 與 Select
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib.QueryCache import touchDataVersion
+from Select import Select
+
+# 預設存放位置
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'store', 'lvr_lnd')
+
+# 分割欄位，對應資料夾 city_code=A/trade_ym=11309
+PARTITIONS = ['city_code', 'trade_ym']
+
+# 欄位型別，與資料庫 lvr_lnd 的欄位相同，另外加上分割用的 trade_ym（交易年月）
+SCHEMA = pa.schema([
+    ('city_code', pa.string()),
+    ('city_name', pa.string()),
+    ('town_code', pa.string()),
+    ('town_name', pa.string()),
+    ('trade_sign', pa.int8()),
+    ('address', pa.string()),
+    ('trade_date', pa.int32()),
+    ('trade_ym', pa.int32()),
+    ('price_total', pa.int64()),
+    ('price_nuit', pa.int64()),
+    ('total_area', pa.float64()),
+    ('code', pa.string()),
+    ('age', pa.int16()),
+])
+PARTITION_SCHEMA = pa.schema([SCHEMA.field(name) for name in PARTITIONS])
+
+
+def _to_int(value) -> int:
+    """將字串或數字轉換為整數，無法轉換時回傳 0"""
+    try:
+        return int(str(value).replace(',', '').strip() or 0)
+    except ValueError:
+        return 0
+
+
+def _to_float(value) -> float:
+    """將字串或數字轉換為浮點數，無法轉換時回傳 0.0"""
+    try:
+        return float(str(value).replace(',', '').strip() or 0)
+    except ValueError:
+        return 0.0
+
+
+def to_table(rows: List[Dict]) -> pa.Table:
+    """將整理後的字典串列轉換為 Arrow 表格
+
+    Args:
+        rows: DataFormatter 或 CreateLvrData 輸出的資料
+            (DataFormatter 的單價欄位為 price_unit，CreateLvrData 為 price_nuit)
+
+    Returns:
+        pa.Table: 欄位型別依照 SCHEMA
+    """
+    columns = {name: [] for name in SCHEMA.names}
+    for row in rows:
+        trade_date = _to_int(row.get('trade_date'))
+        columns['city_code'].append(row.get('city_code') or '')
+        columns['city_name'].append(row.get('city_name') or '')
+        columns['town_code'].append(row.get('town_code') or '')
+        columns['town_name'].append(row.get('town_name') or '')
+        columns['trade_sign'].append(_to_int(row.get('trade_sign')))
+        columns['address'].append(row.get('address') or '')
+        columns['trade_date'].append(trade_date)
+        # 交易年月日 1130924 => 交易年月 11309
+        columns['trade_ym'].append(trade_date // 100)
+        columns['price_total'].append(_to_int(row.get('price_total')))
+        columns['price_nuit'].append(_to_int(row.get('price_nuit', row.get('price_unit'))))
+        columns['total_area'].append(_to_float(row.get('total_area')))
+        columns['code'].append(row.get('code') or '')
+        columns['age'].append(_to_int(row.get('age')))
+    return pa.table(columns, schema=SCHEMA)
+
+
+def frame_to_table(df: pd.DataFrame) -> pa.Table:
+    """將 DataFormatter 批次處理輸出的 DataFrame 轉換為 Arrow 表格
+
+    Args:
+        df: DataFormatter.process_source_batch / process_sources_parallel 的結果
+
+    Returns:
+        pa.Table: 欄位型別依照 SCHEMA
+    """
+    trade_date = pd.to_numeric(df['trade_date'], errors='coerce').fillna(0).to_numpy(dtype=np.int64)
+    columns = {
+        'city_code': df['city_code'].astype(str),
+        'city_name': df['city_name'].astype(str),
+        'town_code': df['town_code'].astype(str),
+        'town_name': df['town_name'].astype(str),
+        'trade_sign': df['trade_sign'].to_numpy(dtype=np.int8),
+        'address': df['address'].astype(str),
+        'trade_date': trade_date.astype(np.int32),
+        # 交易年月日 1130924 => 交易年月 11309
+        'trade_ym': (trade_date // 100).astype(np.int32),
+        'price_total': df['price_total'].to_numpy(dtype=np.int64),
+        'price_nuit': df['price_nuit' if 'price_nuit' in df else 'price_unit'].to_numpy(dtype=np.int64),
+        'total_area': df['total_area'].to_numpy(dtype=np.float64),
+        'code': df['code'].astype(str),
+        'age': df['age'].to_numpy(dtype=np.int16),
+    }
+    return pa.table({name: pa.array(values, type=SCHEMA.field(name).type) for name, values in columns.items()},
+                    schema=SCHEMA)
+
+
+def _value(column: str, value):
+    """將查詢條件的值（GUI 的輸入為字串）轉換為欄位的型別"""
+    kind = SCHEMA.field(column).type
+    if pa.types.is_integer(kind):
+        return int(value)
+    if pa.types.is_floating(kind):
+        return float(value)
+    return str(value)
+
+
+class ColumnStore:
+    """依縣市與交易年月分割的 Parquet 資料集
+
+    與 MySQL / SQLite 相同可以用 with 開啟，開啟後 connection 為資料集（資料不存在時為 None）：
+        with ColumnStore() as db:
+            rows = db.monthly(conditions)
+    """
+
+    dialect = "parquet"
+
+    def __init__(self, root: str = DEFAULT_ROOT):
+        self.root = root
+        self.connection = None
+
+    def __enter__(self):
+        if os.path.isdir(self.root):
+            self.connection = self.dataset()
+        else:
+            print(f"資料不存在: {self.root}")
+            print("請先執行 lib/DataFormatting.py 產生資料")
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connection = None
+
+    def write(self, rows) -> int:
+        """寫入資料，相同縣市與交易年月的分割會被整個取代，
+        所以同一個分割的資料需要在同一次寫入
+
+        Args:
+            rows: 字典串列、DataFrame 或 pa.Table
+
+        Returns:
+            int: 寫入的筆數
+        """
+        if isinstance(rows, pa.Table):
+            table = rows
+        elif isinstance(rows, pd.DataFrame):
+            table = frame_to_table(rows)
+        else:
+            table = to_table(rows)
+        os.makedirs(self.root, exist_ok=True)
+        ds.write_dataset(
+            table,
+            self.root,
+            format='parquet',
+            partitioning=ds.partitioning(PARTITION_SCHEMA, flavor='hive'),
+            existing_data_behavior='delete_matching',
+            basename_template='part-{i}.parquet',
+        )
+        if self.connection is not None:
+            # 重新列出檔案，開啟中的資料集才會讀到新的分割
+            self.connection = self.dataset()
+        # 資料已更新，讓查詢快取失效
+        touchDataVersion()
+        return table.num_rows
+
+    def dataset(self) -> ds.Dataset:
+        """取得資料集，只讀取中繼資料，不會載入資料"""
+        return ds.dataset(
+            self.root,
+            format='parquet',
+            schema=SCHEMA,
+            partitioning=ds.partitioning(PARTITION_SCHEMA, flavor='hive'),
+        )
+
+    def read(self, columns: Optional[Sequence[str]] = None, city_code: Optional[str] = None,
+             trade_ym: Optional[Sequence[int]] = None, filter=None) -> pa.Table:
+        """讀取資料，只會開啟符合條件的分割與需要的欄位
+
+        Args:
+            columns: 要讀取的欄位，None 表示全部
+            city_code: 縣市代號，例如 'A'
+            trade_ym: 交易年月範圍 [起, 迄]，例如 [10901, 11310]
+            filter: 其他 pyarrow.dataset 篩選條件，例如 ds.field('town_code') == 'A02'
+
+        Returns:
+            pa.Table
+
+        Example:
+            >>> ColumnStore().read(['trade_date', 'price_nuit'], 'A', [10901, 11310])
+        """
+        expression = filter
+        if city_code:
+            expression = self._and(expression, ds.field('city_code') == city_code)
+        if trade_ym:
+            expression = self._and(expression, (ds.field('trade_ym') >= int(trade_ym[0]))
+                                   & (ds.field('trade_ym') <= int(trade_ym[1])))
+        return self.dataset().to_table(columns=list(columns) if columns else None, filter=expression)
+
+    def filterExpression(self, conditions: Dict):
+        """將 Select.createWhere 的查詢條件轉換為 pyarrow.dataset 篩選條件
+
+        Args:
+            conditions: Tools.changeToSelectDict 的結果
+
+        Returns:
+            ds.Expression，沒有條件時為 None
+
+        Example:
+            >>> ColumnStore().filterExpression({"city_code": "A", "trade_sign": ["1", "4"]})
+            # (city_code == "A") and is_in(trade_sign, [1, 4])
+        """
+        expression = None
+        for column, value in conditions.items():
+            # 跳過空值和 None
+            if value is None or value == "":
+                continue
+            if column not in SCHEMA.names:
+                raise ValueError(f"未知的欄位: {column}")
+            field = ds.field(column)
+            if isinstance(value, list):
+                if column == "trade_date":
+                    if len(value) != 2:
+                        continue
+                    select = Select()
+                    start, end = select.adjust_trade_date(value[0])[0], select.adjust_trade_date(value[1])[1]
+                    # 交易年月是分割欄位，先排除範圍外的資料夾
+                    condition = ((ds.field('trade_ym') >= start // 100) & (ds.field('trade_ym') <= end // 100)
+                                 & (field >= start) & (field <= end))
+                elif column in ("price_nuit", "total_area", "age"):
+                    if len(value) != 2 or value[0] == "" or value[1] == "":
+                        continue
+                    condition = (field >= _value(column, value[0])) & (field <= _value(column, value[1]))
+                else:
+                    condition = field.isin([_value(column, item) for item in value])
+            elif column == "address":
+                # 與 LIKE '%地址%' 相同
+                condition = pc.match_substring(field, str(value))
+            else:
+                condition = field == _value(column, value)
+            expression = self._and(expression, condition)
+        return expression
+
+    def monthly(self, conditions: Dict, groups: Sequence[str] = ()) -> List[Dict]:
+        """每月彙整，結果與 Select.createMonthlyQuery 的查詢結果相同
+
+        只讀取符合條件的分割與分組、交易年月、單價欄位，逐批彙整，記憶體用量與資料筆數無關
+
+        Args:
+            conditions: Tools.changeToSelectDict 的結果
+            groups: 分組欄位，例如 ['town_code']
+
+        Returns:
+            list: [{分組欄位..., 'ym': 交易年月, 'total': 單價總和, 'count': 筆數, 'sumsq': 單價平方和}]，依分組與年月排序
+        """
+        keys = list(groups) + ['trade_ym']
+        sums = {}
+        dataset = self.connection if self.connection is not None else self.dataset()
+        scanner = dataset.scanner(columns=keys + ['price_nuit'], filter=self.filterExpression(conditions))
+        for batch in scanner.to_batches():
+            if batch.num_rows == 0:
+                continue
+            price = pc.cast(batch.column('price_nuit'), pa.float64())
+            table = pa.table({**{key: batch.column(key) for key in keys},
+                              'price': price, 'square': pc.multiply(price, price)})
+            grouped = table.group_by(keys).aggregate([('price', 'sum'), ('price', 'count'), ('square', 'sum')])
+            for row in grouped.to_pylist():
+                key = tuple(row[name] for name in keys)
+                total, count, sumsq = sums.get(key, (0.0, 0, 0.0))
+                sums[key] = (total + row['price_sum'], count + row['price_count'], sumsq + row['square_sum'])
+        return [{**dict(zip(groups, key[:-1])), 'ym': key[-1], 'total': total, 'count': count, 'sumsq': sumsq}
+                for key, (total, count, sumsq) in sorted(sums.items())]
+
+    @staticmethod
+    def _and(left, right):
+        return right if left is None else left & right
+
+
+if __name__ == '__main__':
+    import time
+
+    store = ColumnStore()
+    if not os.path.exists(store.root):
+        print(f"資料不存在: {store.root}")
+        print("請先執行 lib/DataFormatting.py 產生資料")
+    else:
+        start = time.perf_counter()
+        table = store.read(['trade_date', 'price_nuit'], 'A', [11001, 11312])
+        print(f"讀取 {table.num_rows} 筆資料，耗時 {(time.perf_counter() - start) * 1000:.1f} ms")
@@ -1,17 +1,33 @@
 import csv
 import os
-import params
-from MySQL import MySQL
+import sys
+
+# 添加父目錄到系統路徑，以便導入 lib（與 BulkLoader、MonthlyAggregate 使用同一份 lib.MySQL 與連線池）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib import params
+from lib.MySQL import MySQL
+from lib.CsvSource import openSource, listSources, DirectorySource
+from lib.TownIndex import TownIndex
+from lib.BulkLoader import BulkLoader
+from lib.MonthlyAggregate import refresh
+
+# 鄉鎮市區索引，由 params.town 建立一次
+townIndex = TownIndex(params.town)
+
 class CreateLvrData:
 
-    def getCsv(self, path, fileType, cityCode):
+    def getCsv(self, path, fileType, cityCode, source=None):
         '''
         讀取一個csv檔案，使用encoding='utf-8-sig'配置可以在檔頭有BOM時過濾掉
         Args:
-            path: (string) 檔案路徑
+            path: (string) 檔案路徑，有提供source時為來源中的檔名
+            source: (DirectorySource, ZipSource) 資料來源，可直接從zip中讀取不必解壓縮
         '''
         cityCode = cityCode.upper()
-        with open(path, mode='r', encoding='utf-8-sig') as file:
+        if source is None:
+            source = DirectorySource(os.path.dirname(path))
+            path = os.path.basename(path)
+        with source.open(path) as file:
             # mapping表
             map = {
                 "鄉鎮市區": "town_name", 
@@ -63,7 +79,7 @@ class CreateLvrData:
                     result = {
                         'city_code': cityCode,
                         'city_name': params.city[cityCode],
-                        'town_code': next((item["code"] for item in params.town[cityCode] if item["title"] == result["town_name"]), None),
+                        'town_code': townIndex.code(cityCode, result["town_name"]),
                         'age': 0
                     } | result
                     
@@ -83,8 +99,8 @@ class CreateLvrData:
         currentDir = os.path.dirname(os.path.abspath(__file__))
         # opendata目錄
         openddataDir = os.path.join(currentDir, '..', 'opendata')
-        # 取所有子目錄列表（這種寫的問題是在萬一參雜了非需要的資料目錄可能會在讀取csv時出錯）
-        dirList = [os.path.join(openddataDir, d) for d in os.listdir(openddataDir) if os.path.isdir(os.path.join(openddataDir, d))]
+        # 取所有子目錄與未解壓縮的zip檔列表（這種寫的問題是在萬一參雜了非需要的資料目錄可能會在讀取csv時出錯）
+        dirList = listSources(openddataDir)
         # 儲存最終結果的列表
         if outputModel == 1:
             result = []
@@ -94,6 +110,7 @@ class CreateLvrData:
         for index, dirPath in enumerate(dirList):
             if index == rows:
                 break 
+            source = openSource(dirPath)
             # 處理檔案中的a-z開頭
             for fi, i in enumerate(range(ord('a'), ord('z') + 1)):
                 if fi == rows:
@@ -106,13 +123,13 @@ class CreateLvrData:
                 # ... 後面的邏輯就都差不多
                 try:
                     # 後來對照比對後，發現_b的檔案是土地＋車位資料，也可略過不抓
-                    prefix = os.path.join(dirPath, f"{key}_lvr_land_a")
+                    prefix = f"{key}_lvr_land_a"
                     fileList = [f"{prefix}_{suffix}.csv" for suffix in ['build', 'land', 'park']]
                     fileList.insert(0, f"{prefix}.csv")
                     # 取檔案內容
-                    print(f"處理檔案：{fileList[0]}")
-                    main = self.getCsv(fileList[0], 'main', key) if os.path.exists(fileList[0]) else None
-                    build = self.getCsv(fileList[1], 'build', key) if os.path.exists(fileList[1]) else None
+                    print(f"處理檔案：{os.path.join(dirPath, fileList[0])}")
+                    main = self.getCsv(fileList[0], 'main', key, source) if source.exists(fileList[0]) else None
+                    build = self.getCsv(fileList[1], 'build', key, source) if source.exists(fileList[1]) else None
                     
                     # 沒有檔案的話就跳過
                     if main == None:
@@ -137,6 +154,7 @@ class CreateLvrData:
                     print(f"檔案：{fileList[0]}, 發生異常{e}")
                 except Exception as e:
                     print(f"檔案：{fileList[0]}, 發生異常{e}")
+            source.close()
         return result
 
     def insertSQL(self, row = 1000):
@@ -160,4 +178,21 @@ class CreateLvrData:
                 if len(data_to_insert) >= row or idx == total - 1:
                     db.insert_many(" ".join(sql), data_to_insert)
                     data_to_insert = []  # 清空資料，為下一批次做準備
-                    print(f"已批次寫入資料：第 {idx // row + 1} 批")
\ No newline at end of file
+                    print(f"已批次寫入資料：第 {idx // row + 1} 批")
+
+    def bulkLoad(self, method="auto", rebuildIndexes=True, replace=False):
+        '''
+        以大量匯入模式將數據寫入資料庫（取代 insertSQL 每1000筆 executemany 並提交的方式）
+        資料先串流寫入暫存的TSV，再以 LOAD DATA LOCAL INFILE 匯入，伺服器不允許時改用多列 VALUES 的 INSERT
+        Args:
+            method: (string) "auto" "infile" "insert"，參考 BulkLoader.load
+            rebuildIndexes: (bool) 是否在匯入前移除次要索引，匯入後重建
+            replace: (bool) 是否先清空 lvr_lnd，已有資料時必須為 True，否則不匯入
+        Return:
+            dict 匯入筆數、秒數與每秒筆數
+        '''
+        with MySQL(local_infile=True) as db:
+            stats = BulkLoader(db).load(self.getData(1), method, rebuildIndexes, replace)
+            # 重新計算預先彙整的每月統計
+            refresh(db)
+            return stats
@@ -0,0 +1,115 @@
+import io
+import os
+import re
+import zipfile
+
+'''
+讀取 open data 的 csv 檔案來源
+
+下載的季度資料可以解壓縮到 opendata/dataN/ 資料夾，也可以直接保留 opendata/dataN.zip，
+兩種來源都提供相同的 names() / exists() / open() 方法，
+讀取 zip 時直接以 zipfile.ZipFile.open 串流讀取需要的 csv，不必解壓縮到硬碟
+'''
+
+# 需要的實價登錄 csv 檔名，例如 a_lvr_land_a.csv、a_lvr_land_a_build.csv
+# 第一區塊為縣市代號，第四區塊 a b 為買賣 c 為租賃，第五區塊 build land park 為明細
+LVR_CSV = re.compile(r'^([a-z])_lvr_land_([abc])(?:_(build|land|park))?\.csv$')
+
+class DirectorySource:
+    '''
+    已解壓縮的資料夾來源
+    '''
+
+    def __init__(self, path):
+        self.path = path
+
+    def names(self):
+        '''
+        Return:
+            list 資料夾中符合實價登錄檔名規則的 csv 檔名
+        '''
+        return [name for name in os.listdir(self.path) if LVR_CSV.match(name)]
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(self.path, name))
+
+    def open(self, name):
+        '''
+        開啟 csv 檔案，使用encoding='utf-8-sig'配置可以在檔頭有BOM時過濾掉
+        '''
+        return open(os.path.join(self.path, name), mode='r', encoding='utf-8-sig', newline='')
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+class ZipSource:
+    '''
+    未解壓縮的 zip 檔來源，只會讀取需要的 csv 成員，txt 與 xml 檔案不會被讀取
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.zip = zipfile.ZipFile(path, 'r')
+        # 檔名 => zip 中的完整成員名稱
+        self.members = {}
+        for member in self.zip.namelist():
+            name = os.path.basename(member)
+            if LVR_CSV.match(name):
+                self.members[name] = member
+
+    def names(self):
+        return list(self.members)
+
+    def exists(self, name):
+        return name in self.members
+
+    def open(self, name):
+        '''
+        直接從 zip 中串流讀取 csv，解壓縮後的內容不會寫到硬碟
+        '''
+        return io.TextIOWrapper(self.zip.open(self.members[name]), encoding='utf-8-sig', newline='')
+
+    def close(self):
+        self.zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def openSource(path):
+    '''
+    依照路徑類型取得 csv 來源
+    Args:
+        path: (string) 解壓縮後的資料夾或 zip 檔路徑
+    Return:
+        DirectorySource 或 ZipSource
+    '''
+    if os.path.isdir(path):
+        return DirectorySource(path)
+    return ZipSource(path)
+
+def listSources(path):
+    '''
+    取得 opendata 資料夾中所有的資料來源路徑（dataN 資料夾與 dataN.zip）
+    同名的資料夾與 zip 同時存在時只使用資料夾
+    Args:
+        path: (string) opendata 資料夾路徑
+    Return:
+        list 資料來源路徑
+    '''
+    sources = []
+    for name in sorted(os.listdir(path)):
+        fullPath = os.path.join(path, name)
+        if os.path.isdir(fullPath):
+            sources.append(fullPath)
+        elif name.endswith('.zip') and not os.path.isdir(fullPath[:-4]):
+            sources.append(fullPath)
+    return sources
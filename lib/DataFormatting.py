@@ -25,16 +25,56 @@
 """
 
 import csv
+import logging
 import os
 import sys
-import traceback
+import time
 import re 
+from collections import Counter
 from typing import Dict, List
 import json  # 加入 json 模組
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # 添加父目錄到系統路徑，以便導入 params.py
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from lib import params
+from lib.CsvSource import openSource
+from lib.TownIndex import TownIndex
+
+import numpy as np
+import pandas as pd
+
+# 鄉鎮市區索引，由 params.town 建立一次
+TOWN_INDEX = TownIndex(params.town)
+
+# 日誌：INFO 輸出每個檔案的處理統計，DEBUG 輸出欄位名稱與錯誤細節，
+# 逐列的訊息使用更詳細的 TRACE 等級，未開啟時不會格式化也不會輸出
+logger = logging.getLogger(__name__)
+TRACE = 5
+logging.addLevelName(TRACE, 'TRACE')
+
+# 批次處理模式輸出的欄位
+BATCH_COLUMNS = ['city_code', 'city_name', 'town_code', 'town_name', 'trade_sign', 'address',
+                 'trade_date', 'price_total', 'price_unit', 'total_area', 'code', 'age']
+# 買賣檔案（_a、_b）輸出欄位 => csv 中文欄位名稱
+BATCH_FIELDS = {
+    'town_name': '鄉鎮市區',
+    'trade_sign': '交易標的',
+    'address': '土地位置建物門牌',
+    'trade_date': '交易年月日',
+    'total_area': '建物移轉總面積平方公尺',
+    'price_total': '總價元',
+    'price_unit': '單價元平方公尺',
+    'code': '編號',
+}
+# 需要轉換為數字的欄位
+BATCH_NUMBER_FIELDS = ['price_total', 'price_unit', 'total_area']
+# 租賃檔案（_c）輸出欄位 => csv 中文欄位名稱
+BATCH_RENTAL_FIELDS = BATCH_FIELDS | {
+    'trade_date': '租賃年月日',
+    'total_area': '建物總面積平方公尺',
+    'price_total': '總額元',
+}
 
 class DataFormatter:
     def __init__(self):
@@ -60,6 +100,41 @@ class DataFormatter:
         self.all_data = []
 
         self.town_codes = params.town  # 從 params.py 取得鄉鎮市區代碼對照表
+        
+        # 鄉鎮市區索引（名稱 => 代碼字典與地址比對器），所有讀取流程共用
+        self.town_index = TOWN_INDEX
+        
+        # 目前檔案的處理統計（讀取筆數、異常原因、屋齡對應筆數），每個檔案開始時重設
+        self.stats = Counter()
+        # 是否輸出逐列追蹤訊息，每個檔案開始時依日誌等級判斷一次，避免逐列查詢
+        self.trace = logger.isEnabledFor(TRACE)
+
+    def _start_file(self) -> float:
+        """開始處理新檔案：重設統計並更新逐列追蹤設定
+        
+        Returns:
+            float: 開始時間 (time.perf_counter)
+        """
+        self.stats = Counter()
+        self.trace = logger.isEnabledFor(TRACE)
+        return time.perf_counter()
+
+    def _log_file_stats(self, file_path: str, output: int, start: float):
+        """輸出單一檔案的處理統計
+        
+        Args:
+            file_path: 檔案名稱
+            output: 輸出的資料筆數
+            start: _start_file 回傳的開始時間
+        """
+        elapsed = time.perf_counter() - start
+        rows = self.stats['rows']
+        # 異常原因 => 筆數（error 的資料列不會輸出，其餘原因仍會以預設值輸出）
+        issues = {reason: count for reason, count in self.stats.items()
+                  if reason not in ('rows', 'age_match') and count}
+        logger.info("%s: 讀取 %d 筆, 輸出 %d 筆, 異常 %s, 屋齡對應 %d 筆, 耗時 %.2f 秒, %.0f 筆/秒",
+                    file_path, rows, output, issues or '無', self.stats['age_match'],
+                    elapsed, rows / elapsed if elapsed > 0 else 0)
 
     def _update_town_codes(self, data: List[Dict]) -> List[Dict]:
         """更新所有資料的鄉鎮市區代碼"""
@@ -69,18 +144,15 @@ class DataFormatter:
                     city_code = item['city_code']
                     town_name = item['town_name']
                     
-                    # 在 params.town 中查找對應的代碼
-                    if city_code in self.town_dict:
-                        for town in self.town_dict[city_code]:
-                            if town['title'] == town_name:
-                                item['town_code'] = town['code']
-                                break
+                    # 在鄉鎮市區索引中查找對應的代碼
+                    town_code = self.town_index.code(city_code, town_name)
+                    if town_code:
+                        item['town_code'] = town_code
             
             return data
             
-        except Exception as e:
-            print(f"更新鄉鎮市區代碼時發生錯誤: {str(e)}")
-            traceback.print_exc()
+        except Exception:
+            logger.exception("更新鄉鎮市區代碼時發生錯誤")
             return data
 
     def _convert_price(self, price_str: str) -> int:
@@ -124,7 +196,7 @@ class DataFormatter:
             }
             
         except Exception as e:
-            print(f"獲取檔案資訊時發生錯誤: {str(e)}")
+            logger.error("獲取檔案資訊時發生錯誤: %s", e)
             return {
                 'city_code': '',
                 'city_name': '',
@@ -158,186 +230,494 @@ class DataFormatter:
             elif '房地' in trade_type_str or ('土地' in trade_type_str and '建物' in trade_type_str):
                 return 1  # 房地
             else:
-                print(f"警告: 無法識別的交易標的類型 '{trade_type_str}'，使用預設值 1")
+                self.stats['trade_type_unknown'] += 1
+                if self.trace:
+                    logger.log(TRACE, "無法識別的交易標的類型 '%s'，使用預設值 1", trade_type_str)
                 return 1  # 預設為房地
                 
         except Exception as e:
-            print(f"判斷交易類型時發生錯誤: {str(e)}")
-            print(f"交易標的字串: {trade_type_str}")
+            self.stats['trade_type_error'] += 1
+            logger.debug("判斷交易類型時發生錯誤: %s, 交易標的字串: %s", e, trade_type_str)
             return 1  # 發生錯誤時返回預設值
 
-    def get_town_info(self, city_code: str, address: str) -> Dict:
-        """從地址取得行政區資訊
+    def get_town_info(self, city_code: str, address: str, town_name: str = '') -> Dict:
+        """從鄉鎮市區名稱或地址取得行政區資訊
         
         Args:
             city_code: 城市代碼
             address: 完整地址
+            town_name: 鄉鎮市區欄位，有提供且能對應時優先使用
             
         Returns:
             Dict: 包含行政區代碼和名稱的字典
         """
-        # 取得該城市的行政區對照表
-        town_dict = dict(self.town_dict.get(city_code, {}))
+        code = self.town_index.code(city_code, town_name) if town_name else None
+        if code:
+            return {'code': code, 'title': town_name}
         
-        # 尋找地址中符合的行政區名稱
-        for code, name in town_dict.items():
-            if name in address:
-                return {'code': code, 'title': name}
-        
-        # 找不到則回傳空值
-        return {'code': '', 'title': ''}
+        # 尋找地址中最早出現的行政區名稱，找不到則回傳空值
+        return self.town_index.find(city_code, address)
         
     def process_directory(self, directory_path: str) -> List[Dict]:
         """處理目錄中的所有檔案"""
+        return self.process_source(directory_path)
+
+    def process_source(self, source_path: str) -> List[Dict]:
+        """處理資料來源中的所有檔案
+        
+        Args:
+            source_path: 解壓縮後的資料夾或未解壓縮的 zip 檔 (例如: opendata/data0.zip)
+            
+        Returns:
+            List[Dict]: 處理後的資料
+        """
         try:
             all_data = []
             build_files = []
             main_files = []
             
-            # 第一步：分類檔案
-            for filename in os.listdir(directory_path):
-                if not filename.endswith('.csv'):
-                    continue
-                    
-                file_path = os.path.join(directory_path, filename)
+            with openSource(source_path) as source:
+                # 第一步：分類檔案
+                for filename in source.names():
+                    # 將檔案分類
+                    if '_build.csv' in filename:
+                        build_files.append(filename)
+                    else:
+                        main_files.append(filename)
                 
-                # 將檔案分類
-                if '_build.csv' in filename:
-                    build_files.append((filename, file_path))
-                else:
-                    main_files.append((filename, file_path))
-            
-            # 第二步：處理所有建物檔案，建立屋齡對照表
-            for build_filename, build_file_path in build_files:
-                main_filename = build_filename.replace('_build.csv', '.csv')
-                self.load_building_ages(build_file_path, main_filename)
-            
-            # 第三步：處理主要檔案
-            for filename, file_path in main_files:
-                file_info = self.parse_filename(filename)
-                if file_info:
-                    data = self.process_file(file_path, file_info)
-                    all_data.extend(data)
-            
-            # 第四步：更新 town_code
+                # 第二步：處理主要檔案，每個主要檔案使用同名的建物檔案（a_lvr_land_a.csv => a_lvr_land_a_build.csv）
+                # 建立屋齡對照表，多個季度或縣市的檔案放在一起時不會用到其他檔案的屋齡
+                build_files = set(build_files)
+                for filename in main_files:
+                    file_info = self.parse_filename(filename)
+                    if file_info:
+                        build_filename = filename.replace('.csv', '_build.csv')
+                        self.building_ages = {}
+                        if build_filename in build_files:
+                            with source.open(build_filename) as f:
+                                self._load_building_ages(f, build_filename, filename)
+                        with source.open(filename) as f:
+                            data = self._process_stream(f, filename, file_info)
+                        all_data.extend(data)
+            
+            # 第三步：更新 town_code
             all_data = self._update_town_codes(all_data)
             
             return all_data
             
-        except Exception as e:
-            print(f"處理目錄時發生錯誤: {str(e)}")
-            traceback.print_exc()
+        except Exception:
+            logger.exception("處理目錄時發生錯誤: %s", source_path)
             return []
 
     def process_file(self, file_path: str, file_info: Dict) -> List[Dict]:
         """處理單個檔案"""
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return self._process_stream(f, file_path, file_info)
+
+    def _process_stream(self, f, file_path: str, file_info: Dict) -> List[Dict]:
+        """處理已開啟的檔案（一般檔案或 zip 中的成員）"""
+        start = self._start_file()
         try:
             results = []
+            rows = 0
             
-            with open(file_path, 'r', encoding='utf-8') as f:
-                # 讀取中文欄位名稱作為 fieldnames，並移除 BOM 標記
-                fieldnames = next(f).strip().split(',')
-                fieldnames[0] = fieldnames[0].replace('\ufeff', '')  # 移除 BOM
-                
-                # 跳過英文欄位名稱
-                next(f)
-                
-                # 使用中文欄位名稱建立 DictReader
-                reader = csv.DictReader(f, fieldnames=fieldnames)
-                
-                print(f"\n使用的欄位名稱: {fieldnames}")  # 印出欄位名稱以供確認
-                
-                for row in reader:
-                    # 根據檔案類型選擇對應的處理方法
-                    if '_a.csv' in file_path:
-                        result = self._process_a_file_row(row, file_info)
-                    elif '_b.csv' in file_path:
-                        result = self._process_b_file_row(row, file_info)
-                    elif '_c.csv' in file_path:
-                        result = self._process_c_file_row(row, file_info)
-                    else:
-                        continue
-                        
-                    if result:
-                        results.append(result)
-                        
+            # 讀取中文欄位名稱作為 fieldnames，並移除 BOM 標記
+            fieldnames = next(f).strip().split(',')
+            fieldnames[0] = fieldnames[0].replace('\ufeff', '')  # 移除 BOM
+            
+            # 跳過英文欄位名稱
+            next(f)
+            
+            # 使用中文欄位名稱建立 DictReader
+            reader = csv.DictReader(f, fieldnames=fieldnames)
+            
+            logger.debug("%s 使用的欄位名稱: %s", file_path, fieldnames)
+            
+            for row in reader:
+                rows += 1
+                # 根據檔案類型選擇對應的處理方法
+                if '_a.csv' in file_path:
+                    result = self._process_a_file_row(row, file_info)
+                elif '_b.csv' in file_path:
+                    result = self._process_b_file_row(row, file_info)
+                elif '_c.csv' in file_path:
+                    result = self._process_c_file_row(row, file_info)
+                else:
+                    continue
+                    
+                if result:
+                    results.append(result)
+            
+            self.stats['rows'] = rows
+            self._log_file_stats(file_path, len(results), start)
             return results
             
-        except Exception as e:
-            print(f"處理檔案時發生錯誤: {str(e)}")
-            print("檔案路徑:", file_path)
-            traceback.print_exc()
+        except Exception:
+            logger.exception("處理檔案時發生錯誤: %s", file_path)
             return []
     
     def load_building_ages(self, build_file: str, main_file: str):
         """讀取建物檔案並建立屋齡對照表"""
+        with open(build_file, 'r', encoding='utf-8') as f:
+            self._load_building_ages(f, build_file, main_file)
+
+    def _load_building_ages(self, f, build_file: str, main_file: str):
+        """從已開啟的建物檔案建立屋齡對照表"""
+        start = self._start_file()
         try:
-            print(f"\n開始讀取建物檔案屋齡資訊...")
-            print(f"建物檔案: {build_file}")
-            
-            with open(build_file, 'r', encoding='utf-8') as f:
-                # 讀取中文欄位名稱作為 fieldnames
-                fieldnames = next(f).strip().split(',')
-                fieldnames[0] = fieldnames[0].replace('\ufeff', '')  # 移除 BOM
-                print(f"建物檔案欄位名稱: {fieldnames}")  # 印出欄位名稱以供確認
-                
-                # 找出編號和屋齡的欄位索引
-                code_field = None
-                age_field = None
-                for field in fieldnames:
-                    if '編號' in field:
-                        code_field = field
-                    elif '屋齡' in field:
-                        age_field = field
-                        
-                if not code_field or not age_field:
-                    print(f"警告：找不到必要的欄位")
-                    print(f"編號欄位: {code_field}")
-                    print(f"屋齡欄位: {age_field}")
-                    return
+            # 讀取中文欄位名稱作為 fieldnames
+            fieldnames = next(f).strip().split(',')
+            fieldnames[0] = fieldnames[0].replace('\ufeff', '')  # 移除 BOM
+            logger.debug("%s 建物檔案欄位名稱: %s", build_file, fieldnames)
+            
+            # 找出編號和屋齡的欄位索引
+            code_field = None
+            age_field = None
+            for field in fieldnames:
+                if '編號' in field:
+                    code_field = field
+                elif '屋齡' in field:
+                    age_field = field
                     
-                print(f"使用的欄位名稱 - 編號: {code_field}, 屋齡: {age_field}")
-                
-                # 跳過英文欄位名稱
-                next(f)
-                
-                # 使用中文欄位名稱建立 DictReader
-                reader = csv.DictReader(f, fieldnames=fieldnames)
-                
-                # 清空之前的屋齡對照表
-                self.building_ages = {}
-                
-                for row in reader:
-                    if not row:  # 跳過空行
-                        continue
-                        
-                    # 取得編號和屋齡
-                    code = row.get(code_field, '').strip()
-                    age_str = row.get(age_field, '').strip()
+            if not code_field or not age_field:
+                logger.warning("%s 找不到必要的欄位, 編號欄位: %s, 屋齡欄位: %s", build_file, code_field, age_field)
+                return
+            
+            # 跳過英文欄位名稱
+            next(f)
+            
+            # 使用中文欄位名稱建立 DictReader
+            reader = csv.DictReader(f, fieldnames=fieldnames)
+            
+            # 清空之前的屋齡對照表
+            self.building_ages = {}
+            
+            rows = 0
+            for row in reader:
+                rows += 1
+                if not row:  # 跳過空行
+                    continue
                     
-                    if code and age_str:
-                        try:
-                            age = int(age_str)
-                            if age >= 0:
-                                # 將編號中的區域代碼統一轉換為 FAI
-                                code = re.sub(r'F[A-Z]B', 'FAI', code)
-                                self.building_ages[code] = age
-                                print(f"新增屋齡對照: 原始編號={row.get(code_field, '')}, 轉換後編號={code}, 屋齡={age}")
-                            else:
-                                print(f"警告: 無效的屋齡值 {age} (編號={code})")
-                        except ValueError:
-                            print(f"警告: 無效的屋齡格式 '{age_str}' (編號={code})")
+                # 取得編號和屋齡
+                code = row.get(code_field, '').strip()
+                age_str = row.get(age_field, '').strip()
                 
-            print(f"\n建物屋齡對照表建立完成，共 {len(self.building_ages)} 筆")
-            if self.building_ages:
-                print("建物屋齡對照表中的前5筆資料:", list(self.building_ages.items())[:5])
-            else:
-                print("警告：建物屋齡對照表是空的！")
+                if code and age_str:
+                    try:
+                        age = int(age_str)
+                        if age >= 0:
+                            # 將編號中的區域代碼統一轉換為 FAI
+                            code = re.sub(r'F[A-Z]B', 'FAI', code)
+                            self.building_ages[code] = age
+                            if self.trace:
+                                logger.log(TRACE, "新增屋齡對照: 原始編號=%s, 轉換後編號=%s, 屋齡=%d",
+                                           row.get(code_field, ''), code, age)
+                        else:
+                            self.stats['age_negative'] += 1
+                            if self.trace:
+                                logger.log(TRACE, "無效的屋齡值 %d (編號=%s)", age, code)
+                    except ValueError:
+                        self.stats['age_format'] += 1
+                        if self.trace:
+                            logger.log(TRACE, "無效的屋齡格式 '%s' (編號=%s)", age_str, code)
+            
+            self.stats['rows'] = rows
+            self._log_file_stats(build_file, len(self.building_ages), start)
+            if not self.building_ages:
+                logger.warning("%s 建物屋齡對照表是空的", build_file)
                 
+        except Exception:
+            logger.exception("讀取建物檔案時發生錯誤: %s", build_file)
+            
+    # ===== 批次（向量化）處理模式 =====
+    # 一次將整個 csv 讀成欄位陣列，價格、面積、交易標的與鄉鎮市區代碼都以向量運算處理，
+    # 輸出的欄位與 process_source 相同，但回傳 pandas.DataFrame
+
+    def process_source_batch(self, source_path: str) -> pd.DataFrame:
+        """以批次模式處理資料來源中的所有檔案
+        
+        Args:
+            source_path: 解壓縮後的資料夾或未解壓縮的 zip 檔
+            
+        Returns:
+            pd.DataFrame: 欄位與 process_source 輸出的字典相同
+        """
+        try:
+            frames = []
+            with openSource(source_path) as source:
+                names = source.names()
+                build_files = {name for name in names if '_build.csv' in name}
+                main_files = [name for name in names if '_build.csv' not in name]
+                
+                for filename in main_files:
+                    file_info = self.parse_filename(filename)
+                    if file_info:
+                        # 與 process_source 相同，使用同名的建物檔案建立屋齡對照表
+                        build_filename = filename.replace('.csv', '_build.csv')
+                        building_ages = pd.Series(dtype=np.int64)
+                        if build_filename in build_files:
+                            with source.open(build_filename) as f:
+                                building_ages = self._read_building_ages_batch(f, build_filename)
+                        with source.open(filename) as f:
+                            frames.append(self.process_file_batch(f, filename, file_info, building_ages))
+            
+            frames = [frame for frame in frames if len(frame)]
+            if not frames:
+                return pd.DataFrame(columns=BATCH_COLUMNS)
+            return pd.concat(frames, ignore_index=True)
+            
+        except Exception:
+            logger.exception("處理目錄時發生錯誤: %s", source_path)
+            return pd.DataFrame(columns=BATCH_COLUMNS)
+
+    def process_file_batch(self, f, file_path: str, file_info: Dict, building_ages=None) -> pd.DataFrame:
+        """以批次模式處理單個檔案
+        
+        Args:
+            f: 已開啟的檔案或檔案路徑
+            file_path: 檔案名稱，用來判斷 a/b/c 檔案類型
+            file_info: parse_filename 的結果
+            building_ages: 屋齡對照表（編號 => 屋齡 的 Series 或字典），預設使用 self.building_ages
+            
+        Returns:
+            pd.DataFrame: 欄位與 _process_a_file_row 輸出的字典相同
+        """
+        if '_a.csv' in file_path or '_b.csv' in file_path:
+            fields = BATCH_FIELDS
+        elif '_c.csv' in file_path:
+            fields = BATCH_RENTAL_FIELDS
+        else:
+            return pd.DataFrame(columns=BATCH_COLUMNS)
+        if building_ages is None:
+            building_ages = self.building_ages
+        
+        start = self._start_file()
+        try:
+            # 第一行為中文欄位名稱，第二行為英文欄位名稱
+            # 價格與面積直接由 csv 解析器轉為數字，空白為 NaN；文字欄位維持字串
+            number_fields = [fields[key] for key in BATCH_NUMBER_FIELDS]
+            df = pd.read_csv(f, skiprows=[1], encoding='utf-8-sig', thousands=',',
+                             usecols=lambda name: name in fields.values(),
+                             dtype={name: str for name in fields.values() if name not in number_fields},
+                             keep_default_na=False, na_values={name: [''] for name in number_fields})
+            df = df.rename(columns={value: key for key, value in fields.items()})
+            missing = [field for field in fields if field not in df.columns]
+            if missing:
+                raise KeyError(f"缺少欄位 {[fields[field] for field in missing]}")
         except Exception as e:
-            print(f"讀取建物檔案時發生錯誤: {str(e)}")
-            traceback.print_exc()
+            logger.error("處理檔案時發生錯誤: %s, 檔案路徑: %s", e, file_path)
+            return pd.DataFrame(columns=BATCH_COLUMNS)
+        self.stats['rows'] = len(df)
+        
+        # 價格與面積：任一欄無法轉換時三個欄位都設為 0（與逐列處理相同）
+        price_total, valid_total = self._to_number_batch(df['price_total'])
+        price_unit, valid_unit = self._to_number_batch(df['price_unit'])
+        total_area, valid_area = self._to_number_batch(df['total_area'], integer=False)
+        invalid = ~(valid_total & valid_unit & valid_area)
+        self.stats['price_format'] = int(invalid.sum())
+        price_total = np.where(invalid, 0, price_total).astype(np.int64)
+        price_unit = np.where(invalid, 0, price_unit).astype(np.int64)
+        total_area = np.where(invalid, 0.0, total_area)
+        
+        city_code = file_info['city_code']
+        
+        if '_c.csv' in file_path:
+            trade_sign = np.full(len(df), self.trade_type['rental'], dtype=np.int8)
+            code = df['code']
+            age = np.zeros(len(df), dtype=np.int64)
+        else:
+            trade_sign = self.get_trade_type_batch(df['trade_sign'])
+            # a 檔案的編號會去除空白，b 檔案維持原樣（與逐列處理相同）
+            code = df['code'].str.strip() if '_a.csv' in file_path else df['code']
+            age = code.map(building_ages)
+            self.stats['age_match'] = int(age.notna().sum())
+            age = age.fillna(0).to_numpy(dtype=np.int64)
+        
+        result = pd.DataFrame({
+            'city_code': city_code,
+            'city_name': file_info['city_name'],
+            'town_code': self.get_town_code_batch(city_code, df['town_name'], df['address']),
+            'town_name': df['town_name'],
+            'trade_sign': trade_sign,
+            'address': df['address'],
+            'trade_date': df['trade_date'],
+            'price_total': price_total,
+            'price_unit': price_unit,
+            'total_area': total_area,
+            'code': code,
+            'age': age,
+        }, columns=BATCH_COLUMNS)
+        self._log_file_stats(file_path, len(result), start)
+        return result
+
+    def get_town_code_batch(self, city_code: str, town_name: pd.Series, address: pd.Series) -> pd.Series:
+        """以鄉鎮市區名稱對應代碼，無法對應的資料再從地址比對，規則與 get_town_info 相同"""
+        town_code = town_name.map(self.town_index.codes(city_code))
+        missing = town_code.isna()
+        if missing.any():
+            town_code[missing] = address[missing].map(lambda value: self.town_index.find(city_code, value)['code'])
+        return town_code.fillna('')
+
+    def get_trade_type_batch(self, trade_type_str: pd.Series) -> np.ndarray:
+        """以向量運算判斷交易類型，規則與 get_trade_type 相同"""
+        has_land = trade_type_str.str.contains('土地', regex=False).to_numpy(dtype=bool)
+        has_build = trade_type_str.str.contains('建物', regex=False).to_numpy(dtype=bool)
+        has_park = trade_type_str.str.contains('車位', regex=False).to_numpy(dtype=bool)
+        has_all = trade_type_str.str.contains('房地', regex=False).to_numpy(dtype=bool)
+        trade_type = np.select(
+            [has_land & ~has_build, has_build & ~has_land, has_park & ~has_all, has_all & has_park,
+             has_all | (has_land & has_build)],
+            [3, 2, 4, 5, 1],
+            default=0,
+        ).astype(np.int8)
+        # 無法識別的類型與逐列處理相同，使用預設值 1（房地）
+        unknown = trade_type == 0
+        self.stats['trade_type_unknown'] = int(unknown.sum())
+        return np.where(unknown, 1, trade_type).astype(np.int8)
+
+    def _read_building_ages_batch(self, f, build_file: str = '') -> pd.Series:
+        """以批次模式讀取建物檔案的屋齡對照表，規則與 load_building_ages 相同
+        
+        Args:
+            f: 已開啟的建物檔案
+            build_file: 建物檔案名稱，用於日誌
             
+        Returns:
+            pd.Series: 以編號為索引的屋齡
+        """
+        start = self._start_file()
+        df = pd.read_csv(f, skiprows=[1], encoding='utf-8-sig', keep_default_na=False,
+                         usecols=lambda name: '編號' in name or '屋齡' in name)
+        code_field = next((name for name in df.columns if '編號' in name), None)
+        age_field = next((name for name in df.columns if '屋齡' in name), None)
+        if not code_field or not age_field:
+            logger.warning("%s 找不到必要的欄位, 編號欄位: %s, 屋齡欄位: %s", build_file, code_field, age_field)
+            return pd.Series(dtype=np.int64)
+        
+        code = df[code_field].astype(str).str.strip()
+        age_str = df[age_field].astype(str).str.strip()
+        age, valid = self._to_number_batch(df[age_field])
+        present = (code != '').to_numpy(dtype=bool) & (age_str != '').to_numpy(dtype=bool)
+        self.stats['rows'] = len(df)
+        self.stats['age_format'] = int((present & ~valid).sum())
+        self.stats['age_negative'] = int((present & valid & (age < 0)).sum())
+        valid = valid & (code != '').to_numpy(dtype=bool) & (age >= 0)
+        code = code[valid].str.replace(r'F[A-Z]B', 'FAI', regex=True)
+        ages = pd.Series(age[valid].astype(np.int64), index=code.to_numpy())
+        # 編號重複時以最後一筆為準（與字典相同）
+        ages = ages[~ages.index.duplicated(keep='last')]
+        self._log_file_stats(build_file, len(ages), start)
+        return ages
+
+    @staticmethod
+    def _to_number_batch(values: pd.Series, integer: bool = True):
+        """將欄位轉換為數字
+        
+        Args:
+            values: csv 解析後的欄位，整欄都是數字時已經是數值型別，否則為字串
+            integer: 是否只接受整數
+            
+        Returns:
+            (np.ndarray, np.ndarray): 數值陣列（無法轉換的值為 0）與是否轉換成功的布林陣列
+        """
+        if not pd.api.types.is_numeric_dtype(values):
+            # 欄位中有無法解析的文字，移除逗號與空白後再轉換
+            values = values.astype(str).str.replace(',', '', regex=False).str.strip()
+            values = pd.to_numeric(values, errors='coerce')
+        numbers = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        valid = ~np.isnan(numbers)
+        if integer:
+            valid &= numbers == np.floor(numbers)
+        return np.where(valid, numbers, 0.0), valid
+            
+    # ===== 多行程處理模式 =====
+    # 依 (資料來源, 縣市代號) 切分工作，每個工作在獨立的行程中建立自己的屋齡對照表，
+    # 處理完成後回傳結果，最後再依序合併
+
+    def process_sources_parallel(self, source_paths: List[str], workers: int = None, batch: bool = True):
+        """以多個行程處理多個資料來源
+        
+        Args:
+            source_paths: 資料來源路徑列表（解壓縮後的資料夾或 zip 檔），可用 CsvSource.listSources 取得
+            workers: 行程數量，預設為 CPU 核心數
+            batch: True 使用批次處理並回傳 pd.DataFrame，False 使用逐列處理並回傳字典串列
+            
+        Returns:
+            pd.DataFrame 或 List[Dict]
+        """
+        # 第一步：列出所有 (資料來源, 縣市代號) 工作
+        shards = []
+        for source_path in source_paths:
+            try:
+                with openSource(source_path) as source:
+                    cities = sorted({name[0] for name in source.names()})
+            except Exception as e:
+                logger.error("讀取資料來源時發生錯誤: %s, %s", source_path, e)
+                continue
+            shards.extend((source_path, city, batch) for city in cities)
+        
+        # 第二步：平行處理，結果依工作順序合併，確保每次輸出的順序相同
+        results = [None] * len(shards)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_process_shard, *shard): index for index, shard in enumerate(shards)}
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    logger.error("處理 %s 縣市 %s 時發生錯誤: %s", shards[index][0], shards[index][1], e)
+        results = [result for result in results if result is not None]
+        
+        if batch:
+            results = [result for result in results if len(result)]
+            if not results:
+                return pd.DataFrame(columns=BATCH_COLUMNS)
+            return pd.concat(results, ignore_index=True)
+        
+        all_data = []
+        for result in results:
+            all_data.extend(result)
+        return self._update_town_codes(all_data)
+
+    def process_city(self, source, city: str, batch: bool = True):
+        """處理資料來源中單一縣市的檔案，每個主檔使用自己對應的建物檔屋齡
+        
+        Args:
+            source: 已開啟的資料來源（CsvSource）
+            city: 縣市代號小寫，例如 'a'
+            batch: 是否使用批次處理
+            
+        Returns:
+            pd.DataFrame 或 List[Dict]
+        """
+        names = set(source.names())
+        main_files = sorted(name for name in names if name.startswith(f"{city}_") and '_build.csv' not in name)
+        results = []
+        for filename in main_files:
+            file_info = self.parse_filename(filename)
+            if not file_info:
+                continue
+            build_filename = filename.replace('.csv', '_build.csv')
+            if batch:
+                building_ages = pd.Series(dtype=np.int64)
+                if build_filename in names:
+                    with source.open(build_filename) as f:
+                        building_ages = self._read_building_ages_batch(f, build_filename)
+                with source.open(filename) as f:
+                    results.append(self.process_file_batch(f, filename, file_info, building_ages))
+            else:
+                self.building_ages = {}
+                if build_filename in names:
+                    with source.open(build_filename) as f:
+                        self._load_building_ages(f, build_filename, filename)
+                with source.open(filename) as f:
+                    results.extend(self._process_stream(f, filename, file_info))
+        
+        if batch:
+            results = [result for result in results if len(result)]
+            return pd.concat(results, ignore_index=True) if results else pd.DataFrame(columns=BATCH_COLUMNS)
+        return results
+
     def _process_building_row(self, row: Dict):
         """處理建物檔案的單筆資料
         
@@ -360,20 +740,24 @@ class DataFormatter:
                     
                     if age >= 0:
                         self.building_ages[code] = age
-                        print(f"新增屋齡對照: 編號={code}, 屋齡={age}")
+                        if self.trace:
+                            logger.log(TRACE, "新增屋齡對照: 編號=%s, 屋齡=%d", code, age)
                     else:
-                        print(f"警告: 計算出負數屋齡 {age} (編號={code})")
+                        self.stats['age_negative'] += 1
+                        if self.trace:
+                            logger.log(TRACE, "計算出負數屋齡 %d (編號=%s)", age, code)
                 except ValueError:
-                    print(f"警告: 無效的建築完成年月 '{construction_date}' (編號={code})")
+                    self.stats['age_format'] += 1
+                    if self.trace:
+                        logger.log(TRACE, "無效的建築完成年月 '%s' (編號=%s)", construction_date, code)
             else:
-                if not code:
-                    print("警告: 找不到編號")
-                if not construction_date:
-                    print("警告: 找不到建築完成年月")
+                self.stats['missing_field'] += 1
+                if self.trace:
+                    logger.log(TRACE, "找不到編號或建築完成年月 (編號=%s, 建築完成年月=%s)", code, construction_date)
                     
         except Exception as e:
-            print(f"處理建物資料列時發生錯誤: {str(e)}")
-            print("原始資料:", row)
+            self.stats['error'] += 1
+            logger.debug("處理建物資料列時發生錯誤: %s, 原始資料: %s", e, row)
 
     def read_csv(self, file_path: str) -> List[Dict]:
         """讀取CSV檔案並轉換格式"""
@@ -418,7 +802,7 @@ class DataFormatter:
                         data.append(processed_row)
                         
         except Exception as e:
-            print(f"讀取檔案 {file_path} 時發生錯誤: {str(e)}")
+            logger.error("讀取檔案 %s 時發生錯誤: %s", file_path, e)
             
         return data
 
@@ -454,7 +838,7 @@ class DataFormatter:
                 'trade_type': trade_type
             }
         except Exception as e:
-            print(f"解析檔名出錯: {filename}, 錯誤: {str(e)}")
+            logger.error("解析檔名出錯: %s, 錯誤: %s", filename, e)
             return None
 
     def _get_file_pattern(self, main_file_name: str) -> str:
@@ -572,9 +956,13 @@ class DataFormatter:
             # print(f"編號: {code}")
             
             # 從建物屋齡對照表查詢屋齡
-            age = self.building_ages.get(code, 0)
-            # 印出編號跟屋齡
-            print(f"編號: {code}, 屋齡: {age}")
+            age = self.building_ages.get(code)
+            if age is None:
+                age = 0
+            else:
+                self.stats['age_match'] += 1
+            if self.trace:
+                logger.log(TRACE, "編號: %s, 屋齡: %s", code, age)
             
             # 處理價格資訊
             try:
@@ -582,6 +970,7 @@ class DataFormatter:
                 price_unit = int(price_unit.replace(',', ''))
                 total_area = float(total_area.replace(',', ''))
             except (ValueError, AttributeError):
+                self.stats['price_format'] += 1
                 price_total = 0
                 price_unit = 0
                 total_area = 0.0
@@ -596,7 +985,7 @@ class DataFormatter:
             # print(f"交易標的類型: {trade_type}")
             
             # 取得行政區資訊
-            town_info = self.get_town_info(file_info['city_code'], address)
+            town_info = self.get_town_info(file_info['city_code'], address, town_name)
             # print(f"行政區資訊: {town_info}")
             
             result = {
@@ -618,9 +1007,8 @@ class DataFormatter:
             return result
             
         except Exception as e:
-            print(f"處理 a 檔案資料列時發生錯誤: {str(e)}")
-            print("原始資料:", row)
-            traceback.print_exc()
+            self.stats['error'] += 1
+            logger.debug("處理 a 檔案資料列時發生錯誤: %s, 原始資料: %s", e, row, exc_info=self.trace)
             return None
 
     def _process_b_file_row(self, row: Dict, file_info: Dict) -> Dict:
@@ -641,8 +1029,13 @@ class DataFormatter:
             code = row['編號']
             
             # 從建物屋齡對照表查詢屋齡
-            age = self.building_ages.get(code, 0)
-            print(f"建物屋齡: {age}")
+            age = self.building_ages.get(code)
+            if age is None:
+                age = 0
+            else:
+                self.stats['age_match'] += 1
+            if self.trace:
+                logger.log(TRACE, "編號: %s, 建物屋齡: %s", code, age)
             
             # 處理價格資訊
             try:
@@ -650,6 +1043,7 @@ class DataFormatter:
                 price_unit = int(price_unit.replace(',', ''))
                 total_area = float(total_area.replace(',', ''))
             except (ValueError, AttributeError):
+                self.stats['price_format'] += 1
                 price_total = 0
                 price_unit = 0
                 total_area = 0.0
@@ -658,7 +1052,7 @@ class DataFormatter:
             trade_type = self.get_trade_type(trade_type_str)
             
             # 取得行政區資訊
-            town_info = self.get_town_info(file_info['city_code'], address)
+            town_info = self.get_town_info(file_info['city_code'], address, town_name)
             
             result = {
                 'city_code': file_info['city_code'],
@@ -679,8 +1073,8 @@ class DataFormatter:
             return result
             
         except Exception as e:
-            print("處理 b 檔案資料列時發生錯誤:", str(e))
-            print("原始資料:", row)
+            self.stats['error'] += 1
+            logger.debug("處理 b 檔案資料列時發生錯誤: %s, 原始資料: %s", e, row, exc_info=self.trace)
             return None
 
     def _process_c_file_row(self, row: Dict, file_info: Dict) -> Dict:
@@ -707,12 +1101,13 @@ class DataFormatter:
                 price_unit = int(price_unit.replace(',', ''))
                 total_area = float(total_area.replace(',', ''))
             except (ValueError, AttributeError):
+                self.stats['price_format'] += 1
                 price_total = 0
                 price_unit = 0
                 total_area = 0.0
                 
             # 取得行政區資訊
-            town_info = self.get_town_info(file_info['city_code'], address)
+            town_info = self.get_town_info(file_info['city_code'], address, town_name)
             
             result = {
                 'city_code': file_info['city_code'],
@@ -733,9 +1128,8 @@ class DataFormatter:
             return result
             
         except Exception as e:
-            print(f"處理 c 檔案資料列時發生錯誤: {str(e)}")
-            print("原始資料:", row)
-            traceback.print_exc()
+            self.stats['error'] += 1
+            logger.debug("處理 c 檔案資料列時發生錯誤: %s, 原始資料: %s", e, row, exc_info=self.trace)
             return None
     
     def _process_land_file_row(self, row: Dict, file_info: Dict) -> Dict:
@@ -771,12 +1165,13 @@ class DataFormatter:
                 'age': '0'  # 土地沒有屋齡
             }
             
-            print("土地檔案處理結果:", result)
+            if self.trace:
+                logger.log(TRACE, "土地檔案處理結果: %s", result)
             return result
             
         except Exception as e:
-            print(f"處理土地資料時發生錯誤: {str(e)}")
-            print("原始資料:", row)
+            self.stats['error'] += 1
+            logger.debug("處理土地資料時發生錯誤: %s, 原始資料: %s", e, row)
             return None
 
     def _process_park_file_row(self, row: Dict, file_info: Dict) -> Dict:
@@ -815,12 +1210,13 @@ class DataFormatter:
                 'age': '0'  # 車位沒有屋齡
             }
             
-            print("車位檔案處理結果:", result)
+            if self.trace:
+                logger.log(TRACE, "車位檔案處理結果: %s", result)
             return result
             
         except Exception as e:
-            print(f"處理車位資料時發生錯誤: {str(e)}")
-            print("原始資料:", row)
+            self.stats['error'] += 1
+            logger.debug("處理車位資料時發生錯誤: %s, 原始資料: %s", e, row)
             return None
 
     def _process_build_file_row(self, row: Dict, file_info: Dict) -> Dict:
@@ -853,21 +1249,50 @@ class DataFormatter:
                 'age': age
             }
             
-            print("建物檔案處理結果:", result)
+            if self.trace:
+                logger.log(TRACE, "建物檔案處理結果: %s", result)
             return result
             
         except Exception as e:
-            print(f"處理建物資料時發生錯誤: {str(e)}")
-            print("原始資料:", row)
+            self.stats['error'] += 1
+            logger.debug("處理建物資料時發生錯誤: %s, 原始資料: %s", e, row)
             return None
-    
+
+
+def _process_shard(source_path: str, city: str, batch: bool):
+    """在子行程中處理一個 (資料來源, 縣市代號) 工作"""
+    formatter = DataFormatter()
+    with openSource(source_path) as source:
+        return formatter.process_city(source, city, batch)
 
 
 if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="將 opendata 的 csv 檔案彙整成要寫入資料庫的格式")
+    parser.add_argument("--all", action="store_true", help="以多行程處理 opendata 中所有的資料來源，並寫入欄式快取")
+    parser.add_argument("--workers", type=int, default=None, help="行程數量，預設為 CPU 核心數")
+    parser.add_argument("--log-level", default="INFO", choices=["TRACE", "DEBUG", "INFO", "WARNING"],
+                        help="日誌等級，TRACE 會輸出每一筆資料的處理訊息（速度很慢）")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.getLevelName(args.log_level),
+                        format="%(asctime)s %(levelname)s %(message)s")
+
     formatter = DataFormatter()
     
     # 取得目前檔案的絕對路徑
     current_dir = os.path.dirname(os.path.abspath(__file__))
+
+    if args.all:
+        from lib.ColumnStore import ColumnStore
+        from lib.CsvSource import listSources
+        sources = listSources(os.path.join(os.path.dirname(current_dir), 'opendata'))
+        all_data = formatter.process_sources_parallel(sources, args.workers)
+        store = ColumnStore()
+        store.write(all_data)
+        print(f"\n處理完成，共有 {len(all_data)} 筆資料")
+        print(f"欄式快取已儲存至: {store.root}")
+        sys.exit(0)
+
     # 構建資料目錄的絕對路徑
     directory_path = os.path.join(os.path.dirname(current_dir), 'opendata', 'datatest')
     
@@ -895,6 +1320,12 @@ if __name__ == '__main__':
     print(f"\n處理完成，共有 {len(all_data)} 筆資料")
     print(f"完整資料已儲存至: {json_file}")
     
+    # 儲存欄式快取，查詢與預測模型可以只讀取需要的欄位與分割
+    from lib.ColumnStore import ColumnStore
+    store = ColumnStore()
+    store.write(all_data)
+    print(f"欄式快取已儲存至: {store.root}")
+    
     if len(all_data) > 0:
         # 儲存範例資料（前10筆）
         sample_file = os.path.join(output_path, 'sample_data.json')
@@ -0,0 +1,48 @@
+import os
+from lib.MySQL import MySQL
+from lib.SQLite import SQLite
+
+'''
+資料庫後端選擇
+
+依環境變數 LVR_BACKEND 決定使用的資料庫：
+    mysql   遠端 MySQL（預設）
+    sqlite  本機 SQLite 資料庫檔案（python lib/SQLite.py 由 opendata 的 csv 建立），不需要網路連線
+    parquet 本機 Parquet 欄式快取（python lib/DataFormatting.py 建立，lib/ColumnStore.py），不需要網路連線，
+            只提供每月彙整（lib.MonthlyAggregate.queryMonthly 與 monthlySlices）
+MySQL 與 SQLite 提供相同的 query / insert_many / execute_transaction 方法與 dialect 屬性
+'''
+
+def _columnStore():
+    # pyarrow 只有使用欄式快取時才需要載入
+    from lib.ColumnStore import ColumnStore
+    return ColumnStore()
+
+BACKENDS = {
+    "mysql": MySQL,
+    "sqlite": SQLite,
+    "parquet": _columnStore,
+}
+BACKEND = os.environ.get("LVR_BACKEND", "mysql").lower()
+
+def openDatabase(backend=None):
+    '''
+    開啟資料庫
+    with openDatabase() as db:
+        result = db.query(*Select(dialect=db.dialect).createMonthlyQuery(conditions))
+    Args:
+        backend: (string) "mysql"、"sqlite" 或 "parquet"，預設為 BACKEND
+    Return:
+        MySQL、SQLite 或 ColumnStore
+    '''
+    backend = (backend or BACKEND).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"未知的資料庫後端: {backend}")
+    return BACKENDS[backend]()
+
+def warmUp(backend=None):
+    '''
+    預先建立資料庫連線（只有 MySQL 需要，SQLite 開啟本機檔案不必等待）
+    '''
+    if (backend or BACKEND).lower() == "mysql":
+        MySQL.warmUp()
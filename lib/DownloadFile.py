@@ -1,7 +1,14 @@
 import os
 import requests
+from requests.adapters import HTTPAdapter
 from datetime import datetime
 import zipfile
+import shutil
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 '''
 open data 下載規則與邏輯
@@ -26,6 +33,18 @@ https://plvr.land.moi.gov.tw//DownloadSeason?season=113S3&type=zip&fileName=lvr_
 第五區塊：land表示土地 build表示建物 park 表示車位
 '''
 
+# 預設同時下載的執行緒數量
+DEFAULT_WORKERS = 4
+
+# 下載紀錄檔名，存放在 opendata 資料夾中
+MANIFEST_FILE = "manifest.json"
+
+# 每次寫入檔案的區塊大小
+CHUNK_SIZE = 1024 * 1024
+
+# 連線與讀取逾時秒數
+TIMEOUT = 60
+
 def getSeason():
     '''
     取得從101年到當前的年+季
@@ -49,27 +68,201 @@ def getSeason():
             items[index] = f"{year}S{s}"
     return items
 
-def downloadFile(file, url, params={}):
+def createSession(workers=DEFAULT_WORKERS):
     '''
+    建立共用的 requests.Session，讓同一主機的連線可以重複使用（keep-alive）
+    Args:
+        workers: (int) 同時下載的執行緒數量，連線池大小會跟著調整
+    Return:
+        requests.Session
+    '''
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+class DownloadProgress:
+    '''
+    下載進度計數器，可在多個下載執行緒之間共用
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.startTime = time.monotonic()
+        # 已接收的位元組數
+        self.bytes = 0
+        # 續傳時略過（不必重新下載）的位元組數
+        self.resumedBytes = 0
+        # 已完成的檔案數
+        self.files = 0
+
+    def add(self, size):
+        with self.lock:
+            self.bytes += size
+
+    def resumed(self, size):
+        with self.lock:
+            self.resumedBytes += size
+
+    def done(self):
+        with self.lock:
+            self.files += 1
+
+    def throughput(self):
+        '''
+        Return:
+            float 平均下載速度（位元組/秒）
+        '''
+        elapsed = time.monotonic() - self.startTime
+        return self.bytes / elapsed if elapsed > 0 else 0.0
+
+    def __str__(self):
+        return (f"已完成 {self.files} 個檔案，下載 {self.bytes / 1024 / 1024:.1f} MB"
+                f"（續傳略過 {self.resumedBytes / 1024 / 1024:.1f} MB），"
+                f"平均 {self.throughput() / 1024 / 1024:.2f} MB/s")
+
+def _readPartInfo(partPath):
+    '''
+    讀取未完成檔案對應的 ETag/Last-Modified，續傳時用 If-Range 確認伺服器檔案沒有變更
+    '''
+    try:
+        with open(f"{partPath}.json", 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _removePart(partPath):
+    for path in (partPath, f"{partPath}.json"):
+        if os.path.exists(path):
+            os.remove(path)
+
+def downloadFile(file, url, params={}, session=None, headers=None, progress=None, retries=3):
+    '''
+    以串流方式下載檔案，資料先寫到 {file}.part，
+    連線中斷時使用 Range 標頭從已下載的位置續傳，完成並確認大小後才更名為 file
     Args:
         file: (string) 要存放的檔案路徑含檔名
         url: (string) 要下載的檔案位置
         params: (dist) 要串送的參數
+        session: (requests.Session) 共用連線，未提供時使用一次性的連線
+        headers: (dict) 額外的請求標頭，例如條件式下載的 If-None-Match
+        progress: (DownloadProgress) 下載進度計數器
+        retries: (int) 連線中斷時最多續傳幾次
     Return:
-        bool
+        dict {"status": 是否下載了新檔案, "code": HTTP狀態碼, "headers": 回應標頭}
     '''
-    # 當前程式的路徑
-    current_path = os.getcwd()
-    # 將資料存在opendata資料夾中
-    response = requests.get(url, params)
-    if response.status_code == 200:
-        with open(file, 'wb') as file:
-            # 分塊下載避免資料不完全
-            for chunk in response.iter_content(1024):  
-                file.write(chunk)
-            return True
-    else:
-        return False
+    partPath = f"{file}.part"
+    result = {"status": False, "code": 0, "headers": {}}
+    for attempt in range(retries + 1):
+        # 壓縮傳輸會讓 Content-Length 與寫入的大小不一致，也無法續傳
+        requestHeaders = {"Accept-Encoding": "identity", **(headers or {})}
+        offset = os.path.getsize(partPath) if os.path.exists(partPath) else 0
+        partInfo = _readPartInfo(partPath) if offset > 0 else {}
+        validator = partInfo.get("etag") or partInfo.get("last_modified")
+        if offset > 0 and validator:
+            # 伺服器檔案變更時 If-Range 不成立，會回傳完整檔案（200）
+            requestHeaders["Range"] = f"bytes={offset}-"
+            requestHeaders["If-Range"] = validator
+        else:
+            offset = 0
+        try:
+            with (session or requests).get(url, params, headers=requestHeaders, stream=True, timeout=TIMEOUT) as response:
+                result = {"status": False, "code": response.status_code, "headers": response.headers}
+                if response.status_code == 416:
+                    # 已下載的部分不符合伺服器的檔案，重新下載
+                    _removePart(partPath)
+                    continue
+                if response.status_code not in (200, 206):
+                    if response.status_code == 304:
+                        _removePart(partPath)
+                    return result
+
+                if response.status_code == 206:
+                    # Content-Range: bytes {start}-{end}/{total}
+                    contentRange = response.headers.get("Content-Range", "")
+                    start, _, total = contentRange.removeprefix("bytes ").partition("/")
+                    if not start.startswith(f"{offset}-"):
+                        _removePart(partPath)
+                        continue
+                    expectedSize = int(total) if total.isdigit() else None
+                    mode = 'ab'
+                    if progress:
+                        progress.resumed(offset)
+                else:
+                    length = response.headers.get("Content-Length", "")
+                    expectedSize = int(length) if length.isdigit() else None
+                    mode = 'wb'
+                    # 記錄檔案版本，下次續傳時使用
+                    with open(f"{partPath}.json", 'w', encoding='utf-8') as f:
+                        json.dump({
+                            "etag": response.headers.get("ETag"),
+                            "last_modified": response.headers.get("Last-Modified"),
+                        }, f)
+
+                with open(partPath, mode) as f:
+                    # 以大區塊直接寫入檔案，避免整個壓縮檔放在記憶體中
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        f.write(chunk)
+                        if progress:
+                            progress.add(len(chunk))
+        except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError, requests.exceptions.Timeout) as e:
+            print(f"下載中斷，準備續傳（第{attempt + 1}次）: {e}")
+            continue
+
+        size = os.path.getsize(partPath)
+        if expectedSize is not None and size != expectedSize:
+            print(f"檔案大小不符（{size}/{expectedSize}），準備續傳")
+            continue
+        os.replace(partPath, file)
+        _removePart(partPath)
+        if progress:
+            progress.done()
+        result["status"] = True
+        return result
+    return result
+
+def fileSha256(file):
+    '''
+    計算檔案的 sha256，用來判斷重新下載的壓縮檔內容是否有變更
+    Args:
+        file: (string) 檔案路徑
+    Return:
+        string
+    '''
+    sha = hashlib.sha256()
+    with open(file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+def manifestKey(item):
+    '''
+    取得 PARAMS 項目在下載紀錄中的索引鍵，例如 DownloadSeason/113S3
+    '''
+    params = item['params']
+    return f"{item['path']}/{params.get('season') or params.get('fileName')}"
+
+def loadManifest(path):
+    '''
+    讀取下載紀錄，紀錄每個檔案的 ETag/Last-Modified/size/sha256
+    Return:
+        dict 檔案不存在或格式錯誤時回傳空字典
+    '''
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def saveManifest(path, manifest):
+    '''
+    寫入下載紀錄，先寫到暫存檔再取代，避免中斷時留下不完整的檔案
+    '''
+    tmpPath = f"{path}.tmp"
+    with open(tmpPath, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmpPath, path)
 
 def UnZip(file, output):
     '''
@@ -105,38 +298,137 @@ for season in getSeason():
     PARAMS.append(index)
     PARAMS[index] = {"path": "DownloadSeason", "params":{"season": season, "type": "zip", "fileName": "lvr_landcsv.zip"}}
 
-i = 0
-# 當前程式的路徑
-current_path = os.getcwd()
-# 要存放下載檔案的資料夾路徑
-outputDir = f"{current_path}/../opendata"
-# 檢查資料夾是否存在，不存在則創建
-if not os.path.exists(outputDir):
-    os.makedirs(outputDir)
-# 下載檔案
-for item in PARAMS:
-
-    # 測試時只抓一筆就好
-    # if(i >= 1):
-    #     break
-    
-    # 壓縮檔名稱
-    zipPath = f"{outputDir}/data{i}.zip"
+def downloadAll(items, outputDir, workers=DEFAULT_WORKERS, extractWorkers=1, force=False, unzip=True):
+    '''
+    並行下載所有檔案，下載完成的檔案會立即交給解壓縮執行緒處理，
+    讓解壓縮與下一個檔案的下載重疊進行。
+    已下載過的檔案會依照下載紀錄（manifest.json）發出條件式請求，
+    伺服器回應未變更（304）或內容 sha256 相同時不會重新解壓縮。
+    unzip 為 False 時保留 dataN.zip 不解壓縮，讀取時由 lib/CsvSource.py 直接從 zip 串流取出 csv
+    Args:
+        items: (list) 要下載的檔案列表，格式同 PARAMS
+        outputDir: (string) 要存放下載檔案的資料夾路徑
+        workers: (int) 同時下載的執行緒數量
+        extractWorkers: (int) 同時解壓縮的執行緒數量
+        force: (bool) 忽略下載紀錄，全部重新下載並解壓縮
+        unzip: (bool) 是否解壓縮到 dataN 資料夾
+    Return:
+        dict {索引: bool} 每個檔案是否為最新狀態（下載並解壓縮成功或未變更）
+    '''
+    # 檢查資料夾是否存在，不存在則創建
+    if not os.path.exists(outputDir):
+        os.makedirs(outputDir)
 
-    # 下載檔案，將資料流寫到本地檔案中
-    result = downloadFile(zipPath, f"{URL}/{item['path']}", item['params'])
+    manifestPath = os.path.join(outputDir, MANIFEST_FILE)
+    manifest = {} if force else loadManifest(manifestPath)
+    manifestLock = threading.Lock()
+    progress = DownloadProgress()
 
-    if result == True:
+    def download(i, item):
+        # 壓縮檔名稱
+        zipPath = f"{outputDir}/data{i}.zip"
+        key = manifestKey(item)
+        entry = manifest.get(key, {})
+        dirPath = zipPath.replace(".zip", "")
+        # 解壓縮的資料夾（或保留的zip檔）還在才能使用條件式請求，否則必須重新下載
+        headers = {}
+        extracted = os.path.isdir(dirPath) if unzip else os.path.exists(zipPath)
+        if extracted:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        # 下載檔案，將資料流寫到本地檔案中
+        result = downloadFile(zipPath, f"{URL}/{item['path']}", item['params'], session, headers, progress)
+        if result["code"] == 304:
+            print(f"{i}-檔案未變更，略過下載")
+            return None, None
+        if not result["status"]:
+            print(f"{i}-下載失敗")
+            return False, None
         print(f"{i}-下載成功")
+        newEntry = {
+            "etag": result["headers"].get("ETag"),
+            "last_modified": result["headers"].get("Last-Modified"),
+            "size": os.path.getsize(zipPath),
+            "sha256": fileSha256(zipPath),
+        }
+        if not unzip:
+            # 保留zip檔，舊的解壓縮資料夾會優先被讀取，所以一併刪除
+            if os.path.isdir(dirPath):
+                shutil.rmtree(dirPath)
+            with manifestLock:
+                manifest[key] = newEntry
+            return None, None
+        # 內容與上次相同時不需要再解壓縮
+        if extracted and newEntry["sha256"] == entry.get("sha256"):
+            print(f"{i}-檔案內容未變更，略過解壓縮")
+            os.remove(zipPath)
+            with manifestLock:
+                manifest[key] = newEntry
+            return None, None
+        return zipPath, (key, newEntry)
+
+    def extract(i, zipPath, record):
         # 使用黨名作為資料夾將資料解壓縮
-        unzipResult = UnZip(zipPath, zipPath.replace(".zip", ""))
-        if unzipResult :
-            print(f"{i}-解壓縮完成")
-            if os.path.exists(zipPath):
-                os.remove(zipPath)
-                print(f"{i}-已刪除下載的ZIP檔")
-        else:
-            print(f"{i}-解壓縮失敗")
-    else:
-        print(f"{i}-下載失敗")
-    i += 1
\ No newline at end of file
+        try:
+            UnZip(zipPath, zipPath.replace(".zip", ""))
+        except zipfile.BadZipFile as e:
+            print(f"{i}-解壓縮失敗 {e}")
+            return False
+        print(f"{i}-解壓縮完成")
+        if os.path.exists(zipPath):
+            os.remove(zipPath)
+            print(f"{i}-已刪除下載的ZIP檔")
+        # 解壓縮完成後才寫入紀錄，中斷時下次會重新下載
+        with manifestLock:
+            manifest[record[0]] = record[1]
+        return True
+
+    results = {}
+    session = createSession(workers)
+    try:
+        with session, \
+                ThreadPoolExecutor(max_workers=workers) as downloadPool, \
+                ThreadPoolExecutor(max_workers=extractWorkers) as extractPool:
+            downloads = {downloadPool.submit(download, i, item): i for i, item in enumerate(items)}
+            extracts = {}
+            # 先下載完成的先解壓縮，不必等待其他檔案
+            for future in as_completed(downloads):
+                i = downloads[future]
+                try:
+                    zipPath, record = future.result()
+                except requests.exceptions.RequestException as e:
+                    print(f"{i}-下載失敗 {e}")
+                    zipPath, record = False, None
+                if not zipPath:
+                    # None 表示未變更，False 表示下載失敗
+                    results[i] = zipPath is None
+                    continue
+                extracts[extractPool.submit(extract, i, zipPath, record)] = i
+            for future in as_completed(extracts):
+                results[extracts[future]] = future.result()
+    finally:
+        saveManifest(manifestPath, manifest)
+        print(progress)
+    return dict(sorted(results.items()))
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="下載實價登錄 open data 並解壓縮")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="同時下載的執行緒數量")
+    parser.add_argument("--force", action="store_true", help="忽略下載紀錄，全部重新下載")
+    parser.add_argument("--keep-zip", action="store_true", help="保留zip檔不解壓縮，讀取時直接從zip取出csv")
+    args = parser.parse_args()
+
+    # 當前程式的路徑
+    current_path = os.getcwd()
+    # 要存放下載檔案的資料夾路徑
+    outputDir = f"{current_path}/../opendata"
+
+    # 測試時只抓一筆就好
+    # PARAMS = PARAMS[:1]
+
+    results = downloadAll(PARAMS, outputDir, args.workers, force=args.force, unzip=not args.keep_zip)
+    print(f"完成 {sum(results.values())}/{len(PARAMS)} 個檔案")
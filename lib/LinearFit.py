@@ -0,0 +1,312 @@
+"""
+    一次迴歸（最小平方法直線）的封閉解
+
+    predictive_model 原本將每月平均單價轉換為 DataFrame 再以 np.polyfit(x, y, 1) 擬合，
+    匯入 pandas 與建立 DataFrame 的時間遠多於擬合本身。直線只需要五個累計值
+        n、Σx、Σy、Σxy、Σx²
+    就能算出斜率與截距：
+        斜率 = (nΣxy - ΣxΣy) / (nΣx² - (Σx)²)
+        截距 = (Σy - 斜率Σx) / n
+    累計值可以由 NumPy 陣列一次計算，也可以分批累加（LinearFit.update），不必保留原始資料；
+    GroupedLinearFit 以 np.bincount 一次計算多組（例如縣市內每個鄉鎮市區）的累計值，一次預測多個目標年月
+
+    加權迴歸與預測區間：
+        每月平均單價的可信度與交易筆數有關，以每月筆數 n_i 為權重擬合每月平均單價，
+        結果與以每一筆交易擬合相同（最小平方法的 Σ n_i(ȳ_i - a - bx_i)² 與 ΣΣ(y_ij - a - bx_i)² 只差與 a、b 無關的常數）
+        另外累加 Σy²（每月的單價平方和 sumsq，Select.createMonthlyQuery 的 sumsq 欄位），
+        殘差平方和 SSE = Σy² - aΣy - bΣxy 包含月內的差異，可以算出每筆交易的預測區間
+
+    x 為與基期（最早的交易年月）相差的月數，數值很小，直接累加不會有明顯的浮點誤差
+"""
+
+from statistics import NormalDist
+from typing import Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+
+def monthIndex(trade_ym, base_ym):
+    """
+    交易年月（民國，如 11110）轉換為與基期相差的月數
+
+    Example:
+        >>> monthIndex(np.array([11110, 11205, 11307]), 11110)
+        array([ 0,  7, 21])
+    """
+    trade_ym = np.asarray(trade_ym)
+    return (trade_ym // 100 - base_ym // 100) * 12 + (trade_ym % 100 - base_ym % 100)
+
+
+def tQuantile(p: float, dof):
+    """
+    t 分布的分位數（沒有 scipy，以常態分位數的 Cornish-Fisher 展開近似，自由度 1、2 使用精確解）
+
+    Args:
+        p: 機率，例如 0.975
+        dof: 自由度（純量或陣列）
+
+    Example:
+        >>> round(float(tQuantile(0.975, 10)), 3)
+        2.228
+    """
+    dof = np.asarray(dof, dtype=np.float64)
+    z = NormalDist().inv_cdf(p)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        v = 1.0 / dof
+        t = (z
+             + v * (z ** 3 + z) / 4
+             + v ** 2 * (5 * z ** 5 + 16 * z ** 3 + 3 * z) / 96
+             + v ** 3 * (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / 384
+             + v ** 4 * (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / 92160)
+        t = np.where(dof == 1, np.tan(np.pi * (p - 0.5)), t)
+        t = np.where(dof == 2, (2 * p - 1) / np.sqrt(2 * p * (1 - p)), t)
+    return np.where(dof >= 1, t, np.nan)
+
+
+class LinearFit:
+    """以累計值計算的一次迴歸
+
+    Example:
+        >>> fit = LinearFit().update([0, 7, 21], [116730, 121716, 124736])
+        >>> fit.predict(29)
+        128099.4...
+    """
+
+    def __init__(self):
+        self.n = 0.0
+        self.sx = 0.0
+        self.sy = 0.0
+        self.sxy = 0.0
+        self.sxx = 0.0
+        self.syy = 0.0
+
+    def update(self, x, y, weight=None, sumsq=None) -> "LinearFit":
+        """
+        累加一批資料
+
+        Args:
+            x: 自變數（純量或陣列）
+            y: 應變數（純量或陣列）
+            weight: 每筆資料的權重（筆數），預設每筆為 1；y 為每月平均單價時傳入每月筆數即為加權迴歸
+            sumsq: 每筆資料代表的原始值平方和（每月的單價平方和，需要同時傳入 weight），預設為 weight * y²（不含月內的差異）
+
+        Returns:
+            LinearFit: 自己，可以連續呼叫
+        """
+        x = np.atleast_1d(np.asarray(x, dtype=np.float64))
+        y = np.atleast_1d(np.asarray(y, dtype=np.float64))
+        if weight is None:
+            self.n += x.size
+            self.sx += x.sum()
+            self.sy += y.sum()
+            self.sxy += x @ y
+            self.sxx += x @ x
+            self.syy += y @ y
+        else:
+            w = np.broadcast_to(np.asarray(weight, dtype=np.float64), x.shape)
+            wx = w * x
+            wy = w * y
+            self.n += w.sum()
+            self.sx += wx.sum()
+            self.sy += wy.sum()
+            self.sxy += wx @ y
+            self.sxx += wx @ x
+            self.syy += wy @ y if sumsq is None else np.sum(sumsq)
+        return self
+
+    def merge(self, other: "LinearFit") -> "LinearFit":
+        """合併另一組累計值（例如分批或分組計算的結果）"""
+        self.n += other.n
+        self.sx += other.sx
+        self.sy += other.sy
+        self.sxy += other.sxy
+        self.sxx += other.sxx
+        self.syy += other.syy
+        return self
+
+    def coefficients(self) -> Tuple[float, float]:
+        """
+        斜率與截距
+
+        只有一個月份（x 全部相同）時無法決定斜率（np.polyfit 會發生 LinAlgError），斜率為 0，截距為平均值
+
+        Returns:
+            (float, float): (斜率, 截距)
+        """
+        if self.n == 0:
+            raise ValueError("沒有可擬合的資料")
+        denominator = self.n * self.sxx - self.sx * self.sx
+        # 累加的捨入誤差可能讓 x 全部相同時的分母不是剛好 0
+        if denominator <= 1e-12 * self.n * self.sxx:
+            return 0.0, float(self.sy / self.n)
+        slope = (self.n * self.sxy - self.sx * self.sy) / denominator
+        intercept = (self.sy - slope * self.sx) / self.n
+        return float(slope), float(intercept)
+
+    def predict(self, x):
+        """預測 x 的值"""
+        slope, intercept = self.coefficients()
+        return intercept + slope * x
+
+    def residualVariance(self) -> float:
+        """
+        殘差變異數 s² = SSE / (n - 2)，n 為權重總和（加權時為交易筆數），n <= 2 時為 nan
+        """
+        if self.n <= 2:
+            return float("nan")
+        slope, intercept = self.coefficients()
+        sse = self.syy - intercept * self.sy - slope * self.sxy
+        return max(float(sse), 0.0) / (self.n - 2)
+
+    def interval(self, x, level: float = 0.95, weight: float = 1.0):
+        """
+        x 的預測區間
+
+        Args:
+            x: 自變數（純量或陣列）
+            level: 信賴水準
+            weight: 預測對象的權重；加權迴歸時 1 為單筆交易的區間，m 為 m 筆交易平均的區間；
+                    未加權（每月平均單價）時 1 為一個月平均單價的區間
+
+        Returns:
+            (預測值, 下限, 上限)
+        """
+        center = self.predict(x)
+        sxx = self.sxx - self.sx * self.sx / self.n
+        mean_x = self.sx / self.n
+        leverage = (np.asarray(x, dtype=np.float64) - mean_x) ** 2 / sxx if sxx > 1e-12 * self.sxx else 0.0
+        se = np.sqrt(self.residualVariance() * (1.0 / weight + 1.0 / self.n + leverage))
+        half = tQuantile(0.5 + level / 2, self.n - 2) * se
+        return center, center - half, center + half
+
+
+def fitMonthly(origin_data: Dict[int, float], stats: Optional[Dict[int, tuple]] = None) -> Tuple[LinearFit, int]:
+    """
+    由每月平均單價（Tools.getKeyByMonthly 的結果，依交易年月排序）建立迴歸
+
+    Args:
+        origin_data: {交易年月: 平均單價}
+        stats: {交易年月: (筆數, 單價平方和)}（Tools.getKeyByMonthly 回傳的 MonthlyResult.stats），有傳入時以每月筆數加權，
+               平方和為 None 時預測區間不含月內的差異
+
+    Returns:
+        (LinearFit, int): (迴歸, 基期年月)
+    """
+    trade_ym = np.fromiter(origin_data.keys(), dtype=np.int64, count=len(origin_data))
+    price = np.fromiter(origin_data.values(), dtype=np.float64, count=len(origin_data))
+    base_ym = int(trade_ym[0])
+    x = monthIndex(trade_ym, base_ym)
+    if stats is None:
+        return LinearFit().update(x, price), base_ym
+    count = np.array([stats[ym][0] for ym in origin_data], dtype=np.float64)
+    squares = [stats[ym][1] for ym in origin_data]
+    sumsq = None if any(square is None for square in squares) else np.array(squares, dtype=np.float64)
+    return LinearFit().update(x, price, weight=count, sumsq=sumsq), base_ym
+
+
+class GroupedLinearFit:
+    """多組每月平均單價的一次迴歸，每一組的結果與 fitMonthly 相同
+
+    Example:
+        >>> fit = GroupedLinearFit.fromSeries({"A01": {11110: 116730, 11205: 121716}, "A02": {11201: 98000, 11212: 99500}})
+        >>> fit.predict([11401, 11402, 11403]).shape
+        (2, 3)
+    """
+
+    def __init__(self, groups, group_index, trade_ym, y, weight=None, sumsq=None):
+        """
+        Args:
+            groups: 各組的名稱
+            group_index: 每筆資料所屬的組（groups 的索引）
+            trade_ym: 每筆資料的交易年月
+            y: 每筆資料的值（平均單價）
+            weight: 每筆資料的權重（每月筆數），預設每筆為 1
+            sumsq: 每筆資料的單價平方和，參考 LinearFit.update
+        """
+        self.groups = list(groups)
+        size = len(self.groups)
+        group_index = np.asarray(group_index, dtype=np.int64)
+        trade_ym = np.asarray(trade_ym, dtype=np.int64)
+        y = np.asarray(y, dtype=np.float64)
+        w = np.ones(len(y)) if weight is None else np.asarray(weight, dtype=np.float64)
+        # 每一組的基期為該組最早的交易年月
+        base = np.full(size, np.iinfo(np.int64).max)
+        np.minimum.at(base, group_index, trade_ym)
+        self.base_ym = base
+        x = monthIndex(trade_ym, base[group_index]).astype(np.float64)
+        self.n = np.bincount(group_index, weights=w, minlength=size)
+        self.sx = np.bincount(group_index, weights=w * x, minlength=size)
+        self.sy = np.bincount(group_index, weights=w * y, minlength=size)
+        self.sxy = np.bincount(group_index, weights=w * x * y, minlength=size)
+        self.sxx = np.bincount(group_index, weights=w * x * x, minlength=size)
+        squares = w * y * y if weight is None or sumsq is None else np.asarray(sumsq, dtype=np.float64)
+        self.syy = np.bincount(group_index, weights=squares, minlength=size)
+
+    @classmethod
+    def fromSeries(cls, grouped_data: Dict[Hashable, Dict[int, float]],
+                   grouped_stats: Optional[Dict[Hashable, Dict[int, tuple]]] = None) -> "GroupedLinearFit":
+        """
+        由 {組: {交易年月: 平均單價}}（Tools.getKeyByGroupedMonthly 的結果）建立，
+        grouped_stats 為 {組: {交易年月: (筆數, 單價平方和)}}（Tools.getKeyByGroupedMonthly 回傳的 MonthlyResult.stats），有傳入時以每月筆數加權
+        """
+        groups = [group for group, series in grouped_data.items() if series]
+        lengths = [len(grouped_data[group]) for group in groups]
+        total = sum(lengths)
+        group_index = np.repeat(np.arange(len(groups)), lengths)
+        trade_ym = np.fromiter((ym for group in groups for ym in grouped_data[group]), dtype=np.int64, count=total)
+        y = np.fromiter((value for group in groups for value in grouped_data[group].values()),
+                        dtype=np.float64, count=total)
+        if grouped_stats is None:
+            return cls(groups, group_index, trade_ym, y)
+        stats = [grouped_stats[group][ym] for group in groups for ym in grouped_data[group]]
+        weight = np.array([count for count, _ in stats], dtype=np.float64)
+        sumsq = None if any(square is None for _, square in stats) else np.array([square for _, square in stats])
+        return cls(groups, group_index, trade_ym, y, weight, sumsq)
+
+    def coefficients(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        各組的斜率與截距（x 為與該組基期相差的月數），只有一個月份的組斜率為 0，截距為平均值
+
+        Returns:
+            (np.ndarray, np.ndarray): (斜率, 截距)
+        """
+        denominator = self.n * self.sxx - self.sx * self.sx
+        valid = denominator > 1e-12 * self.n * self.sxx
+        safe = np.where(valid, denominator, 1.0)
+        slope = np.where(valid, (self.n * self.sxy - self.sx * self.sy) / safe, 0.0)
+        intercept = (self.sy - slope * self.sx) / np.where(self.n > 0, self.n, 1.0)
+        return slope, intercept
+
+    def predict(self, target_ym) -> np.ndarray:
+        """
+        預測多個目標年月
+
+        Args:
+            target_ym: 目標交易年月的陣列（例如 [11401, 11402]）
+
+        Returns:
+            np.ndarray: 形狀為 (組數, 目標年月數) 的預測值
+        """
+        slope, intercept = self.coefficients()
+        x = monthIndex(np.asarray(target_ym, dtype=np.int64)[None, :], self.base_ym[:, None])
+        return intercept[:, None] + slope[:, None] * x
+
+    def interval(self, target_ym, level: float = 0.95, weight: float = 1.0):
+        """
+        多個目標年月的預測區間，參考 LinearFit.interval，資料不足三筆的組為 nan
+
+        Returns:
+            (預測值, 下限, 上限): 形狀皆為 (組數, 目標年月數)
+        """
+        center = self.predict(target_ym)
+        slope, intercept = self.coefficients()
+        n = np.where(self.n > 0, self.n, np.nan)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sse = np.maximum(self.syy - intercept * self.sy - slope * self.sxy, 0.0)
+            variance = np.where(self.n > 2, sse / (self.n - 2), np.nan)
+            sxx = self.sxx - self.sx * self.sx / n
+            x = monthIndex(np.asarray(target_ym, dtype=np.int64)[None, :], self.base_ym[:, None])
+            leverage = np.where(sxx[:, None] > 1e-12 * self.sxx[:, None], (x - (self.sx / n)[:, None]) ** 2 / sxx[:, None], 0.0)
+            se = np.sqrt(variance[:, None] * (1.0 / weight + 1.0 / n[:, None] + leverage))
+            half = tQuantile(0.5 + level / 2, self.n - 2)[:, None] * se
+        return center, center - half, center + half
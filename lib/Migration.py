@@ -0,0 +1,170 @@
+"""
+    lvr_lnd 資料表結構調整與索引檢查
+
+    GUI 的查詢條件固定為
+        city_code = %s AND town_code = %s AND trade_sign IN (...) AND trade_date BETWEEN ... AND
+        price_nuit BETWEEN ... AND total_area BETWEEN ... AND age BETWEEN ... (AND address LIKE '%...%')
+    沒有索引時每次查詢都要掃描整個資料表，資料越多越慢，這裡提供：
+        migrate  建立 trade_ym 產生欄位、(city_code, town_code, trade_sign, trade_date) 複合索引、地址的 ngram 全文索引
+                 預先彙整的每月統計資料表 lvr_lnd_monthly 與資料版本資料表 lvr_lnd_version
+        check    以 EXPLAIN 檢查 Select.createQuery 各種查詢組合是否使用索引
+
+    使用方式（在專案根目錄執行）:
+        python lib/Migration.py migrate
+        python lib/Migration.py check
+"""
+
+import argparse
+import os
+import sys
+
+# 添加父目錄到系統路徑，以便導入 lib 與 Select
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib.MySQL import MySQL
+from Select import Select
+
+TABLE = "lvr_lnd"
+
+# 結構調整項目：(名稱, 檢查是否已存在的查詢, 調整語句)
+# 檢查查詢傳回的數量大於 0 表示已經調整過，重複執行不會出錯
+MIGRATIONS = [
+    (
+        "trade_ym 產生欄位（交易年月，trade_date DIV 100）",
+        "SELECT COUNT(*) AS count FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = 'trade_ym'",
+        f"ALTER TABLE {TABLE} ADD COLUMN trade_ym INT AS (trade_date DIV 100) STORED",
+    ),
+    (
+        "idx_lvr_filter 複合索引 (city_code, town_code, trade_sign, trade_date)",
+        "SELECT COUNT(*) AS count FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = 'idx_lvr_filter'",
+        f"CREATE INDEX idx_lvr_filter ON {TABLE} (city_code, town_code, trade_sign, trade_date)",
+    ),
+    (
+        "idx_lvr_city_ym 索引 (city_code, trade_ym)，不指定鄉鎮市區時依年月彙整使用",
+        "SELECT COUNT(*) AS count FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = 'idx_lvr_city_ym'",
+        f"CREATE INDEX idx_lvr_city_ym ON {TABLE} (city_code, trade_ym)",
+    ),
+    (
+        "ft_lvr_address ngram 全文索引 (address)，地址搜尋使用（Select.ADDRESS_SEARCH = \"fulltext\"）",
+        "SELECT COUNT(*) AS count FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = 'ft_lvr_address'",
+        f"CREATE FULLTEXT INDEX ft_lvr_address ON {TABLE} (address) WITH PARSER ngram",
+    ),
+    (
+        "lvr_lnd_monthly 預先彙整的每月統計（建立後執行 python lib/MonthlyAggregate.py 計算）",
+        "SELECT COUNT(*) AS count FROM information_schema.TABLES "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = CONCAT(%s, '_monthly')",
+        "CREATE TABLE lvr_lnd_monthly ("
+        "city_code VARCHAR(10), town_code VARCHAR(10), trade_sign INT, age INT, trade_ym INT, "
+        "price_sum BIGINT, price_count INT, price_sumsq DOUBLE, "
+        "INDEX idx_lvr_monthly (city_code, town_code, trade_sign, trade_ym, age, price_sum, price_count))",
+    ),
+    (
+        "lvr_lnd_version 資料版本（匯入後遞增，其他電腦的查詢快取依此失效，參考 lib/QueryCache.py）",
+        "SELECT COUNT(*) AS count FROM information_schema.TABLES "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = CONCAT(%s, '_version')",
+        "CREATE TABLE lvr_lnd_version (id INT PRIMARY KEY, version BIGINT NOT NULL)",
+    ),
+]
+
+# 與 Tools.changeToSelectDict 相同的預設條件（價格與面積沒有輸入時為 0 ~ 9999999999999）
+BASE_CONDITIONS = {
+    "city_code": "A",
+    "town_code": None,
+    "trade_sign": None,
+    "address": None,
+    "trade_date": ["1091", "11310"],
+    "price_nuit": [0, 9999999999999],
+    "total_area": [0, 9999999999999],
+    "age": None,
+}
+
+# 要檢查的查詢組合：(說明, 條件)
+QUERY_SHAPES = [
+    ("縣市", {}),
+    ("縣市 + 鄉鎮市區", {"town_code": "A02"}),
+    ("縣市 + 鄉鎮市區 + 交易標的", {"town_code": "A02", "trade_sign": [1, 5]}),
+    ("縣市 + 鄉鎮市區 + 交易標的 + 屋齡", {"town_code": "A02", "trade_sign": [1, 5], "age": [5, 10]}),
+    ("縣市 + 鄉鎮市區 + 交易標的 + 地址", {"town_code": "A02", "trade_sign": [1, 5], "address": "大安路"}),
+    ("縣市 + 交易標的（不指定鄉鎮市區）", {"trade_sign": [1, 5]}),
+]
+
+
+def migrate(db) -> int:
+    """
+    執行尚未套用的結構調整
+
+    Args:
+        db (MySQL): 已連線的資料庫
+
+    Returns:
+        int: 本次套用的項目數
+    """
+    applied = 0
+    for name, check, statement in MIGRATIONS:
+        if db.query(check, (TABLE,))[0]["count"] > 0:
+            print(f"已存在: {name}")
+            continue
+        print(f"套用: {name}")
+        cursor = db.connection.cursor()
+        try:
+            cursor.execute(statement)
+            db.connection.commit()
+        finally:
+            cursor.close()
+        applied += 1
+    return applied
+
+
+def explain(db, query, params) -> dict:
+    """
+    以 EXPLAIN 檢查查詢使用的索引
+
+    Returns:
+        dict: {"key": 使用的索引, "type": 存取方式, "rows": 預估掃描筆數, "indexed": 是否使用索引}
+    """
+    plan = db.query("EXPLAIN " + query, params)
+    row = plan[0] if plan else {}
+    key = row.get("key")
+    return {
+        "key": key,
+        "type": row.get("type"),
+        "rows": row.get("rows"),
+        "indexed": key is not None and row.get("type") != "ALL",
+    }
+
+
+def check(db) -> bool:
+    """
+    檢查各種查詢組合（明細查詢與每月彙整查詢）是否使用索引，地址條件使用全文索引
+
+    Returns:
+        bool: 全部都使用索引時為 True
+    """
+    select = Select("fulltext")
+    ok = True
+    for name, conditions in QUERY_SHAPES:
+        conditions = BASE_CONDITIONS | conditions
+        for kind, (query, params) in [("明細", select.createQuery(conditions, "model")),
+                                      ("彙整", select.createMonthlyQuery(conditions))]:
+            result = explain(db, query, params)
+            status = "OK" if result["indexed"] else "全表掃描"
+            ok = ok and result["indexed"]
+            print(f"[{status}] {name} ({kind}): key={result['key']}, type={result['type']}, rows={result['rows']}")
+    return ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="lvr_lnd 資料表結構調整與索引檢查")
+    parser.add_argument("command", choices=["migrate", "check"], help="migrate 套用結構調整，check 以 EXPLAIN 檢查索引")
+    args = parser.parse_args()
+
+    with MySQL() as db:
+        if db.connection is None:
+            sys.exit(1)
+        if args.command == "migrate":
+            print(f"完成，本次套用 {migrate(db)} 項")
+        else:
+            sys.exit(0 if check(db) else 1)
@@ -0,0 +1,262 @@
+"""
+    預測模型
+
+    predictive_model 預設以直線（一次迴歸）預測，這裡提供可以依名稱選擇的其他模型，
+    全部以 NumPy 陣列實作，輸入為每月的 (交易年月, 平均單價, 交易筆數)：
+        linear       一次迴歸（LinearFit 的封閉解，以交易筆數加權），O(n)
+        theil_sen    Theil 不完全法：第 i 個月與第 i + n/2 個月配對的斜率取加權中位數，少數異常月份不影響結果，O(n log n)
+        huber        Huber 穩健迴歸（以一次迴歸為起點的反覆加權最小平方法，固定次數），O(n)
+        seasonal     趨勢加上 1~12 月的月份虛擬變數（季節性），O(n)
+        holt         Holt 指數平滑（水準與趨勢，月份有缺漏時依間隔外推，交易筆數少的月份影響較小），O(n)
+
+    使用方式:
+        >>> model = getModel("huber").fit(trade_ym, price, count)
+        >>> model.predict([11403, 11404])
+
+    新增模型時繼承 Model，實作 _fit(x, y, w) 與 _predict(x)，以 @register("名稱") 註冊
+"""
+
+import os
+from abc import ABC, abstractmethod
+from typing import Callable, Dict
+
+import numpy as np
+
+from lib.LinearFit import LinearFit, monthIndex
+
+# 名稱 => 模型類別
+MODELS: Dict[str, Callable[[], "Model"]] = {}
+# 預設模型（環境變數 LVR_MODEL）
+DEFAULT_MODEL = os.environ.get("LVR_MODEL", "linear")
+
+
+def register(name: str):
+    """註冊模型類別的裝飾器"""
+    def decorator(cls):
+        cls.name = name
+        MODELS[name] = cls
+        return cls
+    return decorator
+
+
+def getModel(name: str = None, **options) -> "Model":
+    """
+    依名稱建立模型
+
+    Args:
+        name: 模型名稱（MODELS 的 key），預設為 DEFAULT_MODEL
+        options: 模型的參數
+
+    Returns:
+        Model
+    """
+    name = name or DEFAULT_MODEL
+    if name not in MODELS:
+        raise ValueError(f"未知的模型: {name}，可使用 {', '.join(MODELS)}")
+    return MODELS[name](**options)
+
+
+def _weightedMedian(values, weights) -> float:
+    """
+    加權中位數：累計權重達到一半的值，剛好等於一半時取前後兩個值的平均，權重相同時與 np.median 相同
+
+    Example:
+        >>> _weightedMedian(np.array([1.0, 2.0, 10.0]), np.array([1.0, 1.0, 5.0]))
+        10.0
+    """
+    order = np.argsort(values, kind="stable")
+    values, weights = values[order], weights[order]
+    cumulative = np.cumsum(weights)
+    if cumulative[-1] <= 0:
+        return float(np.median(values))
+    half = cumulative[-1] / 2
+    index = int(np.searchsorted(cumulative, half))
+    if index + 1 < len(values) and np.isclose(cumulative[index], half):
+        return float((values[index] + values[index + 1]) / 2)
+    return float(values[index])
+
+
+class Model(ABC):
+    """模型的共同介面，x 為與基期（第一個月份）相差的月數，子類別需要實作 _fit 與 _predict"""
+    name = ""
+
+    def fit(self, trade_ym, y, weight=None) -> "Model":
+        """
+        擬合每月的平均單價
+
+        Args:
+            trade_ym: 交易年月（由舊到新排序），例如 [11110, 11205]
+            y: 各該年月平均單價
+            weight: 各該年月交易筆數，預設每月為 1
+
+        Returns:
+            Model: 自己
+        """
+        trade_ym = np.asarray(trade_ym, dtype=np.int64)
+        if trade_ym.size == 0:
+            raise ValueError("沒有可擬合的資料")
+        self.base_ym = int(trade_ym[0])
+        x = monthIndex(trade_ym, self.base_ym).astype(np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        w = np.ones_like(y) if weight is None else np.asarray(weight, dtype=np.float64)
+        self._fit(x, y, w)
+        return self
+
+    def predict(self, target_ym) -> np.ndarray:
+        """預測目標年月的平均單價"""
+        return self._predict(monthIndex(np.asarray(target_ym, dtype=np.int64), self.base_ym).astype(np.float64))
+
+    @abstractmethod
+    def _fit(self, x, y, w):
+        """以月數 x、平均單價 y 與權重（交易筆數）w 擬合"""
+
+    @abstractmethod
+    def _predict(self, x):
+        """預測月數 x 的平均單價"""
+
+
+class _LineModel(Model):
+    """以斜率與截距預測的模型"""
+    slope = 0.0
+    intercept = 0.0
+
+    def _predict(self, x):
+        return self.intercept + self.slope * x
+
+
+@register("linear")
+class LinearModel(_LineModel):
+    """一次迴歸，以交易筆數加權（與 predictive_model 相同）"""
+
+    def _fit(self, x, y, w):
+        self.slope, self.intercept = LinearFit().update(x, y, weight=w).coefficients()
+
+
+@register("theil_sen")
+class TheilSenModel(_LineModel):
+    """
+    Theil 不完全法：依時間排序後第 i 個與第 i + n/2 個資料點配對，斜率取加權中位數，截距為 y - 斜率x 的加權中位數
+    完整的 Theil–Sen 需要計算所有 n² 組配對，這裡只需要 n/2 組，仍然可以抵抗接近 1/4 的異常月份
+
+    平均單價的變異數與交易筆數成反比，配對斜率的權重為 w_i * w_j / (w_i + w_j)（斜率變異數的倒數），
+    截距的權重為每月的交易筆數；權重相同時與不加權的中位數相同
+    """
+
+    def _fit(self, x, y, w):
+        half = len(x) // 2
+        if half == 0 or x[-1] == x[0]:
+            self.slope = 0.0
+        else:
+            dx = x[half:2 * half] - x[:half]
+            slopes = (y[half:2 * half] - y[:half]) / dx
+            left, right = w[:half], w[half:2 * half]
+            self.slope = _weightedMedian(slopes, left * right / np.maximum(left + right, 1e-12))
+        self.intercept = _weightedMedian(y - self.slope * x, w)
+
+
+@register("huber")
+class HuberModel(_LineModel):
+    """
+    Huber 穩健迴歸：殘差超過 k 倍尺度（MAD）的月份降低權重，以反覆加權最小平方法求解，
+    每次都是 LinearFit 的封閉解，固定最多 iterations 次
+    """
+
+    def __init__(self, k: float = 1.345, iterations: int = 20, tolerance: float = 1e-6):
+        self.k = k
+        self.iterations = iterations
+        self.tolerance = tolerance
+
+    def _fit(self, x, y, w):
+        self.slope, self.intercept = LinearFit().update(x, y, weight=w).coefficients()
+        for _ in range(self.iterations):
+            residual = y - (self.intercept + self.slope * x)
+            # MAD 換算為常態分布的標準差
+            scale = 1.4826 * np.median(np.abs(residual - np.median(residual)))
+            if scale == 0:
+                break
+            u = np.abs(residual) / (self.k * scale)
+            robust = np.where(u <= 1, 1.0, 1.0 / np.maximum(u, 1e-12))
+            slope, intercept = LinearFit().update(x, y, weight=w * robust).coefficients()
+            done = abs(slope - self.slope) <= self.tolerance * (abs(self.slope) + 1) and \
+                abs(intercept - self.intercept) <= self.tolerance * (abs(self.intercept) + 1)
+            self.slope, self.intercept = slope, intercept
+            if done:
+                break
+
+
+@register("seasonal")
+class SeasonalModel(Model):
+    """
+    趨勢加上月份虛擬變數：y = a + bx + s[月份]，沒有虛擬變數的月份（1 月與資料不足的月份）效果為 0
+
+    月份虛擬變數只建立在出現至少 min_observations 次的月份：只出現一次的月份，虛擬變數會完全吻合該月的值，
+    趨勢與月份效果無法分開（例如只有 11 個月的資料時，最小平方解有無限多個）。
+    資料點少於參數個數 + 1 或設計矩陣不是滿秩時，改用一次迴歸（與 linear 相同）
+    """
+
+    def __init__(self, min_observations: int = 2):
+        self.min_observations = min_observations
+
+    def _fit(self, x, y, w):
+        month = self._month(x)
+        self.effects = np.zeros(12)
+        months, counts = np.unique(month, return_counts=True)
+        self.months = months[(months != 0) & (counts >= self.min_observations)]
+        # 所有資料都屬於有虛擬變數的月份時（例如沒有 1 月的資料），虛擬變數的和與截距相同，以第一個月份為基準
+        if np.isin(month, self.months).all():
+            self.months = self.months[1:]
+        design = self._design(x, month)
+        sqrt_w = np.sqrt(w)
+        weighted = design * sqrt_w[:, None]
+        if len(x) < design.shape[1] + 1 or np.linalg.matrix_rank(weighted) < design.shape[1]:
+            self.months = self.months[:0]
+            self.slope, self.intercept = LinearFit().update(x, y, weight=w).coefficients()
+            return
+        coefficients, *_ = np.linalg.lstsq(weighted, y * sqrt_w, rcond=None)
+        self.intercept, self.slope = coefficients[:2]
+        self.effects[self.months] = coefficients[2:]
+
+    def _predict(self, x):
+        return self.intercept + self.slope * x + self.effects[self._month(x)]
+
+    def _month(self, x):
+        """月份（0 為 1 月）"""
+        return ((self.base_ym % 100 - 1 + x.astype(np.int64)) % 12)
+
+    def _design(self, x, month):
+        return np.column_stack([np.ones_like(x), x] + [(month == m).astype(np.float64) for m in self.months])
+
+
+@register("holt")
+class HoltModel(Model):
+    """
+    Holt 指數平滑（水準 + 趨勢）
+        水準 L = alpha * y + (1 - alpha) * (L + T * 間隔)
+        趨勢 T = beta * (L - 前一個 L) / 間隔 + (1 - beta) * T
+    間隔為與前一個有交易的月份相差的月數，初始趨勢為加權一次迴歸的斜率，預測值為 L + T * (目標月份 - 最後一個月份)
+
+    交易筆數為平均筆數 r 倍的月份視為連續觀察到 r 次，水準的平滑係數為 1 - (1 - alpha)^r，
+    只有幾筆交易的月份幾乎不改變水準；每月筆數相同時與不加權相同
+    """
+
+    def __init__(self, alpha: float = 0.3, beta: float = 0.1):
+        self.alpha = alpha
+        self.beta = beta
+
+    def _fit(self, x, y, w):
+        level = y[0]
+        # 初始趨勢為以交易筆數加權的一次迴歸斜率，不只由頭尾兩個月決定
+        trend = LinearFit().update(x, y, weight=w).coefficients()[0]
+        mean = w.mean()
+        alphas = 1 - (1 - self.alpha) ** (w / mean) if mean > 0 else np.full_like(w, self.alpha)
+        for previous, current, value, alpha in zip(x[:-1], x[1:], y[1:], alphas[1:]):
+            gap = current - previous
+            last = level
+            level = alpha * value + (1 - alpha) * (level + trend * gap)
+            trend = self.beta * (level - last) / gap + (1 - self.beta) * trend
+        self.level = float(level)
+        self.trend = float(trend)
+        self.last_x = float(x[-1])
+
+    def _predict(self, x):
+        return self.level + self.trend * (x - self.last_x)
@@ -0,0 +1,155 @@
+"""
+    預先彙整的每月統計 lvr_lnd_monthly
+
+    預測只需要每月的平均單價，這裡在匯入資料後依
+        (city_code, town_code, trade_sign, age, trade_ym)
+    預先計算單價總和、筆數與平方和，沒有價格、面積與地址條件時（Select.canUsePrecomputed）
+    直接由這個資料表回答，不必每次彙整原始交易資料
+
+    屋齡不以實際年數儲存，而是分為 Select.AGE_BOUNDARIES 的邊界與邊界之間的區間：
+    Tools.changeToSelectDict 的屋齡區間以 BETWEEN 查詢，相鄰區間的邊界（5、10、20...年）會同時屬於兩個區間，
+    所以邊界自成一格，邊界之間的屋齡（整數）以 前一個邊界 + 1 為代表，例如
+        0 => 0，1~4 => 1，5 => 5，6~9 => 6，10 => 10，11~19 => 11，...，40 => 40，41 以上 => 41
+    BETWEEN 5 AND 10 會選到 5、6、10 三格，與原始資料相同；每個 (縣市, 鄉鎮市區, 交易標的, 年月) 最多 12 格
+    （實際年數最多有數十格），查詢時需要加總的資料較少
+
+    使用方式（在專案根目錄執行）:
+        python lib/MonthlyAggregate.py
+"""
+
+import os
+import sys
+import numpy as np
+
+# 添加父目錄到系統路徑，以便導入 lib 與 Select
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib.Database import openDatabase
+from lib.QueryCache import touchDataVersion
+from lib.Tools import Tools
+from Select import Select
+
+TABLE = "lvr_lnd_monthly"
+
+
+def ageBucket(boundaries=Select.AGE_BOUNDARIES) -> str:
+    """
+    屋齡 => 屋齡區間代表值的 SQL（負數與 NULL 不變）
+
+    Example:
+        >>> ageBucket((0, 5))
+        'CASE WHEN age IS NULL OR age < 0 OR age IN (0, 5) THEN age WHEN age < 5 THEN 1 ELSE 6 END'
+    """
+    cases = " ".join(f"WHEN age < {high} THEN {low + 1}" for low, high in zip(boundaries, boundaries[1:]))
+    return (f"CASE WHEN age IS NULL OR age < 0 OR age IN ({', '.join(map(str, boundaries))}) THEN age "
+            f"{cases + ' ' if cases else ''}ELSE {boundaries[-1] + 1} END")
+
+
+# 與 Tools.changeToSelectDict 預設範圍相同的價格與面積條件，彙整結果才會與原始資料查詢相同
+REFRESH = (
+    f"INSERT INTO {TABLE} (city_code, town_code, trade_sign, age, trade_ym, price_sum, price_count, price_sumsq) "
+    f"SELECT city_code, town_code, trade_sign, {ageBucket()} AS bucket, trade_date DIV 100, "
+    "SUM(price_nuit), COUNT(*), SUM(price_nuit * 1.0 * price_nuit) "
+    "FROM lvr_lnd WHERE price_nuit BETWEEN %s AND %s AND total_area BETWEEN %s AND %s "
+    "GROUP BY city_code, town_code, trade_sign, bucket, trade_date DIV 100"
+)
+
+
+def refresh(db) -> bool:
+    """
+    重新計算每月統計（資料表需要先建立：MySQL 執行 python lib/Migration.py migrate，SQLite 開啟時自動建立）
+    刪除與重新計算在同一個交易中，期間其他連線的查詢仍然讀到舊的統計，失敗時保留舊的統計
+
+    Args:
+        db (MySQL, SQLite): 已連線的資料庫
+
+    Returns:
+        bool: 是否成功
+    """
+    if not db.execute_transaction([(f"DELETE FROM {TABLE}", None),
+                                   (REFRESH, Select.DEFAULT_RANGE + Select.DEFAULT_RANGE)]):
+        return False
+    # 資料已更新，讓查詢快取失效
+    touchDataVersion(db)
+    return True
+
+
+def queryMonthly(db, conditions, group=None):
+    """
+    查詢每月的單價總和與筆數（GUI 與批次預測共用）
+    MySQL、SQLite：沒有價格、面積與地址條件時先使用預先彙整的每月統計，查無資料（或尚未建立）時再彙整原始交易資料
+    欄式快取（ColumnStore）：只讀取符合條件的分割後逐批彙整
+
+    Args:
+        db (MySQL, SQLite, ColumnStore): 已連線的資料庫
+        conditions (dict): Tools.changeToSelectDict 的結果
+        group (str): 分組欄位（Select.GROUP_COLUMNS），預設不分組
+
+    Returns:
+        Tools.MonthlyResult，有分組時為 Tools.getKeyByGroupedMonthly 的結果
+    """
+    tools = Tools()
+    parse = tools.getKeyByGroupedMonthly if group else tools.getKeyByMonthly
+    if db.dialect == "parquet":
+        if db.connection is None:
+            return parse([])
+        rows = db.monthly(conditions, [group] if group else [])
+        # 與 Select.createMonthlyQuery(conditions, group) 相同，分組欄位改名為 grp
+        return parse([{**row, "grp": row[group]} for row in rows] if group else rows)
+
+    select = Select(dialect=db.dialect)
+    queries = [select.createMonthlyQuery(conditions, group)]
+    if select.canUsePrecomputed(conditions):
+        queries.insert(0, select.createPrecomputedQuery(conditions, group))
+    for query, params in queries:
+        result = parse(db.query(query, params))
+        if result.count > 0:
+            break
+    return result
+
+
+def monthlySlices(db, city_code=None, min_months=1):
+    """
+    由每月統計讀取每一個 (縣市, 鄉鎮市區, 交易標的) 的每月序列，回測與模型比較使用
+
+    Args:
+        db (MySQL, SQLite, ColumnStore): 已連線的資料庫
+        city_code (str): 只讀取這個縣市，預設為全部
+        min_months (int): 少於這個月份數的序列不傳回
+
+    Returns:
+        dict: {(city_code, town_code, trade_sign): (交易年月, 平均單價, 交易筆數, 單價平方和)}，值皆為依年月排序的 NumPy 陣列
+    """
+    if db.dialect == "parquet":
+        # 欄式快取沒有預先彙整的資料表，以與 REFRESH 相同的價格與面積條件彙整
+        conditions = {"city_code": city_code, "price_nuit": Select.DEFAULT_RANGE, "total_area": Select.DEFAULT_RANGE}
+        rows = db.monthly(conditions, ["city_code", "town_code", "trade_sign"]) if db.connection is not None else []
+    else:
+        where, params = ("WHERE city_code = %s ", [city_code]) if city_code else ("", [])
+        rows = db.query(
+            "SELECT city_code, town_code, trade_sign, trade_ym AS ym, SUM(price_sum) AS total, "
+            f"SUM(price_count) AS count, SUM(price_sumsq) AS sumsq FROM {TABLE} {where}"
+            "GROUP BY city_code, town_code, trade_sign, trade_ym ORDER BY city_code, town_code, trade_sign, trade_ym",
+            params)
+    series = {}
+    for row in rows:
+        count = int(row["count"])
+        if count == 0:
+            continue
+        key = (row["city_code"], row["town_code"], int(row["trade_sign"]))
+        series.setdefault(key, []).append((int(row["ym"]), float(row["total"]) / count, count, float(row["sumsq"])))
+    slices = {}
+    for key, values in series.items():
+        if len(values) < min_months:
+            continue
+        ym, mean, count, sumsq = zip(*values)
+        slices[key] = (np.array(ym, dtype=np.int64), np.array(mean), np.array(count, dtype=np.float64),
+                       np.array(sumsq))
+    return slices
+
+
+if __name__ == '__main__':
+    with openDatabase() as db:
+        if db.connection is None:
+            sys.exit(1)
+        if not refresh(db):
+            sys.exit(1)
@@ -1,30 +1,189 @@
+import atexit
+import os
+import threading
+import time
+from collections import deque
 import mysql.connector
 from mysql.connector import Error
 
+class PoolTimeout(Error):
+    """連線池在等待時間內沒有可用的連線"""
+
+class ConnectionPool:
+    '''
+    行程共用的連線池
+    取得連線時優先使用閒置的連線，不必每次查詢都重新建立 TCP 連線與登入驗證
+        min_size: 保留的最少連線數，閒置再久也不會被關閉
+        max_size: 最多同時開啟的連線數，全部使用中時等待歸還
+        idle_timeout: 閒置超過秒數的連線會被關閉（保留 min_size 條）
+        health_check: 閒置超過秒數的連線在取出時先 ping 確認仍可使用，失效則重新連線
+    '''
+
+    def __init__(self, connect, min_size=1, max_size=5, idle_timeout=300, health_check=30, timeout=30):
+        """
+        Args:
+            connect (callable): 建立新連線的函式
+            min_size (int): 最少連線數
+            max_size (int): 最多連線數
+            idle_timeout (float): 閒置連線的保留秒數
+            health_check (float): 閒置超過此秒數才在取出時檢查連線
+            timeout (float): 等待可用連線的秒數
+        """
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check = health_check
+        self.timeout = timeout
+        # 閒置的 (連線, 歸還時間)，右邊為最近歸還的
+        self._idle = deque()
+        # 目前開啟的連線數（閒置 + 使用中）
+        self._size = 0
+        self._condition = threading.Condition()
+        self.pid = os.getpid()
+
+    def fill(self):
+        """預先建立 min_size 條連線"""
+        while True:
+            with self._condition:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                connection = self.connect()
+            except Exception:
+                with self._condition:
+                    self._size -= 1
+                raise
+            self.release(connection)
+
+    def acquire(self):
+        """
+        取得連線，使用完畢需要呼叫 release 歸還
+
+        Returns:
+            連線物件
+        """
+        deadline = time.monotonic() + self.timeout
+        with self._condition:
+            self._evict(time.monotonic())
+            while True:
+                if self._idle:
+                    # 使用最近歸還的連線，較久沒用的連線留給閒置回收
+                    connection, released = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    connection, released = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._condition.wait(remaining):
+                    raise PoolTimeout(msg=f"等待 {self.timeout} 秒仍沒有可用的資料庫連線")
+
+        try:
+            if connection is not None and time.monotonic() - released > self.health_check:
+                if not self._alive(connection):
+                    self._close(connection)
+                    connection = None
+            if connection is None:
+                connection = self.connect()
+            return connection
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+    def release(self, connection):
+        """歸還連線，失效的連線直接關閉"""
+        try:
+            # 未提交的交易（包含 SELECT 開啟的讀取快照）先回復，避免下一個使用者讀到舊資料
+            if connection.unread_result:
+                connection.consume_results()
+            if connection.in_transaction:
+                connection.rollback()
+            alive = connection.is_connected()
+        except Exception:
+            alive = False
+        with self._condition:
+            if alive:
+                self._idle.append((connection, time.monotonic()))
+            else:
+                self._size -= 1
+            self._condition.notify()
+        if not alive:
+            self._close(connection)
+
+    def close(self):
+        """關閉所有閒置的連線"""
+        with self._condition:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+        for connection, _ in idle:
+            self._close(connection)
+
+    def _evict(self, now):
+        """關閉閒置太久的連線，保留 min_size 條（呼叫時需持有鎖）"""
+        while self._idle and self._size > self.min_size and now - self._idle[0][1] > self.idle_timeout:
+            connection, _ = self._idle.popleft()
+            self._size -= 1
+            self._close(connection)
+
+    @staticmethod
+    def _alive(connection):
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
 class MySQL:
     '''
     提供MySQL的封裝類別
-    在初始化時自動連接、並在結束時自動釋放連線
+    在初始化時自動從連線池取得連線、並在結束時歸還連線
     提供select與delete與insert封裝方法，確保預防資料庫注入攻擊
     '''
-    host = "162.241.253.231"
-    user = "omeiliau_nou"
-    password = "Nou@8089"
-    database = "omeiliau_nou"
+    # 可以用環境變數改為連接本機的 MySQL/MariaDB（例如測試大量匯入）
+    host = os.environ.get("LVR_DB_HOST", "162.241.253.231")
+    user = os.environ.get("LVR_DB_USER", "omeiliau_nou")
+    password = os.environ.get("LVR_DB_PASSWORD", "Nou@8089")
+    database = os.environ.get("LVR_DB_NAME", "omeiliau_nou")
+    # SQL 語法，Select 依此產生查詢語句（lib/SQLite.py 為 "sqlite"）
+    dialect = "mysql"
+    # 預設使用純 Python 實作，LVR_DB_USE_PURE=0 時改用 C 擴展（需要安裝且可用）
+    use_pure = os.environ.get("LVR_DB_USE_PURE", "1") != "0"
+    # 連線池設定，參考 ConnectionPool
+    pool_min_size = 1
+    pool_max_size = 5
+    pool_idle_timeout = 300
+    pool_health_check = 30
+
+    _pool = None
+    _pool_lock = threading.Lock()
+
+    def __init__(self, local_infile=False, pooled=True):
+        """在初始化時取得資料庫連線
 
-    def __init__(self):
-        """在初始化時連接資料庫"""
+        Args:
+            local_infile (bool): 是否允許 LOAD DATA LOCAL INFILE（BulkLoader 大量匯入使用），這種連線不放入連線池
+            pooled (bool): 是否使用行程共用的連線池，False 時每次建立新連線並在結束時關閉
+        """
         self.connection = None
+        self.pool = None
         try:
-            self.connection = mysql.connector.connect(
-                host=self.host,
-                user=self.user,
-                password=self.password,
-                database=self.database,
-                use_pure=True       # 避免使用C擴展
-            )
-            if self.connection.is_connected():
-                print("成功連接到資料庫")
+            if pooled and not local_infile:
+                self.pool = self.getPool()
+                self.connection = self.pool.acquire()
+            else:
+                self.connection = self.connect(local_infile)
         except Error as e:
             print(f"連接資料庫失敗: {e}")
             self.connection = None
@@ -32,6 +191,51 @@ class MySQL:
             print(f"其他異常: {e}")
             self.connection = None
 
+    @classmethod
+    def connect(cls, local_infile=False):
+        """建立一條新的資料庫連線"""
+        use_pure = cls.use_pure
+        if not use_pure and not mysql.connector.HAVE_CEXT:
+            print("找不到 MySQL C 擴展，改用純 Python 實作")
+            use_pure = True
+        connection = mysql.connector.connect(
+            host=cls.host,
+            user=cls.user,
+            password=cls.password,
+            database=cls.database,
+            use_pure=use_pure,
+            allow_local_infile=local_infile
+        )
+        if connection.is_connected():
+            print("成功連接到資料庫")
+        return connection
+
+    @classmethod
+    def getPool(cls):
+        """
+        取得行程共用的連線池，第一次呼叫時建立
+        fork 出來的子行程不能使用父行程的連線，會建立自己的連線池
+        """
+        with cls._pool_lock:
+            if cls._pool is None or cls._pool.pid != os.getpid():
+                cls._pool = ConnectionPool(
+                    cls.connect,
+                    min_size=cls.pool_min_size,
+                    max_size=cls.pool_max_size,
+                    idle_timeout=cls.pool_idle_timeout,
+                    health_check=cls.pool_health_check,
+                )
+                atexit.register(cls._pool.close)
+            return cls._pool
+
+    @classmethod
+    def warmUp(cls):
+        """預先建立連線池的最少連線數（例如 GUI 啟動時），失敗時只印出訊息"""
+        try:
+            cls.getPool().fill()
+        except Exception as e:
+            print(f"連接資料庫失敗: {e}")
+
     def query(self, sql, params=None):
         """
         執行查詢並返回結果
@@ -86,6 +290,34 @@ class MySQL:
             finally:
                 cursor.close()
     
+    def execute_transaction(self, statements):
+        """
+        在同一個交易中依序執行多個語句，全部成功才提交，任何一個失敗時全部回復
+        with MySQL() as db:
+            db.execute_transaction([("DELETE FROM lvr_lnd_monthly", None), ("INSERT INTO lvr_lnd_monthly ...", params)])
+
+        Args:
+            statements (list): (語句, 參數) 的串列
+
+        Returns:
+            bool: 是否成功提交
+        """
+        if not self.connection:
+            return False
+        cursor = self.connection.cursor()
+        try:
+            # 連線沒有開啟 autocommit，commit 之前的語句都在同一個交易中
+            for sql, params in statements:
+                cursor.execute(sql, params)
+            self.connection.commit()
+            return True
+        except Error as e:
+            print(f"執行失敗，已回復: {e}")
+            self.connection.rollback()
+            return False
+        finally:
+            cursor.close()
+
     def insert_many(self, sql, params_list):
         """
         執行批次插入操作並提交變更
@@ -114,7 +346,12 @@ class MySQL:
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
-        """結束時自動關閉連線"""
-        if self.connection and self.connection.is_connected():
+        """結束時歸還連線池，沒有使用連線池時關閉連線"""
+        if self.connection is None:
+            return
+        if self.pool is not None:
+            self.pool.release(self.connection)
+        elif self.connection.is_connected():
             self.connection.close()
-            print("資料庫連線已關閉")
\ No newline at end of file
+            print("資料庫連線已關閉")
+        self.connection = None
\ No newline at end of file
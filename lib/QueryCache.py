@@ -0,0 +1,226 @@
+"""
+    查詢結果快取
+
+    使用者通常只改變預測的目標年月或面積，查詢條件不變，
+    這裡以 (查詢語句, 參數) 為鍵保留最近的查詢結果（例如每月平均單價），相同條件不必再查詢資料庫
+        - LRU：超過 maxsize 筆時移除最久沒有使用的結果
+        - TTL：超過 ttl 秒的結果視為過期
+        - 資料版本：匯入新資料後（BulkLoader.load 與 MonthlyAggregate.refresh 會呼叫 touchDataVersion），所有快取都失效
+
+    資料版本有兩個來源：
+        store/data_version  本機標記檔的修改時間，只有在同一台電腦匯入時才會改變（預設的 dataVersion）
+        lvr_lnd_version     資料庫中只有一筆的版本資料表，匯入時遞增，在其他電腦匯入也會改變
+                            （DatabaseVersion，MySQL 需要先執行 python lib/Migration.py migrate 建立資料表）
+    GUI 使用 DatabaseVersion，為了不在每次取得快取時都查詢資料庫，最多每 interval 秒查詢一次版本，
+    其他電腦匯入的資料最晚 interval 秒後才會讓快取失效
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional, Sequence, Tuple
+
+# 資料版本標記檔，資料庫匯入新資料後更新修改時間
+DATA_VERSION_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'store', 'data_version')
+# 資料庫中的版本資料表（只有 id = 1 一筆），匯入新資料後遞增
+DATA_VERSION_TABLE = "lvr_lnd_version"
+# 遞增版本（沒有資料時新增），MySQL 與 SQLite 的語法不同
+BUMP_VERSION = {
+    "mysql": f"INSERT INTO {DATA_VERSION_TABLE} (id, version) VALUES (1, 1) "
+             "ON DUPLICATE KEY UPDATE version = version + 1",
+    "sqlite": f"INSERT INTO {DATA_VERSION_TABLE} (id, version) VALUES (1, 1) "
+              "ON CONFLICT (id) DO UPDATE SET version = version + 1",
+}
+
+
+def dataVersion() -> int:
+    """取得目前的資料版本（標記檔的修改時間），沒有標記檔時為 0，只反映同一台電腦的匯入"""
+    try:
+        return os.stat(DATA_VERSION_FILE).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def databaseVersion(db) -> Optional[int]:
+    """
+    取得資料庫中的資料版本
+
+    Args:
+        db (MySQL, SQLite): 已連線的資料庫
+
+    Returns:
+        int: 版本，尚未匯入過時為 0，資料表不存在或查詢失敗時為 None
+    """
+    # 欄式快取（lib.ColumnStore）沒有版本資料表，只使用本機標記檔
+    if db.connection is None or getattr(db, "dialect", "mysql") not in BUMP_VERSION:
+        return None
+    cursor = db.connection.cursor()
+    try:
+        cursor.execute(f"SELECT version FROM {DATA_VERSION_TABLE} WHERE id = 1")
+        rows = cursor.fetchall()
+        return int(rows[0][0]) if rows else 0
+    except Exception as e:
+        print(f"讀取資料版本失敗: {e}")
+        return None
+    finally:
+        cursor.close()
+
+
+def touchDataVersion(db=None):
+    """
+    更新資料版本，讓所有行程的查詢快取失效
+
+    Args:
+        db (MySQL, SQLite): 已連線的資料庫，有提供時同時遞增資料庫中的版本（其他電腦的快取也會失效）
+    """
+    os.makedirs(os.path.dirname(DATA_VERSION_FILE), exist_ok=True)
+    with open(DATA_VERSION_FILE, 'w') as f:
+        f.write(str(time.time_ns()))
+    if db is None or db.connection is None or getattr(db, "dialect", "mysql") not in BUMP_VERSION:
+        return
+    cursor = db.connection.cursor()
+    try:
+        cursor.execute(BUMP_VERSION[getattr(db, "dialect", "mysql")])
+        db.connection.commit()
+    except Exception as e:
+        # MySQL 尚未執行 python lib/Migration.py migrate 時沒有版本資料表，只有本機的快取會失效
+        print(f"更新資料版本失敗: {e}")
+        db.connection.rollback()
+    finally:
+        cursor.close()
+
+
+class DatabaseVersion:
+    """QueryCache 的 version 函式，資料版本為 (本機標記檔, 資料庫中的版本)
+
+    Example:
+        >>> cache = QueryCache(maxsize=64, ttl=600, version=DatabaseVersion(openDatabase, interval=30))
+    """
+
+    def __init__(self, openDb: Callable, interval: float = 30):
+        """
+        Args:
+            openDb: 開啟資料庫的函式（例如 lib.Database.openDatabase），傳回可以用 with 的資料庫物件
+            interval: 查詢資料庫版本的最短間隔（秒），期間內使用上次的結果
+        """
+        self.openDb = openDb
+        self.interval = interval
+        self._checked = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def __call__(self) -> Tuple[int, Optional[int]]:
+        now = time.monotonic()
+        with self._lock:
+            if self._checked is None or now - self._checked >= self.interval:
+                with self.openDb() as db:
+                    version = databaseVersion(db)
+                # 連線或查詢失敗時沿用上次的版本，不因為暫時無法連線就清空快取
+                if version is not None:
+                    self._version = version
+                self._checked = now
+            return dataVersion(), self._version
+
+
+class QueryCache:
+    """查詢結果的 LRU + TTL 快取
+
+    Example:
+        >>> cache = QueryCache(maxsize=64, ttl=600)
+        >>> data = cache.getOrLoad(query, params, lambda: load(query, params))
+        >>> cache.stats()
+        {'hits': 0, 'misses': 1, 'evictions': 0, 'size': 1}
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float = 600, version: Callable[[], Hashable] = dataVersion):
+        """
+        Args:
+            maxsize: 最多保留的結果數
+            ttl: 結果保留的秒數
+            version: 取得資料版本的函式，版本改變時清空快取
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = version
+        # 鍵 => (到期時間, 結果)，右邊為最近使用的
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(query: str, params: Optional[Sequence] = None) -> Tuple:
+        """將查詢語句與參數轉換為快取的鍵，語句中多餘的空白不影響結果"""
+        return (' '.join(query.split()), tuple(params or ()))
+
+    def get(self, query: str, params: Optional[Sequence] = None):
+        """
+        取得快取的結果
+
+        Returns:
+            (bool, object): (是否命中, 結果)
+        """
+        key = self.key(query, params)
+        now = time.monotonic()
+        with self._lock:
+            self._checkVersion()
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            if entry is not None:
+                # 已過期
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, query: str, params: Optional[Sequence], value):
+        """儲存查詢結果，超過 maxsize 時移除最久沒有使用的結果"""
+        key = self.key(query, params)
+        with self._lock:
+            self._checkVersion()
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def getOrLoad(self, query: str, params: Optional[Sequence], loader: Callable[[], object]):
+        """
+        取得快取的結果，沒有時呼叫 loader 查詢並儲存
+
+        Args:
+            query: 查詢語句
+            params: 查詢參數
+            loader: 查詢資料庫的函式
+
+        Returns:
+            查詢結果
+        """
+        hit, value = self.get(query, params)
+        if hit:
+            return value
+        value = loader()
+        self.put(query, params, value)
+        return value
+
+    def invalidate(self):
+        """清空快取"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """命中、未命中、移除次數與目前的結果數"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'size': len(self._entries)}
+
+    def _checkVersion(self):
+        """資料版本改變時清空快取（呼叫時需持有鎖）"""
+        version = self.version()
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
@@ -0,0 +1,206 @@
+import os
+import re
+import sqlite3
+import sys
+
+# 預設的本機資料庫檔案
+DEFAULT_PATH = os.environ.get(
+    "LVR_SQLITE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "store", "lvr_lnd.sqlite3"))
+
+# 與 MySQL 的 lvr_lnd 相同的欄位與索引（含 lib/Migration.py 建立的 trade_ym 與索引，idx_lvr_filter 另外加上查詢用到的欄位）
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS lvr_lnd (
+        id INTEGER PRIMARY KEY,
+        city_code TEXT,
+        city_name TEXT,
+        town_code TEXT,
+        town_name TEXT,
+        trade_sign INTEGER,
+        address TEXT,
+        trade_date INTEGER,
+        price_total INTEGER,
+        price_nuit INTEGER,
+        total_area REAL,
+        code TEXT,
+        age INTEGER,
+        trade_ym INTEGER GENERATED ALWAYS AS (trade_date / 100) STORED
+    )""",
+    # 預測查詢的所有欄位都包含在索引中（覆蓋索引），不必再讀取資料表
+    "CREATE INDEX IF NOT EXISTS idx_lvr_filter ON lvr_lnd "
+    "(city_code, town_code, trade_sign, trade_date, age, total_area, price_nuit)",
+    "CREATE INDEX IF NOT EXISTS idx_lvr_city_ym ON lvr_lnd (city_code, trade_ym)",
+    # 預先彙整的每月統計，參考 lib/MonthlyAggregate.py
+    """CREATE TABLE IF NOT EXISTS lvr_lnd_monthly (
+        city_code TEXT,
+        town_code TEXT,
+        trade_sign INTEGER,
+        age INTEGER,
+        trade_ym INTEGER,
+        price_sum INTEGER,
+        price_count INTEGER,
+        price_sumsq REAL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_lvr_monthly ON lvr_lnd_monthly "
+    "(city_code, town_code, trade_sign, trade_ym, age, price_sum, price_count)",
+    # 資料版本（只有一筆），匯入後遞增，參考 lib/QueryCache.py
+    "CREATE TABLE IF NOT EXISTS lvr_lnd_version (id INTEGER PRIMARY KEY, version INTEGER NOT NULL)",
+]
+
+# MySQL 語法 => SQLite 語法
+PLACEHOLDER = re.compile(r"%s")
+INTEGER_DIVIDE = re.compile(r"\bDIV\b", re.IGNORECASE)
+
+def translate(sql):
+    """
+    將 Select 產生的 MySQL 語法轉換為 SQLite 語法
+        %s  => ?
+        DIV => /（兩邊都是整數時 SQLite 的 / 為整數除法）
+
+    Example:
+        >>> translate("SELECT trade_date DIV 100 AS ym FROM lvr_lnd WHERE city_code = %s")
+        'SELECT trade_date / 100 AS ym FROM lvr_lnd WHERE city_code = ?'
+    """
+    return INTEGER_DIVIDE.sub("/", PLACEHOLDER.sub("?", sql))
+
+class SQLite:
+    '''
+    本機 SQLite 資料庫，提供與 MySQL 類別相同的方法（query、insert_many...），
+    查詢語句使用 Select 產生的 MySQL 語法，執行前自動轉換，不需要網路連線也可以預測
+    '''
+    dialect = "sqlite"
+
+    def __init__(self, path=None):
+        """開啟資料庫檔案，不存在時建立資料表與索引
+
+        Args:
+            path (str): 資料庫檔案路徑，預設為 store/lvr_lnd.sqlite3（環境變數 LVR_SQLITE_PATH）
+        """
+        self.path = path or DEFAULT_PATH
+        self.connection = None
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self.connection = sqlite3.connect(self.path)
+            self.create_schema()
+        except sqlite3.Error as e:
+            print(f"開啟資料庫失敗: {e}")
+            self.connection = None
+
+    def create_schema(self):
+        """建立 lvr_lnd 資料表與索引（已存在時略過）"""
+        for sql in SCHEMA:
+            self.connection.execute(sql)
+        self.connection.commit()
+
+    def query(self, sql, params=None):
+        """
+        執行查詢並返回結果（每筆為字典）
+        with SQLite() as db:
+            result = db.query("SELECT * FROM lvr_lnd WHERE column = %s", (value,))
+        """
+        results = []
+        if self.connection:
+            try:
+                cursor = self.connection.execute(translate(sql), params or ())
+                columns = [column[0] for column in cursor.description]
+                results = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            except sqlite3.Error as e:
+                print(f"查詢失敗: {e}")
+        return results
+
+    def delete(self, sql, params=None):
+        """
+        執行刪除操作並提交變更
+        """
+        self._execute(sql, params, "刪除")
+
+    def insert(self, sql, params=None):
+        """
+        執行插入操作並提交變更
+        """
+        self._execute(sql, params, "插入")
+
+    def insert_many(self, sql, params_list):
+        """
+        執行批次插入操作並提交變更
+        """
+        if self.connection:
+            try:
+                cursor = self.connection.executemany(translate(sql), params_list)
+                self.connection.commit()
+                print(f"批次插入了 {cursor.rowcount} 筆資料")
+            except sqlite3.Error as e:
+                print(f"批次插入失敗: {e}")
+                self.connection.rollback()
+
+    def execute_transaction(self, statements):
+        """
+        在同一個交易中依序執行多個語句，參考 MySQL.execute_transaction
+        """
+        if not self.connection:
+            return False
+        try:
+            # sqlite3 在第一個修改語句前自動開始交易，提交前其他連線仍然讀到修改前的資料
+            for sql, params in statements:
+                self.connection.execute(translate(sql), params or ())
+            self.connection.commit()
+            return True
+        except sqlite3.Error as e:
+            print(f"執行失敗，已回復: {e}")
+            self.connection.rollback()
+            return False
+
+    def _execute(self, sql, params, action):
+        if self.connection:
+            try:
+                cursor = self.connection.execute(translate(sql), params or ())
+                self.connection.commit()
+                print(f"{action}了 {cursor.rowcount} 筆資料")
+            except sqlite3.Error as e:
+                print(f"{action}失敗: {e}")
+                self.connection.rollback()
+
+    def __enter__(self):
+        """允許 with 語句使用此類別"""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """結束時自動關閉連線"""
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+
+
+def build(path=None):
+    """
+    由 opendata 中的 csv 檔案建立本機資料庫（會先清空 lvr_lnd），
+    資料與匯入 MySQL 時相同，使用 CreateLvrData.getData 整理
+
+    Args:
+        path (str): 資料庫檔案路徑
+
+    Returns:
+        dict: BulkLoader.load 的匯入統計
+    """
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from lib.BulkLoader import BulkLoader
+    from lib.CreateLvrData import CreateLvrData
+    from lib.MonthlyAggregate import refresh
+
+    with SQLite(path) as db:
+        stats = BulkLoader(db).load(CreateLvrData().getData(1), replace=True)
+        refresh(db)
+        # 更新索引統計，讓查詢規劃選擇正確的索引
+        db.connection.execute("ANALYZE")
+        db.connection.commit()
+    return stats
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="由 opendata 的 csv 檔案建立本機 SQLite 資料庫")
+    parser.add_argument("--path", default=None, help=f"資料庫檔案路徑，預設為 {DEFAULT_PATH}")
+    args = parser.parse_args()
+    build(args.path)
+    print(f"本機資料庫已建立: {args.path or DEFAULT_PATH}")
+    print("設定環境變數 LVR_BACKEND=sqlite 後 GUI 會使用本機資料庫")
@@ -1,5 +1,12 @@
-from collections import defaultdict
+from collections import defaultdict, namedtuple
 from datetime import date
+import numpy as np
+
+# 每月彙整的結果（getKeyByDict、getKeyByMonthly、getKeyByGroupedMonthly 的回傳值）
+#     data  {交易年月: 平均單價}，分組時為 {組: {交易年月: 平均單價}}
+#     count 交易筆數（分組時為所有組的合計）
+#     stats {交易年月: (筆數, 單價平方和)}，分組時為 {組: {交易年月: (筆數, 單價平方和)}}，加權迴歸與預測區間使用
+MonthlyResult = namedtuple("MonthlyResult", ["data", "count", "stats"])
 
 class Tools:
     '''
@@ -45,14 +52,21 @@ class Tools:
     def getKeyByDict(self, data):
         '''
         將資料中的交易日期，取年月，並將坪單價加總後再取平均值
+        Return:
+            MonthlyResult (每月平均單價, 筆數, 每月的 (筆數, 單價平方和))，與 getKeyByMonthly 相同
         '''
-        groupData = defaultdict(lambda: [0, 0])
+        groupData = defaultdict(lambda: [0, 0, 0.0])
+        rowCount = 0
         
         for item in data:
             key = str(item["trade_date"])[:5]
             key = int(key)
             groupData[key][0] += item['price_nuit']
             groupData[key][1] += 1
+            groupData[key][2] += float(item['price_nuit']) ** 2
+            rowCount += 1
+        # 每月的筆數與單價平方和，供加權迴歸與預測區間使用
+        monthStats = {key: (groupData[key][1], groupData[key][2]) for key in sorted(groupData)}
         
         averaged_data = {
             key: groupData[key][0] / groupData[key][1]  # 平均值 = 總價格 / 次數
@@ -61,5 +75,49 @@ class Tools:
 
         sorted_data = dict(sorted(averaged_data.items()))
 
-        return sorted_data
-        
\ No newline at end of file
+        return MonthlyResult(sorted_data, rowCount, monthStats)
+
+    def getKeyByMonthly(self, data):
+        '''
+        將 Select.createMonthlyQuery 的查詢結果（每月的單價總和與筆數）轉換為每月平均單價，
+        結果與 getKeyByDict 相同
+        Return:
+            MonthlyResult
+        '''
+        rowCount = 0
+        averaged_data = {}
+        stats = {}
+        for item in data:
+            count = int(item['count'])
+            if count == 0:
+                continue
+            # MySQL 的 SUM 會傳回 Decimal
+            averaged_data[int(item['ym'])] = float(item['total']) / count
+            # 沒有 sumsq 欄位時（舊的查詢語句）平方和為 None
+            stats[int(item['ym'])] = (count, float(item['sumsq']) if item.get('sumsq') is not None else None)
+            rowCount += count
+
+        return MonthlyResult(dict(sorted(averaged_data.items())), rowCount, dict(sorted(stats.items())))
+
+    def getKeyByGroupedMonthly(self, data):
+        '''
+        將 Select.createMonthlyQuery(conditions, group) 的查詢結果轉換為每一組的每月平均單價
+        {組: {交易年月: 平均單價}}，每一組的結果與 getKeyByMonthly 相同
+        Return:
+            MonthlyResult 筆數為所有組的合計，stats 為每一組每月的 (筆數, 單價平方和)
+        '''
+        rowCount = 0
+        grouped_data = defaultdict(dict)
+        grouped_stats = defaultdict(dict)
+        for item in data:
+            count = int(item['count'])
+            if count == 0:
+                continue
+            grouped_data[item['grp']][int(item['ym'])] = float(item['total']) / count
+            grouped_stats[item['grp']][int(item['ym'])] = (
+                count, float(item['sumsq']) if item.get('sumsq') is not None else None)
+            rowCount += count
+
+        groups = sorted(grouped_data, key=lambda group: (group is None, group))
+        return MonthlyResult({group: dict(sorted(grouped_data[group].items())) for group in groups}, rowCount,
+                             {group: dict(sorted(grouped_stats[group].items())) for group in groups})
@@ -0,0 +1,61 @@
+"""
+    鄉鎮市區索引
+
+    由 params.town 建立一次，提供所有讀取流程共用：
+        code()  鄉鎮市區名稱 => 代碼，使用字典查詢
+        find()  從「土地位置建物門牌」找出鄉鎮市區，每個縣市預先編譯一個包含所有鄉鎮市區名稱的
+                正規表示式，只需要掃描地址一次，不必逐一比對每個鄉鎮市區名稱
+"""
+
+import re
+from typing import Dict, List, Optional
+
+
+class TownIndex:
+    """鄉鎮市區索引
+
+    Example:
+        >>> index = TownIndex(params.town)
+        >>> index.code('A', '大安區')
+        'A02'
+        >>> index.find('A', '臺北市大安區忠孝東路一段1號')
+        {'code': 'A02', 'title': '大安區'}
+    """
+
+    def __init__(self, town: Dict[str, List[Dict]]):
+        """
+        Args:
+            town: params.town 鄉鎮市區對照表
+        """
+        # 縣市代號 => {鄉鎮市區名稱: 代碼}
+        self.town_codes = {
+            city_code: {item['title']: item['code'] for item in items}
+            for city_code, items in town.items()
+        }
+        # 縣市代號 => 地址比對器
+        # 名稱由長到短排列，同一個位置有多個名稱符合時取最長的（例如臺南市的「安南區」與「南區」）
+        self.matchers = {
+            city_code: re.compile('|'.join(re.escape(title) for title in sorted(codes, key=len, reverse=True)))
+            for city_code, codes in self.town_codes.items() if codes
+        }
+
+    def codes(self, city_code: str) -> Dict[str, str]:
+        """取得縣市的 鄉鎮市區名稱 => 代碼 字典，可直接用於 pandas.Series.map"""
+        return self.town_codes.get(city_code, {})
+
+    def code(self, city_code: str, title: str) -> Optional[str]:
+        """以鄉鎮市區名稱查詢代碼，找不到時回傳 None"""
+        return self.town_codes.get(city_code, {}).get(title)
+
+    def find(self, city_code: str, address: str) -> Dict:
+        """從地址找出鄉鎮市區
+
+        Returns:
+            Dict: 包含行政區代碼和名稱的字典，找不到時為空值
+        """
+        matcher = self.matchers.get(city_code)
+        match = matcher.search(address) if matcher and address else None
+        if not match:
+            return {'code': '', 'title': ''}
+        title = match.group()
+        return {'code': self.town_codes[city_code][title], 'title': title}
@@ -0,0 +1,123 @@
+"""
+    背景工作執行緒
+
+    GUI 的查詢與預測需要等待資料庫，在 Tk 主執行緒執行時整個視窗會停止回應，
+    這裡以一個背景執行緒依序執行工作，結果放入佇列，由主執行緒以 window.after 定期呼叫 poll 處理
+    （Tk 的元件只能在主執行緒操作）
+        - 合併：工作執行中再送出新的工作時，只保留最新的一個，中間的工作不執行
+        - 取消：已送出但尚未完成的工作不再回報結果（執行中的資料庫查詢無法中斷，完成後結果直接丟棄）
+"""
+
+import queue
+import threading
+from typing import Callable, Optional
+
+
+class LatestWorker:
+    """只執行最新工作的背景執行緒
+
+    Example:
+        >>> worker = LatestWorker()
+        >>> worker.submit(input_io_call, (inputs,), onDone=output_show, onError=show_error)
+        >>> window.after(50, poll)  # poll 中呼叫 worker.poll() 並再次排程
+        >>> worker.cancel()
+    """
+
+    def __init__(self, deliver: Optional[Callable[[Callable[[], None]], None]] = None):
+        """
+        Args:
+            deliver: 將回呼交給主執行緒執行的函式，預設放入佇列由 poll 執行
+        """
+        self._callbacks = queue.SimpleQueue()
+        self.deliver = deliver or self._callbacks.put
+        # 每次送出或取消都遞增，工作完成時與目前的代數不同表示已被取代或取消
+        self._generation = 0
+        # 等待執行的工作 (代數, 函式, 參數, 完成回呼, 錯誤回呼)，只保留最新的一個
+        self._pending = None
+        self._running = False
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def submit(self, func: Callable, args: tuple = (), onDone: Optional[Callable] = None,
+               onError: Optional[Callable] = None) -> int:
+        """
+        送出工作，尚未開始執行的舊工作會被取代
+
+        Args:
+            func: 在背景執行緒執行的函式
+            args: func 的參數
+            onDone: 完成時在主執行緒以 onDone(結果) 呼叫
+            onError: 發生例外時在主執行緒以 onError(例外) 呼叫
+
+        Returns:
+            int: 這次工作的代數
+        """
+        with self._condition:
+            self._generation += 1
+            self._pending = (self._generation, func, args, onDone, onError)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="LatestWorker", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+            return self._generation
+
+    def cancel(self) -> bool:
+        """
+        取消尚未完成的工作
+
+        Returns:
+            bool: 是否有工作被取消
+        """
+        with self._condition:
+            busy = self._running or self._pending is not None
+            self._generation += 1
+            self._pending = None
+            return busy
+
+    def busy(self) -> bool:
+        """是否有執行中或等待執行的工作"""
+        with self._condition:
+            return self._running or self._pending is not None
+
+    def poll(self) -> int:
+        """
+        在主執行緒執行已完成工作的回呼
+
+        Returns:
+            int: 執行的回呼數
+        """
+        count = 0
+        while True:
+            try:
+                callback = self._callbacks.get_nowait()
+            except queue.Empty:
+                return count
+            callback()
+            count += 1
+
+    def isCurrent(self, generation: int) -> bool:
+        """工作是否仍是最新的（沒有被取代或取消）"""
+        return generation == self._generation
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None:
+                    self._condition.wait()
+                generation, func, args, onDone, onError = self._pending
+                self._pending = None
+                self._running = True
+            try:
+                result = func(*args)
+            except Exception as e:
+                self._finish(generation, onError, e)
+            else:
+                self._finish(generation, onDone, result)
+
+    def _finish(self, generation, callback, value):
+        with self._condition:
+            self._running = False
+        if callback is None or not self.isCurrent(generation):
+            return
+        # 回到主執行緒後再檢查一次，期間可能已經取消或送出新的工作
+        self.deliver(lambda: callback(value) if self.isCurrent(generation) else None)
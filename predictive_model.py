@@ -1,15 +1,19 @@
-import pandas as pd
 import numpy as np
+from lib.LinearFit import GroupedLinearFit, fitMonthly, monthIndex
+from lib.Models import DEFAULT_MODEL, getModel
 
 # 預測函式
 # 根據使用者輸入，計算迴歸公式，產出預測單價（萬元/坪），供GUI呼叫並計算（單價*目標面積（坪）=預測總價（萬元））以顯示預測結果（單價或總價，如欲顯示總價，則需要再做額外運算）
-def predictive_model(user_input_list, origin_data):
+def predictive_model(user_input_list, origin_data, monthly_stats=None, model=None):
     """
     本函式可回傳依據使用者輸入條件，所模擬計算出的預測房價單價（萬元/坪）
 
     參數:
         user_input_list (dict): 從GUI介面取得的使用者輸入條件清單
         origin_data (dict)： 交易年月及各該年月平均單價（元/平方公尺）（資料按交易時間由舊到新排序）
+        monthly_stats (dict)： 各該年月的 (交易筆數, 單價平方和)（Tools.getKeyByMonthly 回傳的 MonthlyResult.stats），有傳入時以交易筆數加權擬合（非必填）
+        model (str)： 預測模型名稱（lib/Models.py 的 MODELS，如 "huber"、"seasonal"），
+            預設為 user_input_list 的 "model"，沒有時為環境變數 LVR_MODEL（預設 "linear"）
 
     回傳:
         float: 預測房價單價（萬元/坪）
@@ -27,57 +31,29 @@ def predictive_model(user_input_list, origin_data):
     # }
     # key為「交易年月」，value為「各該月平均單價（元/平方公尺）」（資料按交易時間由舊到新排序）
 
-    # 將交易資料字典的key（交易年月）提取出來，形成串列，存入變數trade_time_month 
-    trade_time_month = list(origin_data.keys())
-    # 範例：trade_time_month = [11110, 11205, 11307]
-
-    # 將交易資料字典的value（各交易年月平均單價（元/平方公尺））提取出來，形成串列，存入變數house_price_per_square_meter_month_average
-    house_price_per_square_meter_month_average = list(origin_data.values())
-    # 範例：house_price_per_square_meter_month_average = [116730, 121716, 124736]
-
-    # 轉換變數trade_time_month的元素（交易年月）（最早的交易年月為0，其餘以此類推），儲存為變數trade_time
-    # 將串列中第一個元素作為基期年月（因為資料庫在挑資料時已經按交易時間由舊到新排序，所以列表中第一個元素為交易時間最早的資料）
-    base_year = trade_time_month[0] // 100 # 提取基期年份
-    # 範例：base_year = 111（年）
-    base_month = trade_time_month[0] % 100 # 提取基期月份
-    # 範例：11110%100 = 10（月）
-    # 範例：base_month = 10
-    # 計算串列中每個元素與基期的月份差距
-    trade_time = [] # 先創建交易年月轉換結果的空串列，等下再用迴圈把轉換後結果一一加進本串列
-    for year_month in trade_time_month: # year_month指串列trade_time_month中每個單一元素（如：11110）
-        year = year_month // 100 # 提取年份
-        month = year_month % 100 # 提取月份
-        # 差一年代表差12個月，計算年份差與月份差，以得到月份差距
-        month_difference = (year - base_year) * 12 + (month - base_month)
-        trade_time.append(month_difference)
+    # 選擇直線以外的模型時，交給 lib/Models.py 的模型擬合
+    model = model or user_input_list.get("model") or DEFAULT_MODEL
+    if model != "linear":
+        weight = None if monthly_stats is None else [monthly_stats[ym][0] for ym in origin_data]
+        predictor = getModel(model).fit(list(origin_data.keys()), list(origin_data.values()), weight)
+        target_ym = user_input_list["calculate_Y"] * 100 + user_input_list["calculate_M"]
+        return float(predictor.predict([target_ym])[0]) / 10000 / 0.3025
+
+    # 交易年月（key）與各該年月平均單價（value）直接轉換為 NumPy 陣列，並計算迴歸需要的累計值（n、Σx、Σy、Σxy、Σx²）
+    # 交易年月轉換為與基期相差的月數（資料庫在挑資料時已經按交易時間由舊到新排序，所以第一個元素為基期）
     # 範例：trade_time = [0, 7, 21]
     # （111年10月與基期111年10月相差0個月；112年5月與111年10月相差7個月；113年7月與111年10月相差21個月）
+    # 有每月交易筆數時，以筆數作為權重（1筆交易的月份不會和300筆交易的月份一樣重要）
+    fit, base_ym = fitMonthly(origin_data, monthly_stats)
+    # 範例：base_ym = 11110（基期111年10月）
 
-    # 取得使用者輸入的欲購置交易年月，並儲存為變數buy_time_year與buy_time_month
-    buy_time_year = user_input_list["calculate_Y"] # 從使用者輸入字典中提取key為calculate_Y所對應之value（目標期間（年））
-    # 範例：buy_time_year = 114
-    buy_time_month = user_input_list["calculate_M"] # 從使用者輸入字典中提取key為calculate_M所對應之value（目標期間（月））
-    # 範例：buy_time_month = 3
-
-    # 轉換變數buy_time_year與buy_time_month，並儲存為變數buy_time
-    buy_time = (buy_time_year - base_year) * 12 + (buy_time_month - base_month)
+    # 取得使用者輸入的欲購置交易年月，並轉換為與基期相差的月數
+    buy_time = int(monthIndex(user_input_list["calculate_Y"] * 100 + user_input_list["calculate_M"], base_ym))
     # 範例：buy_time = 29
     # （欲購置時間114年3月與基期111年10月相差29個月）
 
-    # 產生預測公式（最小平方迴歸法擬合）
-    data = pd.DataFrame({'X': trade_time, 'Y': house_price_per_square_meter_month_average})
-    # pd.DataFrame(字典資料)
-    # 範例：trade_time = [0, 7, 21]
-    # 範例：house_price_per_square_meter_month_average = [116730, 121716, 124736]
-
-    cofficients = np.polyfit(data['X'], data['Y'], 1)
-    # 使用numpy的polyfit函式 進行 最小平方法擬合
-    # 1 表示擬合 「一次」多項式模型（直線）
-    # np.polyfit(字典[對應自變數的key], 字典[對應應變數的key], 想要擬合幾次多項式)
-    # cofficients = [斜率, 截距]
-
-    slope = cofficients[0] # 斜率
-    intercept = cofficients[1] # 截距
+    # 產生預測公式（最小平方迴歸法擬合），由累計值直接計算斜率與截距，結果與 np.polyfit(X, Y, 1) 相同
+    slope, intercept = fit.coefficients()
 
     # 預測單價（元/平方公尺）公式
     predicted_house_price_per_square_meter = intercept + slope * buy_time
@@ -87,7 +63,64 @@ def predictive_model(user_input_list, origin_data):
     # 回傳預測單價（萬元/坪）
     return predicted_house_price_per_pin
     # 範例：42.34489458593352（萬元/坪）
-    
+
+
+# 預測區間函式
+# 除了預測單價，另外回傳單筆交易單價的預測區間（萬元/坪），供GUI顯示價格可能的範圍
+def predictive_interval(user_input_list, origin_data, monthly_stats=None, level=0.95):
+    """
+    本函式可回傳預測房價單價及其預測區間（萬元/坪），一律以一次迴歸（linear）擬合，
+    選擇其他模型時預測值與 predictive_model 不同，不應搭配使用
+
+    參數:
+        user_input_list (dict): 從GUI介面取得的使用者輸入條件清單
+        origin_data (dict)： 交易年月及各該年月平均單價（元/平方公尺）（資料按交易時間由舊到新排序）
+        monthly_stats (dict)： 各該年月的 (交易筆數, 單價平方和)（Tools.getKeyByMonthly 回傳的 MonthlyResult.stats），
+            有傳入時為單筆交易單價的區間，沒有時為該月平均單價的區間
+        level (float)： 信賴水準（預設 95%）
+
+    回傳:
+        (float, float, float): (預測房價單價, 下限, 上限)（萬元/坪），資料不足三筆時下限與上限為 nan
+
+    範例:
+        >>> result = tools.getKeyByMonthly(db.query(query, params))
+        >>> predictive_interval(user_input_list, result.data, result.stats)
+        (42.34, 35.12, 49.56)
+    """
+    fit, base_ym = fitMonthly(origin_data, monthly_stats)
+    buy_time = int(monthIndex(user_input_list["calculate_Y"] * 100 + user_input_list["calculate_M"], base_ym))
+    predicted, lower, upper = fit.interval(buy_time, level)
+    # 轉換為單價之單位為「萬元/坪」
+    return tuple(float(value) / 10000 / 0.3025 for value in (predicted, lower, upper))
+
+
+# 批次預測函式
+# 一次預測多組資料（例如縣市內每個鄉鎮市區）的多個目標年月（例如未來24個月的價格曲線），不必逐一查詢資料庫與擬合
+def predictive_model_batch(targets, grouped_data, grouped_stats=None):
+    """
+    本函式可回傳多組資料在多個目標年月的預測房價單價（萬元/坪），每一格與 predictive_model 的結果相同
+
+    參數:
+        targets (list)： 目標年月，每個元素為 (年, 月)，如 [(114, 3), (114, 4)]
+        grouped_data (dict)： {組: {交易年月: 平均單價（元/平方公尺）}}（Tools.getKeyByGroupedMonthly 的結果）
+        grouped_stats (dict)： {組: {交易年月: (交易筆數, 單價平方和)}}（Tools.getKeyByGroupedMonthly 回傳的 MonthlyResult.stats），有傳入時以交易筆數加權擬合（非必填）
+
+    回傳:
+        (list, np.ndarray): (各組名稱, 形狀為 (組數, 目標年月數) 的預測房價單價（萬元/坪）)
+
+    範例:
+        >>> groups, prices = predictive_model_batch([(114, 3), (114, 4)], {"A01": {...}, "A02": {...}})
+        >>> prices.shape
+        (2, 2)
+    """
+    # 目標年月轉換為交易年月格式，如 (114, 3) => 11403
+    target_ym = np.array([year * 100 + month for year, month in targets], dtype=np.int64)
+    # 一次計算所有組的斜率與截距，並預測所有目標年月（元/平方公尺）
+    fit = GroupedLinearFit.fromSeries(grouped_data, grouped_stats)
+    predicted_house_price_per_square_meter = fit.predict(target_ym)
+    # 轉換為單價之單位為「萬元/坪」
+    return fit.groups, predicted_house_price_per_square_meter / 10000 / 0.3025
+
 
 # 測試使用範例參數呼叫函式
 
@@ -0,0 +1,14 @@
+import os
+import sys
+
+import pytest
+
+# 測試以專案根目錄為匯入路徑（與 GUI.py 相同，使用 from lib.X import ...）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def dataVersionFile(tmp_path, monkeypatch):
+    """匯入與重新彙整會更新資料版本標記檔，測試時改寫到暫存資料夾，不影響 store/"""
+    from lib import QueryCache
+    monkeypatch.setattr(QueryCache, "DATA_VERSION_FILE", str(tmp_path / "data_version"))
@@ -0,0 +1,48 @@
+"""
+    lib/Backtest.py 的測試
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from lib.Backtest import backtest, mape, walkForward, walkForwardModel
+
+
+def series(months=30, seed=0):
+    rng = np.random.default_rng(seed)
+    index = np.sort(rng.choice(np.arange(months + 10), size=months, replace=False))
+    ym = (110 + index // 12) * 100 + index % 12 + 1
+    mean = 100000 + 400 * index + rng.normal(0, 5000, months)
+    count = rng.integers(1, 30, months).astype(np.float64)
+    return ym, mean, count
+
+
+def test_mape_excludes_non_positive():
+    assert mape([10, 5, 3, 4], [100, 50, 0, -2]) == (pytest.approx(0.1), 2)
+    value, excluded = mape([1, 2], [0, 0])
+    assert math.isnan(value) and excluded == 2
+    value, excluded = mape([], [])
+    assert math.isnan(value) and excluded == 0
+
+
+@pytest.mark.parametrize("weighted", [False, True])
+def test_walk_forward_matches_refit(weighted):
+    ym, mean, count = series()
+    weight = count if weighted else None
+    fits, fast = walkForward(ym, mean, weight, (1, 3), min_train=6)
+    refits, slow = walkForwardModel("linear", ym, mean, weight, (1, 3), min_train=6)
+    assert fits == refits == len(ym) - 6
+    for h in (1, 3):
+        assert fast[h][0] == pytest.approx(slow[h][0], rel=1e-9)
+        assert np.array_equal(fast[h][1], slow[h][1])
+
+
+def test_backtest_reports_excluded():
+    ym, mean, count = series()
+    mean[-1] = 0.0
+    result = backtest({("A", "A01", 1): (ym, mean, count, count * mean ** 2)}, horizons=(1,), min_train=6)
+    metric = result["horizons"][1]
+    assert metric["excluded"] == 1
+    assert math.isfinite(metric["mape"])
@@ -0,0 +1,47 @@
+"""
+    lib/BulkLoader.py 的測試（本機 SQLite）
+"""
+
+import pytest
+
+from lib.BulkLoader import BulkLoader
+from lib.SQLite import SQLite
+
+ROWS = [
+    ("A", "臺北市", "A01", "松山區", 1, "某路1號", 1120105, 1000000, 100000, 10.0, "RPA0000000001", 5),
+    ("A", "臺北市", "A02", "大安區", 2, "某路\t2號", 1120210, 2000000, 200000, 10.0, "RPA0000000002", None),
+]
+
+
+@pytest.fixture
+def db(tmp_path):
+    with SQLite(str(tmp_path / "lvr_lnd.sqlite3")) as db:
+        yield db
+
+
+def count(db):
+    return db.connection.execute("SELECT COUNT(*) FROM lvr_lnd").fetchone()[0]
+
+
+def test_load(db):
+    stats = BulkLoader(db).load(ROWS)
+    assert stats["rows"] == 2
+    assert db.connection.execute("SELECT address, age FROM lvr_lnd ORDER BY code").fetchall() == \
+        [("某路1號", 5), ("某路\t2號", None)]
+    # 匯入後重建的索引仍然存在
+    assert db.connection.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'index'").fetchone()[0] > 0
+
+
+def test_reload_refuses_when_not_empty(db):
+    loader = BulkLoader(db)
+    loader.load(ROWS)
+    with pytest.raises(RuntimeError):
+        loader.load(ROWS)
+    assert count(db) == 2
+
+
+def test_reload_replace(db):
+    loader = BulkLoader(db)
+    loader.load(ROWS)
+    loader.load(ROWS[:1], replace=True)
+    assert count(db) == 1
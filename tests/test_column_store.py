@@ -0,0 +1,155 @@
+"""
+    lib.ColumnStore（Parquet 欄式快取）的讀寫、分割與每月彙整測試
+    每月彙整（queryMonthly / monthlySlices）與本機 SQLite 的結果相同
+"""
+
+import os
+import random
+
+import pyarrow as pa
+import pytest
+
+from lib.BulkLoader import BulkLoader, COLUMNS
+from lib.ColumnStore import SCHEMA, ColumnStore
+from lib.MonthlyAggregate import monthlySlices, queryMonthly, refresh
+from lib.SQLite import SQLite
+from lib.Tools import Tools
+
+
+def makeRows(count=600, seed=0):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        city = rng.choice(["A", "B"])
+        trade_date = rng.choice([111, 112]) * 10000 + rng.randint(1, 12) * 100 + rng.randint(1, 28)
+        rows.append({
+            "city_code": city, "city_name": "", "town_code": f"{city}0{rng.randint(1, 3)}", "town_name": "",
+            "trade_sign": rng.randint(1, 5), "address": f"某路{rng.choice(['一', '二'])}段{rng.randint(1, 99)}號",
+            "trade_date": trade_date, "price_total": 0, "price_nuit": rng.randint(50000, 400000),
+            "total_area": round(rng.uniform(10, 200), 2), "code": f"RPA{i:010d}",
+            # 欄式快取沒有 NULL 屋齡（缺少時為 0），與資料庫比較時不使用 None
+            "age": rng.choice([0, 3, 5, 7, 10, 15, 20, 25, 30, 40, 45]),
+        })
+    return rows
+
+
+def inputs(**values):
+    data = {
+        'pmoney_unit': 1, 'minp': None, 'maxp': None, 'unit': 1, 'mins': None, 'maxs': None,
+        'p_startY': 111, 'p_startM': 1, 'p_endY': 112, 'p_endM': 12,
+        'city': 'A', 'town': None, 'ptype': [1], 'p_build': '', 'avg_var': None,
+    }
+    data.update(values)
+    return data
+
+
+def partitions(root):
+    return sorted(os.path.relpath(directory, root) for directory, _, files in os.walk(root) if files)
+
+
+@pytest.fixture(scope="module")
+def rows():
+    return makeRows()
+
+
+@pytest.fixture(scope="module")
+def store(rows, tmp_path_factory):
+    store = ColumnStore(str(tmp_path_factory.mktemp("store") / "lvr_lnd"))
+    store.write(rows)
+    return store
+
+
+@pytest.fixture(scope="module")
+def db(rows, tmp_path_factory):
+    with SQLite(str(tmp_path_factory.mktemp("sqlite") / "lvr_lnd.sqlite3")) as db:
+        BulkLoader(db).load([tuple(row[column] for column in COLUMNS) for row in rows])
+        assert refresh(db)
+        yield db
+
+
+def test_round_trip(store, rows):
+    table = store.read()
+    assert table.num_rows == len(rows)
+    actual = sorted(table.to_pylist(), key=lambda row: row["code"])
+    for row, expected in zip(actual, rows):
+        assert row["trade_ym"] == expected["trade_date"] // 100
+        assert {column: row[column] for column in expected} == pytest.approx(expected)
+
+
+def test_schema(store):
+    table = store.read()
+    assert table.schema.names == SCHEMA.names
+    for field in SCHEMA:
+        assert table.schema.field(field.name).type == field.type
+    assert table.schema.field("trade_sign").type == pa.int8()
+    assert table.schema.field("age").type == pa.int16()
+
+
+def test_partition_pruning(store, rows):
+    assert all(path.startswith(("city_code=A", "city_code=B")) for path in partitions(store.root))
+    # 只有符合的分割會被讀取
+    fragments = list(store.dataset().get_fragments(filter=store.filterExpression({"city_code": "A"})))
+    assert fragments and all("city_code=A" in fragment.path for fragment in fragments)
+
+    table = store.read(["trade_date", "price_nuit"], "A", [11203, 11205])
+    assert table.schema.names == ["trade_date", "price_nuit"]
+    expected = [row for row in rows if row["city_code"] == "A" and 11203 <= row["trade_date"] // 100 <= 11205]
+    assert table.num_rows == len(expected)
+    assert sorted(table.column("price_nuit").to_pylist()) == sorted(row["price_nuit"] for row in expected)
+
+
+def test_rewrite_replaces_partition(tmp_path, rows):
+    store = ColumnStore(str(tmp_path / "lvr_lnd"))
+    store.write(rows)
+    month = [row for row in rows if row["city_code"] == "A" and row["trade_date"] // 100 == 11201]
+    # 重新寫入同一個分割時取代原本的資料，其他分割不變
+    store.write(month[:1])
+    assert store.read(city_code="A", trade_ym=[11201, 11201]).num_rows == 1
+    assert store.read().num_rows == len(rows) - len(month) + 1
+
+
+@pytest.mark.parametrize("values", [
+    {},
+    {'town': 'A02'},
+    {'ptype': [1, 2, 5]},
+    {'avg_var': 2, 'ptype': [1, 2, 3, 4, 5]},
+    {'p_startY': 112, 'p_startM': 3, 'p_endY': 112, 'p_endM': 4},
+    {'minp': 10, 'maxp': 30, 'avg_var': 3},
+    {'mins': 50, 'p_build': '一段'},
+], ids=lambda values: ",".join(f"{key}={value}" for key, value in values.items()) or "default")
+def test_query_monthly_matches_sqlite(store, db, values):
+    conditions = Tools().changeToSelectDict(inputs(**values))
+    with store:
+        actual = queryMonthly(store, conditions)
+    expected = queryMonthly(db, conditions)
+    assert actual.count == expected.count
+    assert actual.data == pytest.approx(expected.data)
+    assert list(actual.data) == list(expected.data)
+
+
+def test_grouped_query_monthly_matches_sqlite(store, db):
+    conditions = Tools().changeToSelectDict(inputs(ptype=[1, 2, 3, 4, 5]))
+    conditions["town_code"] = None
+    with store:
+        actual = queryMonthly(store, conditions, "town_code")
+    expected = queryMonthly(db, conditions, "town_code")
+    assert list(actual.data) == list(expected.data)
+    for group in expected.data:
+        assert actual.data[group] == pytest.approx(expected.data[group])
+        assert actual.stats[group] == pytest.approx(expected.stats[group])
+
+
+def test_monthly_slices_match_sqlite(store, db):
+    with store:
+        actual = monthlySlices(store, "A", 3)
+    expected = monthlySlices(db, "A", 3)
+    assert list(actual) == list(expected)
+    for key in expected:
+        for left, right in zip(actual[key], expected[key]):
+            assert left == pytest.approx(right)
+
+
+def test_missing_store(tmp_path):
+    with ColumnStore(str(tmp_path / "missing")) as store:
+        assert store.connection is None
+        assert queryMonthly(store, {"city_code": "A"}).count == 0
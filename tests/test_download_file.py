@@ -0,0 +1,144 @@
+"""
+    lib/DownloadFile.py 的測試，以本機的 http.server 模擬 open data 伺服器（支援 Range / If-Range / If-None-Match）
+"""
+
+import io
+import os
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import pytest
+
+from lib import DownloadFile
+
+
+def makeZip(name, text):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zip_file:
+        zip_file.writestr(name, text * 2000)
+    return buffer.getvalue()
+
+
+class Server:
+    """本機 HTTP 伺服器，files 為 {路徑: (內容, ETag)}，requests 紀錄每次請求的 (路徑, 狀態碼, 標頭)"""
+
+    def __init__(self):
+        self.files = {}
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = urlparse(self.path).path
+                content, etag = server.files[path]
+                headers = dict(self.headers)
+                if self.headers.get("If-None-Match") == etag:
+                    return self._send(path, 304, etag, b"", headers)
+                range_header = self.headers.get("Range")
+                if_range = self.headers.get("If-Range")
+                if range_header and (if_range is None or if_range == etag):
+                    start = int(range_header.removeprefix("bytes=").split("-")[0])
+                    if start >= len(content):
+                        return self._send(path, 416, etag, b"", headers)
+                    return self._send(path, 206, etag, content[start:], headers,
+                                      {"Content-Range": f"bytes {start}-{len(content) - 1}/{len(content)}"})
+                return self._send(path, 200, etag, content, headers)
+
+            def _send(self, path, code, etag, body, headers, extra=None):
+                server.requests.append((path, code, headers))
+                self.send_response(code)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (extra or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def codes(self):
+        return [code for _, code, _ in self.requests]
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = Server()
+    server.thread.start()
+    monkeypatch.setattr(DownloadFile, "URL", server.url)
+    yield server
+    server.httpd.shutdown()
+    server.httpd.server_close()
+
+
+ITEMS = [
+    {"path": "DownloadSeason", "params": {"season": "113S1", "type": "zip", "fileName": "lvr_landcsv.zip"}},
+    {"path": "DownloadHistory", "params": {"type": "history", "fileName": "20241001"}},
+]
+
+
+def test_resume_from_part_file(server, tmp_path):
+    content = makeZip("a_lvr_land_a.csv", "resume,")
+    server.files["/DownloadSeason"] = (content, '"v1"')
+    file = tmp_path / "data0.zip"
+    (tmp_path / "data0.zip.part").write_bytes(content[:1000])
+    (tmp_path / "data0.zip.part.json").write_text('{"etag": "\\"v1\\"", "last_modified": null}')
+    progress = DownloadFile.DownloadProgress()
+
+    result = DownloadFile.downloadFile(str(file), f"{server.url}/DownloadSeason", progress=progress)
+
+    assert result["status"] is True
+    assert server.codes() == [206]
+    assert server.requests[0][2]["Range"] == "bytes=1000-"
+    assert file.read_bytes() == content
+    assert progress.resumedBytes == 1000
+    assert not (tmp_path / "data0.zip.part").exists()
+    assert not (tmp_path / "data0.zip.part.json").exists()
+
+
+def test_restart_when_etag_changes(server, tmp_path):
+    old = makeZip("a_lvr_land_a.csv", "old,")
+    new = makeZip("a_lvr_land_a.csv", "new,")
+    server.files["/DownloadSeason"] = (new, '"v2"')
+    file = tmp_path / "data0.zip"
+    (tmp_path / "data0.zip.part").write_bytes(old[:1000])
+    (tmp_path / "data0.zip.part.json").write_text('{"etag": "\\"v1\\"", "last_modified": null}')
+
+    result = DownloadFile.downloadFile(str(file), f"{server.url}/DownloadSeason")
+
+    assert result["status"] is True
+    # If-Range 不成立，伺服器傳回完整的新檔案，舊的部分被覆蓋
+    assert server.codes() == [200]
+    assert server.requests[0][2]["If-Range"] == '"v1"'
+    assert file.read_bytes() == new
+
+
+def test_manifest_skips_unchanged_files_and_force_downloads_again(server, tmp_path):
+    server.files["/DownloadSeason"] = (makeZip("a_lvr_land_a.csv", "season,"), '"s1"')
+    server.files["/DownloadHistory"] = (makeZip("b_lvr_land_a.csv", "history,"), '"h1"')
+    output = str(tmp_path / "opendata")
+
+    assert DownloadFile.downloadAll(ITEMS, output, workers=2) == {0: True, 1: True}
+    assert sorted(server.codes()) == [200, 200]
+    assert os.path.isfile(os.path.join(output, "data0", "a_lvr_land_a.csv"))
+    assert os.path.isfile(os.path.join(output, "data1", "b_lvr_land_a.csv"))
+
+    # 第二次執行：依下載紀錄發出條件式請求，伺服器回應 304，不再下載
+    server.requests.clear()
+    assert DownloadFile.downloadAll(ITEMS, output, workers=2) == {0: True, 1: True}
+    assert sorted(server.codes()) == [304, 304]
+    assert all(headers.get("If-None-Match") for _, _, headers in server.requests)
+
+    # --force：忽略下載紀錄，全部重新下載並解壓縮
+    server.requests.clear()
+    os.remove(os.path.join(output, "data0", "a_lvr_land_a.csv"))
+    assert DownloadFile.downloadAll(ITEMS, output, workers=2, force=True) == {0: True, 1: True}
+    assert sorted(server.codes()) == [200, 200]
+    assert not any("If-None-Match" in headers for _, _, headers in server.requests)
+    assert os.path.isfile(os.path.join(output, "data0", "a_lvr_land_a.csv"))
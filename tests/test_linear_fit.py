@@ -0,0 +1,124 @@
+"""
+    lib/LinearFit.py 的測試，以 np.polyfit(deg=1) 為基準
+"""
+
+import numpy as np
+import pytest
+
+from lib.LinearFit import GroupedLinearFit, LinearFit, fitMonthly, monthIndex, tQuantile
+
+
+def makeMonthly(months=60, seed=0):
+    """模擬的每月平均單價、筆數與單價平方和（隨機略過部分月份）"""
+    rng = np.random.default_rng(seed)
+    index = np.sort(rng.choice(np.arange(months * 2), size=months, replace=False))
+    trade_ym = (101 + index // 12) * 100 + index % 12 + 1
+    price = 100000 + 300 * index + rng.normal(0, 8000, months)
+    count = rng.integers(1, 50, months).astype(np.float64)
+    sumsq = count * (price ** 2 + rng.uniform(1e6, 1e8, months))
+    return trade_ym, price, count, sumsq
+
+
+def test_unweighted_matches_polyfit():
+    trade_ym, price, _, _ = makeMonthly()
+    x = monthIndex(trade_ym, trade_ym[0])
+    slope, intercept = LinearFit().update(x, price).coefficients()
+    assert (slope, intercept) == pytest.approx(tuple(np.polyfit(x, price, 1)), rel=1e-9)
+
+
+def test_weighted_matches_polyfit():
+    trade_ym, price, count, _ = makeMonthly()
+    x = monthIndex(trade_ym, trade_ym[0])
+    slope, intercept = LinearFit().update(x, price, weight=count).coefficients()
+    # np.polyfit 的 w 乘在殘差上（平方前），權重為筆數時傳入筆數的平方根
+    assert (slope, intercept) == pytest.approx(tuple(np.polyfit(x, price, 1, w=np.sqrt(count))), rel=1e-9)
+
+
+def test_weighted_matches_transactions():
+    """以每月筆數加權擬合每月平均單價，與以每一筆交易擬合相同"""
+    rng = np.random.default_rng(1)
+    x = np.repeat(np.arange(24), rng.integers(1, 20, 24))
+    y = 100000 + 500 * x + rng.normal(0, 10000, len(x))
+    months, count = np.unique(x, return_counts=True)
+    mean = np.bincount(x, weights=y) / count
+    sumsq = np.bincount(x, weights=y * y)
+    fit = LinearFit().update(months, mean, weight=count, sumsq=sumsq)
+    reference = LinearFit().update(x, y)
+    assert fit.coefficients() == pytest.approx(reference.coefficients(), rel=1e-9)
+    assert fit.residualVariance() == pytest.approx(np.sum((y - np.polyval(np.polyfit(x, y, 1), x)) ** 2) / (len(x) - 2),
+                                                   rel=1e-6)
+    assert fit.interval(30) == pytest.approx(reference.interval(30), rel=1e-6)
+
+
+@pytest.mark.parametrize("weighted", [False, True])
+def test_fit_monthly_matches_polyfit(weighted):
+    trade_ym, price, count, sumsq = makeMonthly(seed=2)
+    origin_data = dict(zip(trade_ym.tolist(), price.tolist()))
+    stats = dict(zip(trade_ym.tolist(), zip(count.tolist(), sumsq.tolist()))) if weighted else None
+    fit, base_ym = fitMonthly(origin_data, stats)
+    assert base_ym == trade_ym[0]
+    x = monthIndex(trade_ym, base_ym)
+    expected = np.polyfit(x, price, 1, w=np.sqrt(count) if weighted else None)
+    assert fit.coefficients() == pytest.approx(tuple(expected), rel=1e-9)
+
+
+@pytest.mark.parametrize("weighted", [False, True])
+def test_merge(weighted):
+    trade_ym, price, count, _ = makeMonthly(seed=3)
+    x = monthIndex(trade_ym, trade_ym[0])
+    weight = count if weighted else None
+    whole = LinearFit().update(x, price, weight=weight)
+    merged = LinearFit()
+    for part in np.array_split(np.arange(len(x)), 4):
+        merged.merge(LinearFit().update(x[part], price[part], weight=None if weight is None else weight[part]))
+    assert merged.coefficients() == pytest.approx(whole.coefficients(), rel=1e-12)
+    assert merged.residualVariance() == pytest.approx(whole.residualVariance(), rel=1e-9)
+    assert merged.coefficients() == pytest.approx(
+        tuple(np.polyfit(x, price, 1, w=None if weight is None else np.sqrt(weight))), rel=1e-9)
+
+
+def test_one_point():
+    fit = LinearFit().update([5], [123456.0])
+    # np.polyfit 只有一點時無法決定斜率，這裡斜率為 0，截距為平均值
+    assert fit.coefficients() == (0.0, 123456.0)
+    assert fit.predict(20) == 123456.0
+    assert np.isnan(fit.residualVariance())
+    _, lower, upper = fit.interval(20)
+    assert np.isnan(lower) and np.isnan(upper)
+
+
+@pytest.mark.parametrize("weight", [None, [1, 3, 6]])
+def test_constant_x(weight):
+    fit = LinearFit().update([7, 7, 7], [100.0, 110.0, 130.0], weight=weight)
+    mean = np.average([100.0, 110.0, 130.0], weights=weight)
+    slope, intercept = fit.coefficients()
+    assert slope == 0.0
+    assert intercept == pytest.approx(mean)
+
+
+def test_empty():
+    with pytest.raises(ValueError):
+        LinearFit().coefficients()
+
+
+def test_grouped_matches_fit_monthly():
+    series = {group: makeMonthly(months=12 + 5 * i, seed=10 + i) for i, group in enumerate(["A01", "A02", "A03"])}
+    grouped_data = {group: dict(zip(t.tolist(), p.tolist())) for group, (t, p, _, _) in series.items()}
+    grouped_data["A04"] = {11305: 98000.0}
+    grouped_stats = {group: dict(zip(t.tolist(), zip(c.tolist(), s.tolist()))) for group, (t, _, c, s) in series.items()}
+    grouped_stats["A04"] = {11305: (3, 3 * 98000.0 ** 2)}
+    targets = [11401, 11406, 11512]
+    fit = GroupedLinearFit.fromSeries(grouped_data, grouped_stats)
+    center, lower, upper = fit.interval(targets)
+    for row, group in enumerate(fit.groups):
+        single, base_ym = fitMonthly(grouped_data[group], grouped_stats[group])
+        x = monthIndex(np.array(targets), base_ym)
+        expected = single.interval(x)
+        assert center[row] == pytest.approx(expected[0], rel=1e-9)
+        assert lower[row] == pytest.approx(expected[1], rel=1e-6, nan_ok=True)
+        assert upper[row] == pytest.approx(expected[2], rel=1e-6, nan_ok=True)
+
+
+@pytest.mark.parametrize("dof, expected", [(1, 12.706), (2, 4.303), (5, 2.571), (10, 2.228), (30, 2.042), (1000, 1.962)])
+def test_t_quantile(dof, expected):
+    assert float(tQuantile(0.975, dof)) == pytest.approx(expected, abs=2e-3)
@@ -0,0 +1,97 @@
+"""
+    lib/Models.py 的測試
+"""
+
+import numpy as np
+import pytest
+
+from lib.Models import MODELS, Model, getModel
+
+
+def months(start_ym, count):
+    """由 start_ym 開始連續 count 個月的交易年月"""
+    index = (start_ym // 100) * 12 + start_ym % 100 - 1 + np.arange(count)
+    return index // 12 * 100 + index % 12 + 1
+
+
+@pytest.mark.parametrize("name", list(MODELS))
+def test_linear_series(name):
+    """所有模型在完全直線的資料上都預測直線的延伸（11302~11312 為 100~110）"""
+    trade_ym = months(11302, 11)
+    model = getModel(name).fit(trade_ym, 100.0 + np.arange(11))
+    assert model.predict([11401, 11402]) == pytest.approx([111.0, 112.0], abs=1e-6)
+
+
+def test_seasonal_recovers_effects():
+    trade_ym = months(11001, 48)
+    pattern = np.array([0, 5, -3, 2, 0, 8, -6, 1, 4, -2, 3, -7], dtype=np.float64)
+    x = np.arange(48)
+    y = 1000 + 2.5 * x + pattern[(trade_ym % 100) - 1]
+    model = getModel("seasonal").fit(trade_ym, y)
+    assert model.effects == pytest.approx(pattern - pattern[0])
+    target = months(11401, 12)
+    assert model.predict(target) == pytest.approx(1000 + 2.5 * (48 + np.arange(12)) + pattern)
+
+
+def test_seasonal_without_january():
+    """沒有 1 月的資料時，虛擬變數不會與截距共線"""
+    trade_ym = months(11001, 36)
+    keep = trade_ym % 100 != 1
+    pattern = np.array([0, 5, -3, 2, 0, 8, -6, 1, 4, -2, 3, -7], dtype=np.float64)
+    y = 1000 + 2.5 * np.arange(36) + pattern[(trade_ym % 100) - 1]
+    model = getModel("seasonal").fit(trade_ym[keep], y[keep])
+    assert model.predict([11402, 11406]) == pytest.approx(1000 + 2.5 * np.array([49, 53]) + pattern[[1, 5]])
+
+
+def test_seasonal_sparse_months_fall_back_to_linear():
+    # 每個月份只出現一次（沒有月份虛擬變數），與一次迴歸相同
+    trade_ym = months(11302, 11)
+    y = np.array([100, 104, 99, 103, 108, 102, 107, 111, 105, 110, 112], dtype=np.float64)
+    weight = np.arange(1, 12)
+    seasonal = getModel("seasonal").fit(trade_ym, y, weight)
+    linear = getModel("linear").fit(trade_ym, y, weight)
+    assert len(seasonal.months) == 0
+    assert seasonal.predict([11401, 11406]) == pytest.approx(linear.predict([11401, 11406]))
+
+
+def test_unknown_model():
+    with pytest.raises(ValueError):
+        getModel("unknown")
+
+
+def test_model_requires_fit_and_predict():
+    class Incomplete(Model):
+        def _predict(self, x):
+            return x
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+@pytest.mark.parametrize("name", ["theil_sen", "holt"])
+def test_equal_weights_match_unweighted(name):
+    trade_ym = months(11201, 18)
+    y = 1000 + 3.0 * np.arange(18) + np.sin(np.arange(18)) * 20
+    unweighted = getModel(name).fit(trade_ym, y)
+    weighted = getModel(name).fit(trade_ym, y, np.full(18, 7.0))
+    assert weighted.predict([11401, 11406]) == pytest.approx(unweighted.predict([11401, 11406]))
+
+
+def test_theil_sen_weighted_slope():
+    # 配對 (0, 3)、(1, 4) 的斜率為 1，(2, 5) 為 5，交易筆數多的配對決定斜率
+    trade_ym = months(11301, 6)
+    y = np.array([0.0, 0.0, 0.0, 3.0, 3.0, 15.0])
+    assert getModel("theil_sen").fit(trade_ym, y).slope == pytest.approx(1.0)
+    weight = np.array([1.0, 1.0, 100.0, 1.0, 1.0, 100.0])
+    assert getModel("theil_sen").fit(trade_ym, y, weight).slope == pytest.approx(5.0)
+
+
+def test_holt_discounts_thin_months():
+    # 最後一個月只有極少數交易的異常價格，幾乎不影響水準
+    trade_ym = months(11301, 12)
+    y = np.full(12, 100.0)
+    y[-1] = 200.0
+    weight = np.ones(12)
+    weight[-1] = 0.01
+    assert getModel("holt").fit(trade_ym, y).predict([11312])[0] > 120
+    assert getModel("holt").fit(trade_ym, y, weight).predict([11312])[0] == pytest.approx(100.0, abs=1)
@@ -0,0 +1,173 @@
+"""
+    Select.createMonthlyQuery（資料庫端依年月彙整）、Select.createPrecomputedQuery（預先彙整的每月統計）
+    與逐筆彙整（Tools.getKeyByDict）結果相同的測試（本機 SQLite）
+"""
+
+import random
+
+import pytest
+
+from lib.BulkLoader import BulkLoader
+from lib.MonthlyAggregate import TABLE, refresh
+from lib.SQLite import SQLite
+from lib.Tools import Tools
+from Select import Select
+
+# 112 年 3、4 月沒有交易，查詢期間包含這兩個月
+EMPTY_MONTHS = (11203, 11204)
+
+
+def makeRows(count=600, seed=0):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        month = rng.choice([m for m in range(1, 13) if 11200 + m not in EMPTY_MONTHS])
+        year = rng.choice([111, 112])
+        age = rng.choice([None, 0, 3, 5, 7, 10, 15, 20, 25, 30, 40, 45])
+        rows.append(("A", "臺北市", rng.choice(["A01", "A02", "A03"]), "", rng.randint(1, 5),
+                     f"某路{rng.choice(['一', '二'])}段{rng.randint(1, 99)}號",
+                     year * 10000 + month * 100 + rng.randint(1, 28), 0, rng.randint(50000, 400000),
+                     rng.uniform(10, 200), f"RPA{i:010d}", age))
+    return rows
+
+
+@pytest.fixture(scope="module")
+def db(tmp_path_factory):
+    with SQLite(str(tmp_path_factory.mktemp("monthly") / "lvr_lnd.sqlite3")) as db:
+        BulkLoader(db).load(makeRows())
+        assert refresh(db)
+        yield db
+
+
+def inputs(**values):
+    data = {
+        'pmoney_unit': 1, 'minp': None, 'maxp': None, 'unit': 1, 'mins': None, 'maxs': None,
+        'p_startY': 111, 'p_startM': 1, 'p_endY': 112, 'p_endM': 12,
+        'city': 'A', 'town': None, 'ptype': [1], 'p_build': '', 'avg_var': None,
+    }
+    data.update(values)
+    return data
+
+
+@pytest.mark.parametrize("values", [
+    {},
+    {'town': 'A02'},
+    {'ptype': [1, 2, 5]},
+    # 屋齡條件（含邊界 5、10 歲與 40 歲以上）
+    {'avg_var': 1},
+    {'avg_var': 2, 'ptype': [1, 2, 3, 4, 5]},
+    {'avg_var': 6, 'town': 'A03'},
+    # 只查詢沒有交易的月份
+    {'p_startY': 112, 'p_startM': 3, 'p_endY': 112, 'p_endM': 4},
+    {'minp': 10, 'maxp': 30, 'avg_var': 3},
+    {'mins': 50, 'p_build': '一段'},
+], ids=lambda values: ",".join(f"{key}={value}" for key, value in values.items()) or "default")
+def test_monthly_query_matches_rows(db, values):
+    tools = Tools()
+    select = Select(dialect="sqlite")
+    conditions = tools.changeToSelectDict(inputs(**values))
+
+    query, params = select.createQuery(conditions, "model")
+    expected = tools.getKeyByDict(db.query(query, params))
+
+    query, params = select.createMonthlyQuery(conditions)
+    actual = tools.getKeyByMonthly(db.query(query, params))
+
+    assert actual.data == pytest.approx(expected.data)
+    assert list(actual.data) == list(expected.data)
+    assert actual.count == expected.count
+    assert {ym: count for ym, (count, _) in actual.stats.items()} == \
+        {ym: count for ym, (count, _) in expected.stats.items()}
+    assert [sumsq for _, sumsq in actual.stats.values()] == \
+        pytest.approx([sumsq for _, sumsq in expected.stats.values()])
+    # 沒有交易的月份兩邊都不會出現
+    assert not set(EMPTY_MONTHS) & set(actual.data)
+
+
+def test_fixture_has_rows_for_every_filter(db):
+    """確認測試資料涵蓋各種條件（避免兩邊都是空的結果而通過）"""
+    tools = Tools()
+    select = Select(dialect="sqlite")
+    for values in ({'avg_var': 1}, {'avg_var': 2}, {'avg_var': 6, 'town': 'A03'}, {'mins': 50, 'p_build': '一段'}):
+        query, params = select.createMonthlyQuery(tools.changeToSelectDict(inputs(**values)))
+        assert tools.getKeyByMonthly(db.query(query, params)).count > 0, values
+
+
+@pytest.mark.parametrize("values", [
+    {},
+    {'town': 'A02', 'ptype': [1, 2, 3, 4, 5]},
+    {'avg_var': 1},
+    {'avg_var': 2},
+    {'avg_var': 3, 'town': 'A01'},
+    {'avg_var': 5},
+    {'avg_var': 6},
+    {'p_startY': 112, 'p_startM': 1, 'p_endY': 112, 'p_endM': 6, 'avg_var': 4},
+], ids=lambda values: ",".join(f"{key}={value}" for key, value in values.items()) or "default")
+def test_precomputed_query_matches_monthly(db, values):
+    tools = Tools()
+    select = Select(dialect="sqlite")
+    conditions = tools.changeToSelectDict(inputs(**values))
+    assert select.canUsePrecomputed(conditions)
+
+    expected = tools.getKeyByMonthly(db.query(*select.createMonthlyQuery(conditions)))
+    actual = tools.getKeyByMonthly(db.query(*select.createPrecomputedQuery(conditions)))
+
+    assert expected.count > 0
+    assert actual.data == pytest.approx(expected.data)
+    assert actual.count == expected.count
+    assert actual.stats == pytest.approx(expected.stats)
+
+
+def test_precomputed_age_buckets(db):
+    """每月統計只保留邊界與邊界之間的屋齡區間"""
+    ages = {row[0] for row in db.connection.execute(f"SELECT DISTINCT age FROM {TABLE}")}
+    assert ages == {None, 0, 1, 5, 6, 10, 11, 20, 21, 30, 40, 41}
+
+
+def test_can_use_precomputed():
+    select = Select(dialect="sqlite")
+    conditions = Tools().changeToSelectDict(inputs())
+    assert select.canUsePrecomputed(conditions)
+    for age in ([0, 5], [5, 10], [10, 40], [40, 9999999]):
+        assert select.canUsePrecomputed({**conditions, "age": age})
+    # 兩端不是邊界的屋齡區間無法由每月統計組成
+    for age in ([3, 10], [5, 12], [40, 45]):
+        assert not select.canUsePrecomputed({**conditions, "age": age})
+    assert not select.canUsePrecomputed({**conditions, "address": "一段"})
+
+
+def test_refresh_failure_keeps_previous(tmp_path):
+    with SQLite(str(tmp_path / "lvr_lnd.sqlite3")) as db:
+        BulkLoader(db).load(makeRows(50))
+        assert refresh(db)
+        before = db.connection.execute(f"SELECT COUNT(*), SUM(price_count) FROM {TABLE}").fetchone()
+        # 重新計算失敗（原始資料表不存在）時，刪除也一起回復
+        db.connection.execute("ALTER TABLE lvr_lnd RENAME TO lvr_lnd_old")
+        assert not refresh(db)
+        assert db.connection.execute(f"SELECT COUNT(*), SUM(price_count) FROM {TABLE}").fetchone() == before
+        assert before[1] == 50
+
+
+def test_results_are_independent(db):
+    """同一個 Tools 查詢兩次，第一次的結果不會被覆蓋"""
+    tools = Tools()
+    select = Select(dialect="sqlite")
+    first = tools.getKeyByMonthly(db.query(*select.createMonthlyQuery(tools.changeToSelectDict(inputs(town='A01')))))
+    data, count, stats = first.data.copy(), first.count, first.stats.copy()
+    tools.getKeyByMonthly(db.query(*select.createMonthlyQuery(tools.changeToSelectDict(inputs(town='A02')))))
+    assert (first.data, first.count, first.stats) == (data, count, stats)
+
+
+def test_grouped_matches_single(db):
+    tools = Tools()
+    select = Select(dialect="sqlite")
+    conditions = tools.changeToSelectDict(inputs(ptype=[1, 2]))
+    grouped = tools.getKeyByGroupedMonthly(db.query(*select.createMonthlyQuery(conditions, "town_code")))
+    assert list(grouped.data) == ["A01", "A02", "A03"]
+    total = 0
+    for town in grouped.data:
+        single = tools.getKeyByMonthly(db.query(*select.createMonthlyQuery({**conditions, "town_code": town})))
+        assert grouped.data[town] == pytest.approx(single.data)
+        assert grouped.stats[town] == pytest.approx(single.stats)
+        total += single.count
+    assert grouped.count == total
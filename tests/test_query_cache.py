@@ -0,0 +1,72 @@
+"""
+    lib/QueryCache.py 的測試
+"""
+
+import pytest
+
+from lib import QueryCache as module
+from lib.BulkLoader import BulkLoader
+from lib.QueryCache import DatabaseVersion, QueryCache, databaseVersion
+from lib.SQLite import SQLite
+
+ROW = ("A", "臺北市", "A01", "", 1, "", 1120105, 0, 100000, 10.0, "RPA0000000001", 5)
+
+
+def test_lru_and_ttl(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(module.time, "monotonic", lambda: now[0])
+    cache = QueryCache(maxsize=2, ttl=10, version=lambda: 0)
+    cache.put("SELECT 1", None, 1)
+    cache.put("SELECT  2", (), 2)
+    assert cache.get("SELECT 2") == (True, 2)
+    cache.put("SELECT 3", None, 3)
+    # 最久沒有使用的 SELECT 1 被移除
+    assert cache.get("SELECT 1") == (False, None)
+    now[0] = 11
+    assert cache.get("SELECT 2") == (False, None)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_file_version():
+    cache = QueryCache()
+    cache.put("SELECT 1", None, 1)
+    module.touchDataVersion()
+    assert cache.get("SELECT 1") == (False, None)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "lvr_lnd.sqlite3")
+
+
+def test_database_version(path, monkeypatch):
+    """另一台電腦匯入資料後，本機標記檔不變，資料庫中的版本改變，快取失效"""
+    monkeypatch.setattr(module, "dataVersion", lambda: 0)
+    with SQLite(path) as db:
+        assert databaseVersion(db) == 0
+    cache = QueryCache(version=DatabaseVersion(lambda: SQLite(path), interval=0))
+    cache.put("SELECT 1", None, 1)
+    assert cache.get("SELECT 1") == (True, 1)
+
+    with SQLite(path) as db:
+        BulkLoader(db).load([ROW])
+        assert databaseVersion(db) == 1
+    assert cache.get("SELECT 1") == (False, None)
+
+
+def test_database_version_interval(path, monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(module.time, "monotonic", lambda: now[0])
+    opened = []
+
+    def openDb():
+        opened.append(1)
+        return SQLite(path)
+
+    version = DatabaseVersion(openDb, interval=30)
+    version()
+    version()
+    assert len(opened) == 1
+    now[0] = 31
+    version()
+    assert len(opened) == 2
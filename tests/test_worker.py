@@ -0,0 +1,121 @@
+"""
+    lib/Worker.py LatestWorker 的測試
+    回呼直接在背景執行緒執行（deliver 不經過佇列），工作以 Event 控制開始與結束，結果不依賴執行緒的排程
+"""
+
+import threading
+import time
+
+import pytest
+
+from lib.Worker import LatestWorker
+
+TIMEOUT = 5
+
+
+class Gate:
+    """第一次呼叫時等待 release，其他呼叫直接傳回參數"""
+
+    def __init__(self):
+        self.calls = []
+        self.started = threading.Event()
+        self.released = threading.Event()
+
+    def __call__(self, value):
+        self.calls.append(value)
+        if len(self.calls) == 1:
+            self.started.set()
+            assert self.released.wait(TIMEOUT)
+        return value
+
+
+class Results:
+    """記錄送回的結果，收到 last 時設定 done"""
+
+    def __init__(self, last):
+        self.last = last
+        self.values = []
+        self.done = threading.Event()
+
+    def __call__(self, value):
+        self.values.append(value)
+        if value == self.last:
+            self.done.set()
+
+
+@pytest.fixture
+def worker():
+    return LatestWorker(deliver=lambda callback: callback())
+
+
+def test_coalesce(worker):
+    gate, results = Gate(), Results(3)
+    worker.submit(gate, (0,), onDone=results)
+    assert gate.started.wait(TIMEOUT)
+    # 執行中送出的工作只保留最新的一個
+    for value in (1, 2, 3):
+        worker.submit(gate, (value,), onDone=results)
+    gate.released.set()
+    assert results.done.wait(TIMEOUT)
+    assert gate.calls == [0, 3]
+    # 被取代的工作不回報結果
+    assert results.values == [3]
+
+
+def test_cancel(worker):
+    gate, results = Gate(), Results("next")
+    worker.submit(gate, ("cancelled",), onDone=results)
+    assert gate.started.wait(TIMEOUT)
+    assert worker.cancel()
+    gate.released.set()
+    # 工作依序執行，下一個工作完成時取消的工作已經結束
+    worker.submit(gate, ("next",), onDone=results)
+    assert results.done.wait(TIMEOUT)
+    assert gate.calls == ["cancelled", "next"]
+    assert results.values == ["next"]
+    assert not worker.cancel()
+
+
+def test_error(worker):
+    errors = []
+    done = threading.Event()
+
+    def fail():
+        raise ValueError("查詢失敗")
+
+    def onError(error):
+        errors.append(error)
+        done.set()
+
+    worker.submit(fail, onDone=lambda value: errors.append("done"), onError=onError)
+    assert done.wait(TIMEOUT)
+    assert len(errors) == 1 and isinstance(errors[0], ValueError)
+
+
+def test_is_current(worker):
+    gate, results = Gate(), Results("second")
+    first = worker.submit(gate, ("first",), onDone=results)
+    assert gate.started.wait(TIMEOUT)
+    assert worker.isCurrent(first)
+    second = worker.submit(gate, ("second",), onDone=results)
+    assert not worker.isCurrent(first)
+    assert worker.isCurrent(second)
+    assert worker.busy()
+    gate.released.set()
+    assert results.done.wait(TIMEOUT)
+    assert results.values == ["second"]
+
+
+def test_poll():
+    # 預設的 deliver 放入佇列，poll 時才在呼叫的執行緒執行回呼
+    worker = LatestWorker()
+    results = []
+    worker.submit(threading.get_ident,
+                  onDone=lambda worker_thread: results.append((worker_thread, threading.get_ident())))
+    deadline = time.monotonic() + TIMEOUT
+    while not worker.poll():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    [(worker_thread, callback_thread)] = results
+    assert worker_thread != threading.get_ident()
+    assert callback_thread == threading.get_ident()